@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш декодированного аудио: медиафайл декодируется один раз в PCM float32
+(16 kHz mono для ASR, 44.1 kHz stereo для воспроизведения) и хранится в папке проекта (.wicache).
+Ключ — путь + mtime + размер файла; данные отдаются как numpy.memmap (без чтения в память).
+Старые записи вытесняются по суммарному размеру (LRU по времени последнего доступа).
+Файл, PCM которого не помещается в лимит (оценка по длительности до декодирования), не кэшируется:
+get_pcm возвращает None, и вызывающий код работает с исходным файлом.
+"""
+
+import hashlib
+import os
+import threading
+from typing import Callable, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+CACHE_DIR_NAME = ".wicache"
+ASR_SAMPLE_RATE = 16000
+PLAYBACK_SAMPLE_RATE = 44100
+DEFAULT_MAX_MB = 2048
+_PCM_EXT = ".f32"
+
+
+def _default_decoder(path: str, sample_rate: int, channels: int):
+    """Декодировать файл в float32: (n,) для mono, (n, channels) для stereo. PyAV (faster-whisper) или librosa."""
+    try:
+        from faster_whisper.audio import decode_audio
+    except ImportError:
+        decode_audio = None
+    if decode_audio is not None:
+        if channels == 1:
+            return decode_audio(path, sampling_rate=sample_rate)
+        left, right = decode_audio(path, sampling_rate=sample_rate, split_stereo=True)
+        return np.stack([left, right], axis=1)
+    import librosa
+    audio, _ = librosa.load(path, sr=sample_rate, mono=(channels == 1), dtype=np.float32)
+    if channels == 1:
+        return audio
+    if audio.ndim == 1:
+        return np.stack([audio] * channels, axis=1)
+    return audio[:channels].T
+
+
+def _default_duration(path: str) -> Optional[float]:
+    """Длительность файла в секундах без декодирования (PyAV, иначе soundfile); None — неизвестна."""
+    try:
+        import av
+        with av.open(path) as container:
+            if container.duration:
+                return container.duration / av.time_base
+    except Exception:
+        pass
+    try:
+        import soundfile as sf
+        return sf.info(path).duration
+    except Exception:
+        return None
+
+
+class AudioCacheService:
+    """
+    PCM-кэш в cache_dir. get_pcm(path, sample_rate, channels) -> numpy.memmap (только чтение) или None.
+    max_mb — лимит суммарного размера; decoder(path, sample_rate, channels) -> ndarray — для тестов и замены декодера;
+    duration_probe(path) -> секунды или None — оценка размера PCM до декодирования.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_mb: float = DEFAULT_MAX_MB,
+        decoder: Optional[Callable[[str, int, int], "np.ndarray"]] = None,
+        duration_probe: Optional[Callable[[str], Optional[float]]] = None,
+    ):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = int(max(0, float(max_mb)) * 1024 * 1024)
+        self._decoder = decoder or _default_decoder
+        self._duration_probe = duration_probe or _default_duration
+        self._too_large = set()  # записи, которые не помещаются в лимит (не декодируем повторно)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    @staticmethod
+    def cache_dir_for_project(project_dir: str) -> str:
+        return os.path.join(project_dir, CACHE_DIR_NAME)
+
+    @staticmethod
+    def is_available() -> bool:
+        return NUMPY_AVAILABLE
+
+    def _entry_path(self, path: str, sample_rate: int, channels: int) -> Optional[str]:
+        """Файл кэша для текущей версии медиафайла (None, если файла нет)."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        raw = f"{os.path.normcase(os.path.abspath(path))}|{st.st_mtime_ns}|{st.st_size}"
+        digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+        return os.path.join(self.cache_dir, f"{digest}_{sample_rate}_{channels}{_PCM_EXT}")
+
+    def get_pcm(self, path: str, sample_rate: int = ASR_SAMPLE_RATE, channels: int = 1, decode: bool = True):
+        """
+        PCM файла как numpy.memmap: (n,) для mono, (n, channels) иначе. При промахе файл декодируется и сохраняется.
+        None, если numpy недоступен, файла нет, декодирование не удалось или PCM больше лимита кэша.
+        decode=False — только готовая запись: при промахе сразу None (не декодирует и не ждёт идущего декодирования).
+        """
+        if not NUMPY_AVAILABLE:
+            return None
+        entry = self._entry_path(path, sample_rate, channels)
+        if entry is None:
+            return None
+        if not decode:
+            if not os.path.isfile(entry):  # запись появляется через os.replace — целиком или никак
+                return None
+            try:
+                os.utime(entry, None)
+            except OSError:
+                pass
+            return self._open(entry, channels)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(entry, threading.Lock())
+        with key_lock:
+            if entry in self._too_large:
+                return None
+            if not os.path.isfile(entry):
+                duration = self._duration_probe(path)
+                if duration is not None and duration * sample_rate * channels * 4 > self.max_bytes:
+                    self._too_large.add(entry)
+                    return None
+                if not self._store(path, entry, sample_rate, channels):
+                    return None
+                self.evict(keep=entry)
+            else:
+                try:
+                    os.utime(entry, None)  # время доступа для LRU
+                except OSError:
+                    pass
+            return self._open(entry, channels)
+
+    def get_asr_audio(self, path: str):
+        """16 kHz mono float32 для ASR-бэкендов (см. ASRBackend.transcribe)."""
+        return self.get_pcm(path, ASR_SAMPLE_RATE, 1)
+
+    def get_playback_audio(self, path: str, decode: bool = True):
+        """44.1 kHz stereo float32 для AudioPlaybackService."""
+        return self.get_pcm(path, PLAYBACK_SAMPLE_RATE, 2, decode=decode)
+
+    def _store(self, path: str, entry: str, sample_rate: int, channels: int) -> bool:
+        try:
+            audio = np.ascontiguousarray(self._decoder(path, sample_rate, channels), dtype=np.float32)
+        except Exception as e:
+            print(f"Audio cache: cannot decode {path}: {e}")
+            return False
+        if audio.size == 0:
+            return False
+        if audio.nbytes > self.max_bytes:
+            self._too_large.add(entry)  # длительность не удалось узнать заранее
+            return False
+        tmp = entry + ".tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            audio.tofile(tmp)
+            os.replace(tmp, entry)
+            return True
+        except Exception as e:
+            print(f"Audio cache: cannot write {entry}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+
+    @staticmethod
+    def _open(entry: str, channels: int):
+        try:
+            n = os.path.getsize(entry) // (4 * channels)
+            shape = (n,) if channels == 1 else (n, channels)
+            return np.memmap(entry, dtype=np.float32, mode="r", shape=shape)
+        except Exception as e:
+            print(f"Audio cache: cannot open {entry}: {e}")
+            return None
+
+    def _entries(self):
+        """[(mtime, size, path)] файлов кэша."""
+        out = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return out
+        for name in names:
+            if not name.endswith(_PCM_EXT):
+                continue
+            p = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            out.append((st.st_mtime, st.st_size, p))
+        return out
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Удалять давно не использованные записи, пока размер кэша больше max_bytes (keep не трогается)."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            if keep and os.path.normcase(p) == os.path.normcase(keep):
+                continue
+            try:
+                os.remove(p)
+                total -= size
+            except OSError:
+                pass  # открыт как memmap (Windows) — удалим в следующий раз
+
+    def clear(self) -> None:
+        for _, _, p in self._entries():
+            try:
+                os.remove(p)
+            except OSError:
+                pass
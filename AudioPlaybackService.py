@@ -2,10 +2,13 @@
 """
 Воспроизведение сегмента аудио (Play-at-line) для редактора транскрипта.
 Использует pygame.mixer.music: поддержка MP3, WAV, OGG.
+Если задан pcm_loader (кэш декодированного аудио), фрагмент берётся из PCM 44.1 kHz stereo
+и играется через pygame.mixer.Sound без повторного декодирования файла. При промахе кэша звук
+сразу идёт через mixer.music, а pcm_prefetch заполняет кэш в фоне для следующих фрагментов.
 """
 
 import threading
-from typing import Callable, Optional
+from typing import Any, Callable, Optional
 
 try:
     import pygame
@@ -17,14 +20,28 @@ except ImportError:
 class AudioPlaybackService:
     """Воспроизведение отрезка аудиофайла по времени начала и конца (в секундах)."""
 
-    def __init__(self, schedule_in_main_thread: Optional[Callable[[float, Callable[..., None]], None]] = None):
+    SAMPLE_RATE = 44100
+
+    def __init__(
+        self,
+        schedule_in_main_thread: Optional[Callable[[float, Callable[..., None]], None]] = None,
+        pcm_loader: Optional[Callable[[str], Any]] = None,
+        pcm_prefetch: Optional[Callable[[str], Any]] = None,
+    ):
         """
         schedule_in_main_thread(delay_seconds, callback) — вызвать callback в главном потоке
         через delay_seconds (для остановки воспроизведения). Например: app.after(int(delay_seconds * 1000), callback).
+        pcm_loader(file_path) -> float32 (n, 2) при 44.1 kHz или None — только уже готовый PCM, без декодирования
+        (например AudioCacheService.get_playback_audio(path, decode=False)).
+        pcm_prefetch(file_path) — декодировать файл в кэш; вызывается в фоновом потоке при промахе pcm_loader.
         """
         self._schedule = schedule_in_main_thread
+        self._pcm_loader = pcm_loader
+        self._pcm_prefetch = pcm_prefetch
+        self._prefetching = set()
         self._lock = threading.Lock()
         self._initialized = False
+        self._sound = None
 
     def _ensure_init(self) -> bool:
         if not PYGAME_AVAILABLE:
@@ -33,7 +50,7 @@ class AudioPlaybackService:
             if self._initialized:
                 return True
             try:
-                pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512)
+                pygame.mixer.init(frequency=self.SAMPLE_RATE, size=-16, channels=2, buffer=512)
                 self._initialized = True
                 return True
             except Exception:
@@ -48,6 +65,9 @@ class AudioPlaybackService:
             return
         try:
             pygame.mixer.music.stop()
+            if self._sound is not None:
+                self._sound.stop()
+                self._sound = None
         except Exception:
             pass
 
@@ -69,6 +89,9 @@ class AudioPlaybackService:
             return False
 
         def _do_play():
+            if self._play_from_pcm(file_path, start_sec, end_sec):
+                return
+            self._start_prefetch(file_path)
             try:
                 pygame.mixer.music.load(file_path)
                 # pygame 2: play(loops=0, start=0.0, fade_ms=0)
@@ -81,3 +104,49 @@ class AudioPlaybackService:
 
         threading.Thread(target=_do_play, daemon=True).start()
         return True
+
+    def _start_prefetch(self, file_path: str) -> None:
+        """Заполнить кэш PCM в фоне (не больше одного потока на файл)."""
+        if self._pcm_prefetch is None:
+            return
+        with self._lock:
+            if file_path in self._prefetching:
+                return
+            self._prefetching.add(file_path)
+
+        def _run():
+            try:
+                self._pcm_prefetch(file_path)
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._prefetching.discard(file_path)
+
+        threading.Thread(target=_run, daemon=True).start()
+
+    def _play_from_pcm(self, file_path: str, start_sec: float, end_sec: float) -> bool:
+        """Сыграть срез из декодированного PCM (pcm_loader). False — нет кэша, играем через mixer.music."""
+        if self._pcm_loader is None:
+            return False
+        try:
+            import numpy as np
+            pcm = self._pcm_loader(file_path)
+            if pcm is None:
+                return False
+            a = max(0, int(start_sec * self.SAMPLE_RATE))
+            b = min(len(pcm), int(end_sec * self.SAMPLE_RATE))
+            if b <= a:
+                return False
+            chunk = np.asarray(pcm[a:b])
+            if chunk.ndim == 1:
+                chunk = np.stack([chunk, chunk], axis=1)
+            samples = (np.clip(chunk, -1.0, 1.0) * 32767).astype(np.int16)
+            pygame.mixer.music.stop()
+            if self._sound is not None:
+                self._sound.stop()
+            self._sound = pygame.mixer.Sound(buffer=samples.tobytes())
+            self._sound.play()
+            return True
+        except Exception:
+            return False
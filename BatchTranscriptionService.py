@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Пакетная транскрибация файлов проекта: очередь заданий и пул рабочих потоков.
+Модель загружается один раз и используется всеми заданиями; отмена возвращает
+незавершённые задания в очередь, resume() продолжает с них (с контрольной точки файла, если она есть).
+"""
+
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from SessionService import SessionService
+
+# Те же расширения, что показывает панель «Файлы проекта»
+MEDIA_EXTENSIONS = (".mp3", ".mp4", ".wav", ".m4a", ".mkv")
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+@dataclass
+class BatchJob:
+    """Одно задание очереди: файл проекта и его состояние."""
+
+    rel_path: str
+    abs_path: str
+    status: str = JOB_PENDING
+    progress: float = 0.0  # 0..1 по времени аудио
+    error: Optional[str] = None
+    segments: List[dict] = field(default_factory=list)
+
+
+class BatchTranscriptionQueue:
+    """
+    Очередь транскрибации с настраиваемым числом рабочих потоков
+    (больше одного — только если service.supports_concurrent_transcribe(), иначе пакет идёт в один поток).
+    service — TranscriptionService; load_kwargs — параметры load_model (одна загрузка на весь пакет);
+    transcribe_kwargs — параметры transcribe для каждого файла;
+    late_transcribe_kwargs() -> dict — дополняет их после загрузки модели (подсказка с токенизатором модели).
+    Колбэки вызываются из рабочих потоков:
+      on_job_progress(job), on_job_done(job), on_finished(cancelled: bool).
+    postprocess(segments) -> segments — опционально (удаление галлюцинаций, словари и т.п.).
+    audio_loader(abs_path) -> 16 kHz float32 или None — опционально (кэш декодированного аудио).
+    checkpoint_factory(abs_path) -> TranscriptionCheckpoint или None — опционально: с ней прерванный файл
+    продолжается с последнего готового сегмента (service.transcribe_with_checkpoint).
+    """
+
+    def __init__(
+        self,
+        service,
+        project_dir: str,
+        workers: int = 1,
+        load_kwargs: Optional[dict] = None,
+        transcribe_kwargs: Optional[dict] = None,
+        late_transcribe_kwargs: Optional[Callable[[], dict]] = None,
+        on_job_progress: Optional[Callable[[BatchJob], None]] = None,
+        on_job_done: Optional[Callable[[BatchJob], None]] = None,
+        on_finished: Optional[Callable[[bool], None]] = None,
+        postprocess: Optional[Callable[[List[dict]], List[dict]]] = None,
+        audio_loader: Optional[Callable[[str], Any]] = None,
+        checkpoint_factory: Optional[Callable[[str], Any]] = None,
+    ):
+        self.service = service
+        self.project_dir = os.path.abspath(project_dir)
+        self.workers = max(1, int(workers or 1))
+        self.load_kwargs = dict(load_kwargs or {})
+        self.transcribe_kwargs = dict(transcribe_kwargs or {})
+        self.late_transcribe_kwargs = late_transcribe_kwargs
+        self.on_job_progress = on_job_progress
+        self.on_job_done = on_job_done
+        self.on_finished = on_finished
+        self.postprocess = postprocess
+        self.audio_loader = audio_loader
+        self.checkpoint_factory = checkpoint_factory
+        self.jobs: List[BatchJob] = []
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._last_error: Optional[str] = None
+
+    @staticmethod
+    def find_untranscribed(project_dir: str, file_transcripts: Dict[str, List[dict]]) -> List[str]:
+        """Медиафайлы в папке проекта без транскрипта (относительные пути, по имени)."""
+        try:
+            names = [
+                f for f in os.listdir(project_dir)
+                if os.path.isfile(os.path.join(project_dir, f)) and f.lower().endswith(MEDIA_EXTENSIONS)
+            ]
+        except Exception:
+            return []
+        return sorted((n for n in names if not SessionService.has_transcript(file_transcripts, n)), key=str.lower)
+
+    def add(self, rel_paths: List[str]) -> None:
+        """Добавить файлы в очередь (повторно уже поставленные не добавляются)."""
+        with self._lock:
+            queued = {j.rel_path for j in self.jobs}
+            for rel in rel_paths:
+                if rel in queued:
+                    continue
+                abs_path = os.path.normpath(os.path.join(self.project_dir, rel))
+                self.jobs.append(BatchJob(rel_path=rel, abs_path=abs_path))
+                queued.add(rel)
+
+    @property
+    def is_running(self) -> bool:
+        return self._dispatcher is not None and self._dispatcher.is_alive()
+
+    def get_last_error(self) -> Optional[str]:
+        """Ошибка загрузки модели, если пакет не запустился."""
+        return self._last_error
+
+    def counts(self) -> Dict[str, int]:
+        """Число заданий по статусам (для строки состояния)."""
+        with self._lock:
+            out = {JOB_PENDING: 0, JOB_RUNNING: 0, JOB_DONE: 0, JOB_FAILED: 0}
+            for j in self.jobs:
+                out[j.status] = out.get(j.status, 0) + 1
+            return out
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return any(j.status == JOB_PENDING for j in self.jobs)
+
+    def start(self) -> bool:
+        """Запустить обработку ожидающих заданий в фоне. False, если уже идёт или нечего делать."""
+        if self.is_running or not self.has_pending():
+            return False
+        self._cancel_event.clear()
+        self._dispatcher = threading.Thread(target=self._run, daemon=True)
+        self._dispatcher.start()
+        return True
+
+    def resume(self) -> bool:
+        """Продолжить после cancel(): ошибочные задания тоже ставятся на повтор."""
+        with self._lock:
+            for j in self.jobs:
+                if j.status == JOB_FAILED:
+                    j.status = JOB_PENDING
+                    j.error = None
+        return self.start()
+
+    def cancel(self) -> None:
+        """Остановить пакет. Прерванные задания возвращаются в очередь (pending)."""
+        self._cancel_event.set()
+        try:
+            self.service.stop()
+        except Exception:
+            pass
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout)
+
+    def _next_job(self) -> Optional[BatchJob]:
+        with self._lock:
+            if self._cancel_event.is_set():
+                return None
+            for j in self.jobs:
+                if j.status == JOB_PENDING:
+                    j.status = JOB_RUNNING
+                    j.progress = 0.0
+                    return j
+        return None
+
+    def _run(self) -> None:
+        self._last_error = None
+        load_kwargs = dict(self.load_kwargs)
+        workers = self.workers
+        if workers > 1 and not getattr(self.service, "supports_concurrent_transcribe", lambda: False)():
+            workers = 1  # один экземпляр бэкенда с общим состоянием — параллельные задания смешали бы текст
+        if workers > 1:
+            load_kwargs.setdefault("num_workers", workers)
+        if not self.service.load_model(**load_kwargs):
+            self._last_error = getattr(self.service, "_last_load_error", None) or "Failed to load model."
+            if self.on_finished:
+                self.on_finished(True)
+            return
+        if self.late_transcribe_kwargs is not None:
+            self.transcribe_kwargs.update(self.late_transcribe_kwargs() or {})
+        threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        if self.on_finished:
+            self.on_finished(self._cancel_event.is_set())
+
+    def _worker(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._process(job)
+
+    def _process(self, job: BatchJob) -> None:
+        def on_progress(current_time, total_duration, _text):
+            job.progress = min(1.0, current_time / total_duration) if total_duration else 0.0
+            if self.on_job_progress:
+                self.on_job_progress(job)
+
+        try:
+            source = self.audio_loader(job.abs_path) if self.audio_loader else None
+            checkpoint = self.checkpoint_factory(job.abs_path) if self.checkpoint_factory else None
+            if checkpoint is not None:
+                segments, _info = self.service.transcribe_with_checkpoint(
+                    job.abs_path, checkpoint, audio=source, progress_callback=on_progress, **self.transcribe_kwargs
+                )
+            else:
+                segments, _info = self.service.transcribe(
+                    job.abs_path if source is None else source, progress_callback=on_progress, **self.transcribe_kwargs
+                )
+        except Exception as e:
+            with self._lock:
+                job.status = JOB_FAILED
+                job.error = str(e) or type(e).__name__
+            if self.on_job_done:
+                self.on_job_done(job)
+            return
+        if self._cancel_event.is_set():
+            # Прервано: задание снова в очереди; готовая часть осталась в контрольной точке (если она есть)
+            with self._lock:
+                job.status = JOB_PENDING
+                job.progress = 0.0
+            if self.on_job_progress:
+                self.on_job_progress(job)
+            return
+        segments = list(segments or [])
+        if self.postprocess:
+            segments = self.postprocess(segments)
+        with self._lock:
+            job.segments = segments
+            job.progress = 1.0
+            job.status = JOB_DONE
+        if self.on_job_done:
+            self.on_job_done(job)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Контрольные точки транскрибации: уже полученные сегменты и последняя обработанная секунда
+периодически пишутся в служебный файл проекта (.wicache/checkpoints). После остановки или сбоя
+новый запуск продолжает с этой секунды (см. TranscriptionService.transcribe_with_checkpoint).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+CHECKPOINT_VERSION = 1
+CHECKPOINTS_SUBDIR = os.path.join(".wicache", "checkpoints")
+DEFAULT_FLUSH_INTERVAL_S = 10.0
+
+
+def _media_identity(media_path: str) -> Optional[dict]:
+    try:
+        st = os.stat(media_path)
+    except OSError:
+        return None
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+class TranscriptionCheckpoint:
+    """
+    Контрольная точка одного медиафайла.
+    settings — параметры, при смене которых продолжать нельзя (модель, язык, задача);
+    add() вызывается для каждого готового сегмента (абсолютное время), запись не чаще flush_interval_s.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        media_path: str,
+        settings: Optional[dict] = None,
+        flush_interval_s: float = DEFAULT_FLUSH_INTERVAL_S,
+    ):
+        self.path = path
+        self.media_path = os.path.abspath(media_path)
+        self.settings = dict(settings or {})
+        self.flush_interval_s = flush_interval_s
+        self.segments: List[dict] = []
+        self.last_time = 0.0
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._dirty = False
+
+    @staticmethod
+    def path_for(project_dir: str, media_path: str) -> str:
+        """Файл контрольной точки для медиафайла в папке проекта."""
+        abs_media = os.path.normcase(os.path.abspath(media_path))
+        digest = hashlib.sha1(abs_media.encode("utf-8")).hexdigest()[:10]
+        stem = os.path.splitext(os.path.basename(media_path))[0]
+        return os.path.join(project_dir, CHECKPOINTS_SUBDIR, f"{stem}-{digest}.json")
+
+    @classmethod
+    def for_project(cls, project_dir: str, media_path: str, settings: Optional[dict] = None, **kwargs):
+        return cls(cls.path_for(project_dir, media_path), media_path, settings, **kwargs)
+
+    def load(self) -> Tuple[List[dict], float]:
+        """
+        Прочитать сохранённое состояние: (segments, last_time).
+        Если файла нет, медиафайл изменился или другие settings — ([], 0.0).
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return [], 0.0
+        if (
+            data.get("version") != CHECKPOINT_VERSION
+            or data.get("media") != _media_identity(self.media_path)
+            or data.get("settings") != self.settings
+        ):
+            return [], 0.0
+        with self._lock:
+            self.segments = list(data.get("segments") or [])
+            self.last_time = float(data.get("last_time") or 0.0)
+            return list(self.segments), self.last_time
+
+    def add(self, segment: dict) -> None:
+        """Добавить готовый сегмент; при необходимости записать файл."""
+        with self._lock:
+            self.segments.append({
+                "start": segment.get("start", 0),
+                "end": segment.get("end", 0),
+                "text": segment.get("text", ""),
+                **({"speaker": segment["speaker"]} if segment.get("speaker") is not None else {}),
+            })
+            self.last_time = max(self.last_time, float(segment.get("end", 0) or 0))
+            self._dirty = True
+            due = time.monotonic() - self._last_flush >= self.flush_interval_s
+        if due:
+            self.flush()
+
+    def flush(self) -> bool:
+        """Записать состояние атомарно (временный файл + os.replace)."""
+        with self._lock:
+            if not self._dirty:
+                return True
+            data = {
+                "version": CHECKPOINT_VERSION,
+                "source": self.media_path,
+                "media": _media_identity(self.media_path),
+                "settings": self.settings,
+                "last_time": self.last_time,
+                "segments": list(self.segments),
+            }
+            self._dirty = False
+            self._last_flush = time.monotonic()
+        tmp = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            return True
+        except Exception as e:
+            print(f"Checkpoint write failed: {e}")
+            return False
+
+    def clear(self) -> None:
+        """Удалить контрольную точку (транскрибация завершена)."""
+        with self._lock:
+            self.segments = []
+            self.last_time = 0.0
+            self._dirty = False
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш коррекций Ollama на диске (SQLite в папке конфигурации).
+Ключ — хэш (модель, системная инструкция, текст сегмента): повторная коррекция того же транскрипта
+или после небольшой правки отправляет в LLM только изменившиеся сегменты.
+Счётчики попаданий/промахов — для строки состояния; размер ограничен (вытесняются давно не использованные).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_MAX_MB = 64
+CACHE_FILE_NAME = "ollama_corrections.sqlite3"
+# Увеличить при изменении формулировки запроса коррекции — старые ответы перестанут совпадать
+PROMPT_VERSION = 1
+
+
+class CorrectionCacheService:
+    """
+    get(model, system, text) -> исправленный текст или None; put(model, system, text, corrected).
+    max_mb — лимит суммарного размера записей (текст ответа + ключ); при превышении удаляются
+    записи с самым старым временем последнего использования. Суммарный размер считается один раз
+    при открытии и дальше ведётся при вставке и вытеснении.
+    """
+
+    def __init__(self, path: str, max_mb: float = DEFAULT_MAX_MB):
+        self.path = path
+        self.max_bytes = int(max(0, float(max_mb)) * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._total = 0
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS corrections ("
+                "key TEXT PRIMARY KEY, corrected TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS corrections_last_used ON corrections(last_used)")
+            conn.commit()
+            self._total = self._sum_size(conn)
+            self._conn = conn
+        except Exception as e:
+            print(f"Correction cache unavailable ({path}): {e}")
+
+    @staticmethod
+    def make_key(model: str, system: str, text: str) -> str:
+        raw = json.dumps([PROMPT_VERSION, model or "", system or "", (text or "").strip()], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def is_available(self) -> bool:
+        return self._conn is not None
+
+    def get(self, model: str, system: str, text: str) -> Optional[str]:
+        if self._conn is None:
+            return None
+        key = self.make_key(model, system, text)
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT corrected FROM corrections WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                self._conn.execute("UPDATE corrections SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Correction cache read failed: {e}")
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, model: str, system: str, text: str, corrected: str) -> None:
+        if self._conn is None or corrected is None:
+            return
+        key = self.make_key(model, system, text)
+        size = len(key) + len(corrected.encode("utf-8"))
+        with self._lock:
+            try:
+                old = self._conn.execute("SELECT size FROM corrections WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO corrections (key, corrected, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, corrected, size, time.time()),
+                )
+                total = self._total + size - (old[0] if old else 0)
+                total = self._evict_locked(total)
+                self._conn.commit()
+                self._total = total
+            except sqlite3.Error as e:
+                print(f"Correction cache write failed: {e}")
+                try:
+                    self._conn.rollback()
+                    self._total = self._sum_size(self._conn)
+                except sqlite3.Error:
+                    pass
+
+    @staticmethod
+    def _sum_size(conn) -> int:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM corrections").fetchone()[0]
+
+    def _evict_locked(self, total: int) -> int:
+        """Удалить давно не использованные записи, пока total > max_bytes; возвращает новый размер."""
+        if total <= self.max_bytes:
+            return total
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM corrections ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM corrections WHERE key = ?", doomed)
+        return total
+
+    def total_bytes(self) -> int:
+        return self._total if self._conn is not None else 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM corrections")
+            self._conn.commit()
+            self._total = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
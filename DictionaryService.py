@@ -2,16 +2,30 @@
 """
 Dictionary Service — глобальные словари с типами correction/terms.
 Один формат файла с полем type; формирование initial_prompt и постобработка исправлений.
+Исправления применяются скомпилированным корректором (одно регулярное выражение-trie на набор
+записей, самое длинное совпадение, один проход по тексту), который кэшируется по содержимому записей.
+Разобранные словари хранятся в реестре процесса (ключ — путь + mtime + размер), список папки — в индексе
+.index.json, который обновляется только для изменившихся файлов.
+initial_prompt можно ограничить бюджетом токенов (Whisper учитывает 223 последних токена):
+записи ранжируются по частоте в транскриптах проекта и по дате добавления (created_at).
+Для больших списков терминов — динамическая подсказка: TermIndex (префиксы и триграммы) подбирает
+термины, близкие к уже распознанному тексту, и бэкенд подставляет их в каждое следующее окно.
 """
 
+import copy
 import json
 import os
+import re
+import threading
+from collections import Counter, OrderedDict
 from dataclasses import asdict, dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 DICTIONARY_SCHEMA_VERSION = 1
 TYPE_CORRECTION = "correction"
 TYPE_TERMS = "terms"
+# Whisper берёт последние max_length // 2 - 1 = 223 токена подсказки (контекст 448)
+DEFAULT_PROMPT_TOKEN_BUDGET = 223
 
 
 @dataclass
@@ -21,20 +35,27 @@ class DictionaryEntry:
     original: str = ""
     corrected: str = ""
     term: str = ""  # для type=terms
+    created_at: str = ""  # ISO-время добавления (из глоссария), опционально
 
     def to_dict(self, dict_type: str) -> dict:
         if dict_type == TYPE_TERMS:
-            return {"term": self.term or self.original or self.corrected}
-        return {"original": self.original, "corrected": self.corrected}
+            d = {"term": self.term or self.original or self.corrected}
+        else:
+            d = {"original": self.original, "corrected": self.corrected}
+        if self.created_at:
+            d["created_at"] = self.created_at
+        return d
 
     @classmethod
     def from_dict(cls, data: dict, dict_type: str) -> "DictionaryEntry":
+        created_at = (data.get("created_at") or "").strip()
         if dict_type == TYPE_TERMS:
             term = (data.get("term") or data.get("original") or data.get("corrected") or "").strip()
-            return cls(original=term, corrected=term, term=term)
+            return cls(original=term, corrected=term, term=term, created_at=created_at)
         return cls(
             original=(data.get("original") or "").strip(),
             corrected=(data.get("corrected") or "").strip(),
+            created_at=created_at,
         )
 
 
@@ -72,6 +93,178 @@ class DictionaryData:
         )
 
 
+def _trie_pattern(words: List[str]) -> str:
+    """
+    Регулярное выражение-trie для набора строк: общие префиксы не повторяются, поэтому поиск
+    не перебирает тысячи альтернатив в каждой позиции. Необязательные хвосты жадные —
+    в каждой позиции сначала пробуется самое длинное совпадение.
+    """
+    trie: dict = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+class CompiledCorrector:
+    """
+    Замены original -> corrected за один проход по тексту; результат замены повторно не обрабатывается.
+    При пересекающихся записях побеждает самое длинное совпадение, при повторе original — первая запись.
+    word_boundary — только целые слова; ignore_case — без учёта регистра.
+    """
+
+    def __init__(self, entries: List[Dict[str, str]], word_boundary: bool = False, ignore_case: bool = False):
+        self.ignore_case = ignore_case
+        self._replacements: Dict[str, str] = {}
+        for entry in entries:
+            orig = entry.get("original") or ""
+            corr = entry.get("corrected") or ""
+            if not orig:
+                continue
+            self._replacements.setdefault(self._key(orig), corr)
+        self._pattern = None
+        if self._replacements:
+            body = _trie_pattern(list(self._replacements))
+            if word_boundary:
+                body = r"(?<!\w)(?:" + body + r")(?!\w)"
+            self._pattern = re.compile(body, re.IGNORECASE if ignore_case else 0)
+
+    def _key(self, s: str) -> str:
+        return s.lower() if self.ignore_case else s
+
+    def apply(self, text: str) -> str:
+        if not self._pattern or not text:
+            return text
+        return self._pattern.sub(lambda m: self._replacements.get(self._key(m.group(0)), m.group(0)), text)
+
+    def count_matches(self, texts: Iterable[str]) -> Dict[str, int]:
+        """Сколько раз каждый original встречается в текстах (ключи — как в _key), без замены."""
+        counts: Dict[str, int] = {}
+        if not self._pattern:
+            return counts
+        for text in texts:
+            for m in self._pattern.finditer(text or ""):
+                key = self._key(m.group(0))
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _trigrams(word: str) -> frozenset:
+    padded = f" {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TermIndex:
+    """
+    Инвертированный индекс терминов для подбора подсказки по уже распознанному тексту.
+    Ключи — префиксы слов (prefix_len символов) и триграммы. Слово текста соответствует слову термина,
+    если сходство множеств триграмм (Жаккар) не ниже min_similarity — так находятся и формы,
+    искажённые распознаванием. lookup() возвращает термины по убыванию числа совпавших слов.
+    """
+
+    def __init__(self, terms: Iterable[str], prefix_len: int = 4, min_similarity: float = 0.5):
+        self.prefix_len = max(1, int(prefix_len))
+        self.min_similarity = min_similarity
+        self.terms: List[str] = []
+        self._term_words: List[List[frozenset]] = []
+        self._by_prefix: Dict[str, set] = {}
+        self._by_trigram: Dict[str, set] = {}
+        seen = set()
+        for term in terms:
+            term = (term or "").strip()
+            words = _WORD_RE.findall(term.lower())
+            if not words or term.lower() in seen:
+                continue
+            seen.add(term.lower())
+            tid = len(self.terms)
+            self.terms.append(term)
+            grams_list = []
+            for w in words:
+                grams = _trigrams(w)
+                grams_list.append(grams)
+                self._by_prefix.setdefault(w[:self.prefix_len], set()).add(tid)
+                for g in grams:
+                    self._by_trigram.setdefault(g, set()).add(tid)
+            self._term_words.append(grams_list)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def lookup(self, text: str, limit: Optional[int] = None) -> List[str]:
+        """Термины, относящиеся к словам text (лучшие первыми), не больше limit."""
+        scores: Dict[int, Tuple[int, float]] = {}  # tid -> (совпавших слов текста, лучшее сходство)
+        for w in set(_WORD_RE.findall((text or "").lower())):
+            grams = _trigrams(w)
+            votes = Counter()
+            for g in grams:
+                votes.update(self._by_trigram.get(g, ()))
+            # Жаккар >= s возможен только при s * |grams| общих триграммах
+            need = self.min_similarity * len(grams)
+            candidates = set(self._by_prefix.get(w[:self.prefix_len], ()))
+            candidates.update(tid for tid, n in votes.items() if n >= need)
+            for tid in candidates:
+                best = max(len(grams & tg) / len(grams | tg) for tg in self._term_words[tid])
+                if best >= self.min_similarity:
+                    hits, sim = scores.get(tid, (0, 0.0))
+                    scores[tid] = (hits + 1, max(sim, best))
+        ranked = sorted(scores, key=lambda tid: (-scores[tid][0], -scores[tid][1], tid))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [self.terms[tid] for tid in ranked]
+
+
+# Реестр разобранных словарей: abs path -> (mtime_ns, size, DictionaryData)
+_registry: Dict[str, Tuple[int, int, "DictionaryData"]] = {}
+# Индексы папок словарей: abs dir -> {file name: {"mtime_ns", "size", "name", "type"}}
+_dir_indexes: Dict[str, Dict[str, dict]] = {}
+_registry_lock = threading.RLock()
+INDEX_FILE_NAME = ".index.json"
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа BPE-токенов Whisper без токенизатора: ~4 символа ASCII или ~2 прочих на токен."""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return -(-ascii_chars // 4) + -(-(len(text) - ascii_chars) // 2)
+
+
+# Кэш собранных подсказок: (записи, бюджет, частоты, токенизатор) -> текст
+_PROMPT_CACHE_SIZE = 16
+_prompt_cache: "OrderedDict[Tuple, str]" = OrderedDict()
+
+# Кэш индексов терминов: набор терминов -> TermIndex
+_TERM_INDEX_CACHE_SIZE = 4
+_term_index_cache: "OrderedDict[Tuple[str, ...], TermIndex]" = OrderedDict()
+# Сколько последних символов распознанного текста используется для подбора терминов
+DYNAMIC_PROMPT_CONTEXT_CHARS = 400
+DYNAMIC_PROMPT_MAX_TERMS = 32
+
+# Кэш корректоров: содержимое записей + опции -> CompiledCorrector
+_CORRECTOR_CACHE_SIZE = 8
+_corrector_cache: "OrderedDict[Tuple, CompiledCorrector]" = OrderedDict()
+_corrector_lock = threading.Lock()
+
+
 def _get_dictionaries_dir() -> str:
     from i18n import get_dictionaries_dir
     return get_dictionaries_dir()
@@ -84,74 +277,146 @@ class DictionaryService:
     def get_dictionaries_dir() -> str:
         return _get_dictionaries_dir()
 
+    @staticmethod
+    def _read_index(base: str) -> Dict[str, dict]:
+        """Индекс папки: из памяти, иначе из .index.json (повреждённый индекс игнорируется)."""
+        index = _dir_indexes.get(base)
+        if index is not None:
+            return index
+        try:
+            with open(os.path.join(base, INDEX_FILE_NAME), "r", encoding="utf-8") as f:
+                index = json.load(f).get("files") or {}
+        except Exception:
+            index = {}
+        _dir_indexes[base] = index
+        return index
+
+    @staticmethod
+    def _write_index(base: str, index: Dict[str, dict]) -> None:
+        path = os.path.join(base, INDEX_FILE_NAME)
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "files": index}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"Dictionary index write error: {e}")
+
     @staticmethod
     def list_dictionaries() -> List[Dict[str, Any]]:
-        """Список словарей в глобальной папке. Возвращает [{"id": "file.json", "path": abs, "name", "type"}, ...]."""
+        """
+        Список словарей в глобальной папке. Возвращает [{"id": "file.json", "path": abs, "name", "type"}, ...].
+        Имя и тип берутся из индекса; разбираются только новые и изменившиеся файлы.
+        """
         result = []
-        base = DictionaryService.get_dictionaries_dir()
+        base = os.path.abspath(DictionaryService.get_dictionaries_dir())
         if not os.path.isdir(base):
             return result
-        for fname in sorted(os.listdir(base)):
-            if not (fname.endswith(".json") or fname.endswith(".widict")):
-                continue
-            path = os.path.join(base, fname)
-            if not os.path.isfile(path):
-                continue
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                dtype = (data.get("type") or TYPE_CORRECTION).strip().lower()
-                if dtype not in (TYPE_CORRECTION, TYPE_TERMS):
-                    dtype = TYPE_CORRECTION
-                result.append({
-                    "id": fname,
-                    "path": os.path.abspath(path),
-                    "name": (data.get("name") or fname).strip(),
-                    "type": dtype,
-                })
-            except Exception:
-                result.append({"id": fname, "path": os.path.abspath(path), "name": fname, "type": TYPE_CORRECTION})
+        with _registry_lock:
+            index = DictionaryService._read_index(base)
+            changed = False
+            seen = set()
+            for fname in sorted(os.listdir(base)):
+                if not (fname.endswith(".json") or fname.endswith(".widict")) or fname == INDEX_FILE_NAME:
+                    continue
+                path = os.path.join(base, fname)
+                if not os.path.isfile(path):
+                    continue
+                sig = _file_signature(path)
+                if sig is None:
+                    continue
+                seen.add(fname)
+                meta = index.get(fname)
+                if meta is None or (meta.get("mtime_ns"), meta.get("size")) != sig:
+                    data = DictionaryService.load(path, quiet=True)
+                    meta = {
+                        "mtime_ns": sig[0],
+                        "size": sig[1],
+                        "name": (data.name or fname) if data else fname,
+                        "type": data.type if data else TYPE_CORRECTION,
+                    }
+                    index[fname] = meta
+                    changed = True
+                result.append({"id": fname, "path": path, "name": meta["name"], "type": meta["type"]})
+            for fname in [f for f in index if f not in seen]:
+                del index[fname]
+                changed = True
+            if changed:
+                DictionaryService._write_index(base, index)
         return result
 
     @staticmethod
-    def load(path: str) -> Optional[DictionaryData]:
-        """Загружает словарь из файла. Файлы без поля type считаются correction (старый глоссарий)."""
+    def load(path: str, quiet: bool = False, editable: bool = False) -> Optional[DictionaryData]:
+        """
+        Загружает словарь из файла. Файлы без поля type считаются correction (старый глоссарий).
+        Результат берётся из реестра, пока у файла те же mtime и размер. Объект общий — только для чтения;
+        editable=True — отдельная копия для редактора: её изменения видны остальным только после save().
+        """
+        path = os.path.abspath(path)
+        sig = _file_signature(path)
+        with _registry_lock:
+            cached = _registry.get(path)
+            if cached is not None and sig is not None and cached[:2] == sig:
+                return copy.deepcopy(cached[2]) if editable else cached[2]
         try:
             with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return DictionaryData.from_dict(data)
+                data = DictionaryData.from_dict(json.load(f))
         except Exception as e:
-            print(f"Dictionary load error: {e}")
+            if not quiet:
+                print(f"Dictionary load error: {e}")
             return None
+        if sig is not None:
+            with _registry_lock:
+                _registry[path] = (sig[0], sig[1], data)
+        return copy.deepcopy(data) if editable and sig is not None else data
 
     @staticmethod
-    def load_by_id(dict_id: str) -> Optional[DictionaryData]:
-        """Загружает словарь по ID (имя файла) из глобальной папки."""
+    def invalidate(path: Optional[str] = None) -> None:
+        """Сбросить реестр для файла (или целиком), например после удаления словаря."""
+        with _registry_lock:
+            if path is None:
+                _registry.clear()
+                _dir_indexes.clear()
+            else:
+                _registry.pop(os.path.abspath(path), None)
+
+    @staticmethod
+    def load_by_id(dict_id: str, editable: bool = False) -> Optional[DictionaryData]:
+        """Загружает словарь по ID (имя файла) из глобальной папки (editable — см. load)."""
         base = DictionaryService.get_dictionaries_dir()
         path = os.path.join(base, dict_id)
         if not os.path.isfile(path):
             return None
-        return DictionaryService.load(path)
+        return DictionaryService.load(path, editable=editable)
 
     @staticmethod
     def save(path: str, data: DictionaryData) -> bool:
-        """Сохраняет словарь в файл."""
+        """Сохраняет словарь в файл; в реестр попадает копия (дальнейшие правки data его не меняют)."""
+        path = os.path.abspath(path)
         try:
             os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
             with open(path, "w", encoding="utf-8") as f:
                 json.dump(data.to_dict(), f, ensure_ascii=False, indent=2)
-            return True
         except Exception as e:
             print(f"Dictionary save error: {e}")
+            DictionaryService.invalidate(path)
             return False
+        sig = _file_signature(path)
+        with _registry_lock:
+            if sig is not None:
+                _registry[path] = (sig[0], sig[1], copy.deepcopy(data))
+            index = _dir_indexes.get(os.path.dirname(path))
+            if index is not None and sig is not None:
+                index[os.path.basename(path)] = {
+                    "mtime_ns": sig[0], "size": sig[1], "name": data.name or os.path.basename(path), "type": data.type,
+                }
+        return True
 
     @staticmethod
-    def build_initial_prompt_text(dictionaries: List[DictionaryData]) -> str:
-        """
-        Объединяет terms и correction из списка словарей в один текст для Whisper initial_prompt.
-        """
-        terms_lines = []
-        correction_lines = []
+    def _prompt_items(dictionaries: List[DictionaryData]) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str, str]]]:
+        """([(term, created_at)], [(original, corrected, created_at)]) в порядке словарей."""
+        terms = []
+        corrections = []
         for d in dictionaries:
             if not d.entries:
                 continue
@@ -159,36 +424,192 @@ class DictionaryService:
                 for e in d.entries:
                     t = (e.term or e.original or e.corrected or "").strip()
                     if t:
-                        terms_lines.append(t)
+                        terms.append((t, e.created_at))
             else:
                 for e in d.entries:
                     if (e.original or "").strip() and (e.corrected or "").strip():
-                        correction_lines.append(f"  {e.original} -> {e.corrected}")
+                        corrections.append((e.original, e.corrected, e.created_at))
+        return terms, corrections
+
+    @staticmethod
+    def _format_prompt(terms: List[str], corrections: List[Tuple[str, str]]) -> str:
         parts = []
-        if terms_lines:
-            parts.append("Use these terms as written: " + ", ".join(terms_lines))
-        if correction_lines:
+        if terms:
+            parts.append("Use these terms as written: " + ", ".join(terms))
+        if corrections:
             parts.append("Use these terms as written:")
-            parts.extend(correction_lines)
+            parts.extend(f"  {orig} -> {corr}" for orig, corr in corrections)
         return "\n".join(parts) if parts else ""
 
+    @staticmethod
+    def count_term_frequencies(dictionaries: List[DictionaryData], texts: Iterable[str]) -> Dict[str, int]:
+        """
+        Сколько раз термины/исправления словарей встречаются в текстах (без учёта регистра).
+        Один проход по тексту регулярным выражением-trie (скомпилированный корректор из кэша get_corrector).
+        Ключи — строки в нижнем регистре.
+        """
+        terms, corrections = DictionaryService._prompt_items(dictionaries)
+        words = {t.lower() for t, _ in terms}
+        for orig, corr, _ in corrections:
+            words.add(orig.lower())
+            words.add(corr.lower())
+        words.discard("")
+        if not words:
+            return {}
+        entries = [{"original": w, "corrected": w} for w in sorted(words)]
+        return DictionaryService.get_corrector(entries, word_boundary=True, ignore_case=True).count_matches(texts)
+
+    @staticmethod
+    def build_initial_prompt_text(
+        dictionaries: List[DictionaryData],
+        token_budget: Optional[int] = None,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        term_frequencies: Optional[Dict[str, int]] = None,
+    ) -> str:
+        """
+        Объединяет terms и correction из списка словарей в один текст для Whisper initial_prompt.
+        token_budget — не больше стольких токенов (count_tokens — токенизатор модели, иначе estimate_tokens):
+        записи ранжируются по term_frequencies (см. count_term_frequencies), затем по created_at (новые выше),
+        в подсказку попадают лучшие. Результат кэшируется для набора записей и параметров.
+        """
+        terms, corrections = DictionaryService._prompt_items(dictionaries)
+        if not token_budget or token_budget <= 0:
+            return DictionaryService._format_prompt(
+                [t for t, _ in terms], [(o, c) for o, c, _ in corrections]
+            )
+        freqs = term_frequencies or {}
+        key = (
+            tuple(terms), tuple(corrections), int(token_budget),
+            tuple(sorted(freqs.items())), count_tokens,
+        )
+        with _registry_lock:
+            cached = _prompt_cache.get(key)
+            if cached is not None:
+                _prompt_cache.move_to_end(key)
+                return cached
+        count = count_tokens or estimate_tokens
+
+        # (частота, время добавления, -порядок) — по убыванию
+        items = [(freqs.get(t.lower(), 0), created, -i, "term", (t,)) for i, (t, created) in enumerate(terms)]
+        items += [
+            (max(freqs.get(o.lower(), 0), freqs.get(c.lower(), 0)), created, -i - len(terms), "corr", (o, c))
+            for i, (o, c, created) in enumerate(corrections)
+        ]
+        items.sort(key=lambda it: it[:3], reverse=True)
+        chosen_terms: List[str] = []
+        chosen_corrections: List[Tuple[str, str]] = []
+        header = count("Use these terms as written:") + 1
+        used = 0
+        for _, _, _, kind, value in items:
+            if kind == "term":
+                cost = count(", " + value[0]) + (0 if chosen_terms else header)
+            else:
+                cost = count(f"\n  {value[0]} -> {value[1]}") + (0 if chosen_corrections else header)
+            if used + cost > token_budget:
+                continue
+            used += cost
+            if kind == "term":
+                chosen_terms.append(value[0])
+            else:
+                chosen_corrections.append(value)
+        text = DictionaryService._format_prompt(chosen_terms, chosen_corrections)
+        # Сумма по кускам — приближение; точная проверка всего текста
+        while text and count(text) > token_budget and (chosen_terms or chosen_corrections):
+            (chosen_corrections if chosen_corrections else chosen_terms).pop()
+            text = DictionaryService._format_prompt(chosen_terms, chosen_corrections)
+        with _registry_lock:
+            _prompt_cache[key] = text
+            while len(_prompt_cache) > _PROMPT_CACHE_SIZE:
+                _prompt_cache.popitem(last=False)
+        return text
+
+    @staticmethod
+    def get_term_index(dictionaries: List[DictionaryData]) -> TermIndex:
+        """TermIndex по терминам словарей (type=terms); строится один раз для набора терминов."""
+        terms, _ = DictionaryService._prompt_items([d for d in dictionaries if d.type == TYPE_TERMS])
+        key = tuple(t for t, _ in terms)
+        with _registry_lock:
+            index = _term_index_cache.get(key)
+            if index is not None:
+                _term_index_cache.move_to_end(key)
+                return index
+        index = TermIndex(key)
+        with _registry_lock:
+            _term_index_cache[key] = index
+            while len(_term_index_cache) > _TERM_INDEX_CACHE_SIZE:
+                _term_index_cache.popitem(last=False)
+        return index
+
+    @staticmethod
+    def build_dynamic_prompt_provider(
+        dictionaries: List[DictionaryData],
+        token_budget: Optional[int] = None,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ) -> Optional[Callable[[str], str]]:
+        """
+        Функция previous_text -> initial_prompt для следующего окна транскрибации: только термины,
+        близкие к концу уже распознанного текста (см. TermIndex), в пределах token_budget.
+        Пустая строка — подходящих терминов нет. None, если в словарях нет терминов.
+        """
+        index = DictionaryService.get_term_index(dictionaries)
+        if not len(index):
+            return None
+        count = count_tokens or estimate_tokens
+        budget = token_budget if token_budget and token_budget > 0 else None
+
+        def provider(previous_text: str) -> str:
+            found = index.lookup((previous_text or "")[-DYNAMIC_PROMPT_CONTEXT_CHARS:], limit=DYNAMIC_PROMPT_MAX_TERMS)
+            chosen: List[str] = []
+            text = ""
+            for term in found:
+                candidate = DictionaryService._format_prompt(chosen + [term], [])
+                if budget is not None and count(candidate) > budget:
+                    break
+                chosen.append(term)
+                text = candidate
+            return text
+
+        return provider
+
+    @staticmethod
+    def get_corrector(
+        correction_entries: List[Dict[str, str]],
+        word_boundary: bool = False,
+        ignore_case: bool = False,
+    ) -> CompiledCorrector:
+        """Скомпилированный корректор для набора записей (из кэша, пока записи и опции не изменились)."""
+        key = (
+            tuple((e.get("original") or "", e.get("corrected") or "") for e in correction_entries),
+            bool(word_boundary),
+            bool(ignore_case),
+        )
+        with _corrector_lock:
+            corrector = _corrector_cache.get(key)
+            if corrector is not None:
+                _corrector_cache.move_to_end(key)
+                return corrector
+        corrector = CompiledCorrector(correction_entries, word_boundary=word_boundary, ignore_case=ignore_case)
+        with _corrector_lock:
+            _corrector_cache[key] = corrector
+            while len(_corrector_cache) > _CORRECTOR_CACHE_SIZE:
+                _corrector_cache.popitem(last=False)
+        return corrector
+
     @staticmethod
     def apply_corrections_to_segments(
         segments: List[dict],
         correction_entries: List[Dict[str, str]],
+        word_boundary: bool = False,
+        ignore_case: bool = False,
     ) -> None:
         """
-        Заменяет в segment["text"] вхождения original на corrected (in-place).
+        Заменяет в segment["text"] вхождения original на corrected (in-place), один проход на сегмент.
         correction_entries: [{"original": "...", "corrected": "..."}, ...]
+        word_boundary — только целые слова; ignore_case — без учёта регистра.
         """
+        corrector = DictionaryService.get_corrector(correction_entries, word_boundary, ignore_case)
         for seg in segments:
-            text = seg.get("text") or ""
-            for entry in correction_entries:
-                orig = entry.get("original") or ""
-                corr = entry.get("corrected") or ""
-                if orig and orig in text:
-                    text = text.replace(orig, corr)
-            seg["text"] = text
+            seg["text"] = corrector.apply(seg.get("text") or "")
 
     @staticmethod
     def get_correction_entries_from_dictionaries(dictionaries: List[DictionaryData]) -> List[Dict[str, str]]:
@@ -1,17 +1,26 @@
 # -*- coding: utf-8 -*-
 """
 Record audio from the default microphone to a WAV file.
-Uses sounddevice for capture and soundfile for writing.
+Uses sounddevice for capture (callback stream into AudioRingBuffer) and soundfile for writing.
 Supports device selection and software gain.
+With output_dir passed to start_recording, audio is written to the file while recording
+(WAV/FLAC, background writer thread); an interrupted recording is repaired by recover_interrupted().
 """
 
+import hashlib
+import json
 import os
+import queue
+import struct
 import tempfile
 import threading
 import time
 from datetime import datetime
 from typing import List, Optional, Tuple
 
+from asr_backends.resampling import StreamingResampler
+from audio_ring_buffer import AudioRingBuffer
+
 try:
     import numpy as np
     import sounddevice as sd
@@ -21,18 +30,150 @@ except ImportError:
     MIC_AVAILABLE = False
 
 
+# Кольцо — последние RING_SECONDS записи (потребители читают с отставанием не больше этого);
+# остальная сессия сбрасывается на диск блоками по SPILL_SECONDS
+RING_SECONDS = 60
+SPILL_SECONDS = 5
+BLOCK_MS = 200
+# Запись на диск: форматы (расширение -> формат soundfile) и очередь блоков писателя (~10 с)
+RECORD_FORMATS = {"wav": "WAV", "flac": "FLAC"}
+WRITER_QUEUE_BLOCKS = 50
+WRITER_FLUSH_S = 1.0
+# Папка маркеров незавершённых записей (в папке кэша приложения)
+RECOVERY_DIR_NAME = "recordings"
+
+
+def _new_recording_path(output_dir: str, ext: str = "wav") -> str:
+    """Имя файла: число.месяц.год_час.минута.секунда.<ext> (с суффиксом _n, если занято)."""
+    base = os.path.join(output_dir, datetime.now().strftime("%d.%m.%Y_%H.%M.%S"))
+    path = f"{base}.{ext}"
+    idx = 0
+    while os.path.exists(path):
+        idx += 1
+        path = f"{base}_{idx}.{ext}"
+    return path
+
+
+def repair_wav_header(path: str) -> bool:
+    """
+    Исправить размеры RIFF и data в WAV, оборванном при сбое (libsndfile пишет их окончательно при закрытии).
+    Неполный последний кадр отрезается. True — заголовок исправлен.
+    """
+    try:
+        with open(path, "r+b") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(0)
+            head = f.read(12)
+            if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+                return False
+            pos = 12
+            block_align = 1
+            while pos + 8 <= size:
+                f.seek(pos)
+                chunk_id, chunk_size = struct.unpack("<4sI", f.read(8))
+                if chunk_id == b"fmt ":
+                    fmt = f.read(min(chunk_size, 16))
+                    if len(fmt) >= 14:
+                        block_align = struct.unpack("<H", fmt[12:14])[0] or 1
+                elif chunk_id == b"data":
+                    data_size = size - pos - 8
+                    data_size -= data_size % block_align
+                    data_size = min(data_size, 0xFFFFFFFF - pos)
+                    f.seek(pos + 4)
+                    f.write(struct.pack("<I", data_size))
+                    f.seek(4)
+                    f.write(struct.pack("<I", pos + data_size))
+                    f.truncate(pos + 8 + data_size)
+                    return True
+                pos += 8 + chunk_size + (chunk_size & 1)
+    except (OSError, struct.error) as e:
+        print(f"WAV repair failed ({path}): {e}")
+    return False
+
+
+class _DiskWriter:
+    """
+    Запись в soundfile.SoundFile из фонового потока: callback только кладёт копию блока в ограниченную очередь
+    (переполнение — блок теряется и учитывается в dropped, поток захвата не блокируется).
+    Пока идёт запись, marker_path (JSON с путём и форматом) позволяет восстановить файл после сбоя.
+    """
+
+    def __init__(self, path: str, sample_rate: int, channels: int, file_format: str = "wav", marker_path: Optional[str] = None):
+        self.path = path
+        self.marker_path = marker_path
+        self.dropped = 0
+        self.error: Optional[str] = None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=WRITER_QUEUE_BLOCKS)
+        self._file = sf.SoundFile(
+            path, "w", samplerate=sample_rate, channels=channels, format=RECORD_FORMATS[file_format]
+        )
+        if marker_path:
+            try:
+                os.makedirs(os.path.dirname(marker_path), exist_ok=True)
+                with open(marker_path, "w", encoding="utf-8") as f:
+                    json.dump({"path": os.path.abspath(path), "format": file_format, "started": time.time()}, f)
+            except OSError as e:
+                print(f"Recording marker not written ({marker_path}): {e}")
+                self.marker_path = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, block, gain: float = 1.0) -> None:
+        """Из callback: копия блока (с усилением) в очередь без ожидания."""
+        data = np.multiply(block, gain, dtype=np.float32) if gain != 1.0 else np.array(block, dtype=np.float32)
+        try:
+            self._queue.put_nowait(data)
+        except queue.Full:
+            self.dropped += len(data)
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        while True:
+            block = self._queue.get()
+            if block is None:
+                return
+            if self.error:
+                continue
+            try:
+                self._file.write(block)
+                if time.monotonic() - last_flush >= WRITER_FLUSH_S:
+                    self._file.flush()
+                    last_flush = time.monotonic()
+            except Exception as e:
+                self.error = str(e) or "Failed to write recording"
+
+    def close(self) -> Optional[str]:
+        """Дописать очередь, закрыть файл (заголовок окончательный), убрать маркер. Ошибка записи или None."""
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            self._file.close()
+        except Exception as e:
+            self.error = self.error or str(e) or "Failed to save recording"
+        if self.marker_path:
+            try:
+                os.unlink(self.marker_path)
+            except OSError:
+                pass
+        return self.error
+
+
 class MicRecordService:
     """Record from microphone to a WAV file. Start, then stop_and_save to get the file path."""
 
-    def __init__(self, sample_rate: int = 44100, channels: int = 1):
+    def __init__(self, sample_rate: int = 44100, channels: int = 1, recovery_dir: Optional[str] = None):
         self.sample_rate = sample_rate
         self.channels = channels
+        self.capture_rate = sample_rate  # частота открытого потока (см. start_recording asr_rate)
+        self._asr_resampler: Optional[StreamingResampler] = None
+        self.recovery_dir = recovery_dir  # маркеры незавершённых записей на диск
+        self._writer: Optional[_DiskWriter] = None
         self._recording = False
-        self._stop_event = threading.Event()
-        self._thread: Optional[threading.Thread] = None
-        self._chunks: list = []
-        self._chunks_lock = threading.Lock()
         self._stream: Optional["sd.InputStream"] = None
+        self._buffer: Optional[AudioRingBuffer] = None
+        self._read_pos = 0  # позиция take_accumulated_chunks в буфере
+        self._audio_event = threading.Event()  # новый блок от callback (для wait_for_audio)
         self._gain = 1.0  # software gain (multiplier for samples)
 
     @staticmethod
@@ -67,111 +208,241 @@ class MicRecordService:
         """Return True if recording is in progress."""
         return self._recording
 
-    def start_recording(self, device: Optional[int] = None) -> Optional[str]:
+    def _on_audio(self, indata, frames, time_info, status) -> None:
+        """Callback аудиопотока: блок копируется в кольцо (с усилением) и в очередь записи на диск; без блокировок."""
+        buffer = self._buffer
+        if buffer is not None:
+            buffer.write(indata, gain=self._gain)
+        writer = self._writer
+        if writer is not None:
+            writer.put(indata, gain=self._gain)
+        self._audio_event.set()
+
+    def _on_stream_finished(self) -> None:
+        self._recording = False
+
+    def _pick_capture_rate(self, device: Optional[int], asr_rate: Optional[int]) -> int:
+        """asr_rate, если устройство открывается на ней (тогда ресемплинг не нужен), иначе sample_rate."""
+        if asr_rate:
+            try:
+                sd.check_input_settings(device=device, channels=self.channels, dtype="float32", samplerate=asr_rate)
+                return int(asr_rate)
+            except Exception:
+                pass
+        return self.sample_rate
+
+    def start_recording(
+        self,
+        device: Optional[int] = None,
+        output_dir: Optional[str] = None,
+        file_format: str = "wav",
+        asr_rate: Optional[int] = None,
+    ) -> Optional[str]:
         """
-        Start recording in a background thread.
+        Start recording (sounddevice callback stream writing into a ring buffer).
         device: sounddevice input device index, or None for default.
+        output_dir: write the file there while recording (file_format "wav" or "flac");
+        None — keep the session in a temporary spill file until stop_and_save.
+        asr_rate: audio will be consumed with take_asr_audio at this rate (16000 for Whisper); the device
+        is opened at asr_rate when it supports it, otherwise at sample_rate with a streaming resampler.
         Returns None on success, or an error message on failure.
         """
         if not MIC_AVAILABLE:
             return "sounddevice and soundfile are required. Install with: pip install sounddevice soundfile"
         if self._recording:
             return "Already recording"
-        self._stop_event.clear()
-        self._chunks = []
-        self._recording = True
-        gain = self._gain
-
-        def record_loop():
+        self._release_buffer()
+        self.capture_rate = self._pick_capture_rate(device, asr_rate)
+        self._asr_resampler = StreamingResampler(self.capture_rate, asr_rate) if asr_rate else None
+        if output_dir is not None:
+            file_format = file_format if file_format in RECORD_FORMATS else "wav"
             try:
-                block_ms = 200
-                block_size = int(self.sample_rate * block_ms / 1000) * self.channels
-                kwargs = dict(
-                    samplerate=self.sample_rate,
-                    channels=self.channels,
-                    dtype="float32",
-                    blocksize=block_size,
+                os.makedirs(output_dir, exist_ok=True)
+                path = _new_recording_path(output_dir, file_format)
+                self._writer = _DiskWriter(
+                    path, self.capture_rate, self.channels, file_format, marker_path=self._marker_path(path)
                 )
-                if device is not None:
-                    kwargs["device"] = device
-                with sd.InputStream(**kwargs) as stream:
-                    while self._recording and not self._stop_event.is_set():
-                        chunk, _ = stream.read(block_size)
-                        if chunk is not None and len(chunk) > 0:
-                            if gain != 1.0:
-                                chunk = (chunk * gain).astype("float32")
-                            with self._chunks_lock:
-                                self._chunks.append(chunk.copy())
-                        time.sleep(0.01)
+            except Exception as e:
+                return str(e) or "Failed to create recording file"
+            self._buffer = AudioRingBuffer(self.capture_rate * RING_SECONDS, channels=self.channels)
+        else:
+            fd, spill_path = tempfile.mkstemp(prefix="wi_mic_", suffix=".f32")
+            os.close(fd)
+            self._buffer = AudioRingBuffer(
+                self.capture_rate * RING_SECONDS,
+                channels=self.channels,
+                spill_path=spill_path,
+                spill_block=self.capture_rate * SPILL_SECONDS,
+            )
+        self._read_pos = 0
+        kwargs = dict(
+            samplerate=self.capture_rate,
+            channels=self.channels,
+            dtype="float32",
+            blocksize=int(self.capture_rate * BLOCK_MS / 1000),
+            callback=self._on_audio,
+            finished_callback=self._on_stream_finished,
+        )
+        if device is not None:
+            kwargs["device"] = device
+        try:
+            self._stream = sd.InputStream(**kwargs)
+            self._recording = True
+            self._stream.start()
+        except Exception as e:
+            self._recording = False
+            self._stream = None
+            self._release_buffer()
+            return str(e) or "Failed to open input device"
+        return None
+
+    def _stop_stream(self) -> None:
+        self._recording = False
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                stream.stop()
+                stream.close()
             except Exception:
                 pass
-            self._recording = False
 
-        self._thread = threading.Thread(target=record_loop, daemon=True)
-        self._thread.start()
-        return None
+    def _release_buffer(self) -> None:
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+
+    def _marker_path(self, path: str) -> Optional[str]:
+        if not self.recovery_dir:
+            return None
+        digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.recovery_dir, digest + ".json")
+
+    @staticmethod
+    def recover_interrupted(recovery_dir: Optional[str]) -> List[str]:
+        """
+        Finalize recordings left open by a crash (markers in recovery_dir): WAV headers are repaired,
+        FLAC frames are self-contained and are kept as is. Returns paths of the recovered files.
+        """
+        recovered = []
+        if not recovery_dir or not os.path.isdir(recovery_dir):
+            return recovered
+        for name in sorted(os.listdir(recovery_dir)):
+            if not name.endswith(".json"):
+                continue
+            marker = os.path.join(recovery_dir, name)
+            try:
+                with open(marker, "r", encoding="utf-8") as f:
+                    info = json.load(f)
+                path = info.get("path") or ""
+                if os.path.isfile(path) and os.path.getsize(path) > 0:
+                    if info.get("format") != "wav" or repair_wav_header(path):
+                        recovered.append(path)
+            except (OSError, ValueError) as e:
+                print(f"Recording recovery failed ({marker}): {e}")
+            try:
+                os.unlink(marker)
+            except OSError:
+                pass
+        return recovered
 
     def take_accumulated_chunks(self) -> Optional["np.ndarray"]:
         """
-        Take and clear currently accumulated chunks (for streaming mode).
-        Returns concatenated float32 array, or None if no data. Thread-safe with recording.
+        Take audio recorded since the previous call (for streaming mode).
+        Returns float32 array (frames, channels), or None if no data. Thread-safe with recording.
+        The array may be a view into the ring buffer: use it right away or copy it.
         """
-        if not MIC_AVAILABLE:
+        buffer = self._buffer
+        if buffer is None:
             return None
-        with self._chunks_lock:
-            if not self._chunks:
-                return None
-            data = np.concatenate(self._chunks, axis=0)
-            self._chunks = []
+        data, self._read_pos = buffer.read(self._read_pos)
         return data
 
+    def wait_for_audio(self, timeout: float) -> bool:
+        """Wait until the capture callback delivers a new block (event-driven consumers instead of polling)."""
+        got = self._audio_event.wait(timeout)
+        self._audio_event.clear()
+        return got
+
+    def take_asr_audio(self, final: bool = False) -> Optional["np.ndarray"]:
+        """
+        Audio recorded since the previous call as float32 mono at asr_rate (start_recording with asr_rate),
+        resampled once by a stateful resampler; the array belongs to the caller. None if there is nothing new.
+        final=True also flushes the resampler tail (call once after the last chunk).
+        Shares the read position with take_accumulated_chunks — use one of them per recording.
+        """
+        buffer, resampler = self._buffer, self._asr_resampler
+        if buffer is None or resampler is None:
+            return None
+        data, self._read_pos = buffer.read(self._read_pos)
+        out = resampler.process(data) if data is not None else None
+        if out is not None and resampler.engine == "passthrough":
+            out = out.copy()  # представление кольца
+        if final:
+            tail = resampler.flush()
+            out = tail if out is None else np.concatenate([out, tail])
+        return out if out is not None and len(out) else None
+
     def get_waveform_tail(self, max_samples: int = 600) -> Optional["np.ndarray"]:
         """
         Return a copy of the most recent samples for waveform display (does not consume chunks).
         Returns float32 array of shape (n,) or None. Thread-safe.
         """
-        if not MIC_AVAILABLE:
+        buffer = self._buffer
+        if buffer is None:
+            return None
+        data = buffer.tail(max(1, max_samples // self.channels + 1))
+        if data is None:
             return None
-        with self._chunks_lock:
-            if not self._chunks:
-                return None
-            data = np.concatenate(self._chunks, axis=0)
-        data = np.asarray(data).ravel()
+        data = data.ravel()
         if len(data) > max_samples:
-            data = data[-max_samples:].copy()
+            data = data[-max_samples:]
         return data
 
     def stop_and_save(self, output_dir: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
         """
         Stop recording and save to a WAV file in output_dir (or temp dir if None).
+        When recording to disk (start_recording with output_dir), finalizes that file; output_dir is ignored.
         Returns (file_path, None) on success, (None, error_message) on failure.
         """
-        if not self._recording and not self._chunks:
+        buffer = self._buffer
+        if buffer is None or (not self._recording and buffer.written == 0):
             return None, "No recording in progress or no data recorded"
-        self._recording = False
-        self._stop_event.set()
-        if self._thread and self._thread.is_alive():
-            self._thread.join(timeout=2.0)
+        self._stop_stream()
+        if self._writer is not None:
+            return self._finish_disk_recording(buffer.written)
         if output_dir is None:
             output_dir = tempfile.gettempdir()
         os.makedirs(output_dir, exist_ok=True)
-        with self._chunks_lock:
-            chunks_snapshot = list(self._chunks)
-            self._chunks = []
-        if not chunks_snapshot:
+        if buffer.written == 0:
+            self._release_buffer()
             return None, "No audio data recorded"
         try:
-            data = np.concatenate(chunks_snapshot, axis=0)
-            # Имя файла: число.месяц.год_час.минута.секунда.wav
-            now = datetime.now()
-            base_name = now.strftime("%d.%m.%Y_%H.%M.%S")
-            base = os.path.join(output_dir, base_name)
-            path = base + ".wav"
-            idx = 0
-            while os.path.exists(path):
-                idx += 1
-                path = f"{base}_{idx}.wav"
-            sf.write(path, data, self.sample_rate)
+            path = _new_recording_path(output_dir)
+            # Блоками из spill-файла: вся сессия в память не загружается
+            with sf.SoundFile(path, "w", samplerate=self.capture_rate, channels=self.channels) as out:
+                for block in buffer.iter_blocks():
+                    out.write(block)
             return os.path.abspath(path), None
         except Exception as e:
             return None, str(e) or "Failed to save recording"
+        finally:
+            self._release_buffer()
+
+    def _finish_disk_recording(self, frames: int) -> Tuple[Optional[str], Optional[str]]:
+        writer, self._writer = self._writer, None
+        self._release_buffer()
+        err = writer.close()
+        if writer.dropped:
+            print(f"Recording: {writer.dropped} frames dropped (disk too slow)")
+        if frames == 0:
+            try:
+                os.unlink(writer.path)
+            except OSError:
+                pass
+            return None, "No audio data recorded"
+        if err:
+            return None, err
+        return os.path.abspath(writer.path), None
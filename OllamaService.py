@@ -1,23 +1,159 @@
 # -*- coding: utf-8 -*-
 """
 Ollama Connect — интеграция с локальными LLM (Ollama) для коррекции текста.
+Запросы коррекции идут через пул постоянных HTTP-соединений (keep-alive, http.client);
+correct_segments отправляет сегменты параллельно (Ollama обслуживает OLLAMA_NUM_PARALLEL запросов)
+в порядке индексов и отдаёт результаты по мере готовности. Подряд идущие сегменты можно отправлять
+пакетами с нумерованными маркерами [[n]] — инструкция передаётся один раз на пакет, у модели есть контекст.
+С on_partial ответы читаются потоком (NDJSON) и частичный текст отдаётся сразу; cancel() закрывает
+открытые соединения — Ollama прекращает генерацию.
 """
 
+import http.client
 import json
-import urllib.error
+import queue
+import re
+import socket
+import threading
+import urllib.parse
 import urllib.request
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional
+
+from DictionaryService import estimate_tokens
 
 DEFAULT_BASE_URL = "http://127.0.0.1:11434"
+DEFAULT_WORKERS = 4
+REQUEST_TIMEOUT_S = 120
+# Пакетная коррекция: токенов текста сегментов в одном запросе (ответ того же размера должен поместиться
+# в контекст модели вместе с инструкцией; num_ctx Ollama по умолчанию 2048–4096)
+DEFAULT_BATCH_TOKENS = 600
+MAX_BATCH_SEGMENTS = 40
+_MARKER_RE = re.compile(r"\[\[(\d+)\]\]")
+CANCELLED_ERROR = "Cancelled"
+
+
+class _ApiError(Exception):
+    """Ответ Ollama с кодом ошибки; текст — для get_last_error()."""
+
+
+class _ConnectionPool:
+    """Пул keep-alive соединений к одному хосту: соединение берётся на запрос и возвращается после чтения ответа."""
+
+    def __init__(self, base_url: str, size: int = DEFAULT_WORKERS, timeout: float = REQUEST_TIMEOUT_S):
+        parts = urllib.parse.urlsplit(base_url)
+        self._https = parts.scheme == "https"
+        self._host = parts.hostname or "127.0.0.1"
+        self._port = parts.port
+        self._timeout = timeout
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, int(size)))
+        self._lock = threading.Lock()
+        self._active = set()
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        return cls(self._host, self._port, timeout=self._timeout)
+
+    def _open(self, method: str, path: str, payload: Optional[bytes], headers: dict):
+        """(conn, response) — обрыв переиспользованного соединения до ответа — один повтор на новом."""
+        for attempt in (0, 1):
+            try:
+                conn = self._idle.get_nowait()
+                reused = True
+            except queue.Empty:
+                conn, reused = self._new_connection(), False
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue  # сервер закрыл простаивавшее соединение
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+    def request_json(
+        self,
+        method: str,
+        path: str,
+        body: Optional[dict] = None,
+        on_line: Optional[Callable[[dict], None]] = None,
+    ) -> dict:
+        """
+        Запрос с JSON-телом, ответ — JSON.
+        on_line — потоковый ответ (NDJSON): вызывается для каждой строки, возвращается последняя.
+        """
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        with self._slots:
+            conn, resp = self._open(method, path, payload, headers)
+            with self._lock:
+                self._active.add(conn)
+            try:
+                if resp.status >= 400 or on_line is None:
+                    raw = resp.read()
+                    out = None
+                else:
+                    out = {}
+                    for raw_line in iter(resp.readline, b""):
+                        if not raw_line.strip():
+                            continue
+                        out = json.loads(raw_line.decode("utf-8"))
+                        if out.get("error"):
+                            raise _ApiError(out["error"])
+                        on_line(out)
+            except Exception:
+                conn.close()
+                raise
+            finally:
+                with self._lock:
+                    self._active.discard(conn)
+            if resp.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+        if resp.status >= 400:
+            text = raw.decode("utf-8", "replace")
+            try:
+                message = json.loads(text).get("error") if text.strip().startswith("{") else text
+            except Exception:
+                message = text
+            raise _ApiError(message or f"{resp.status} {resp.reason}")
+        return out if out is not None else json.loads(raw.decode("utf-8") or "{}")
+
+    def abort_active(self) -> None:
+        """Закрыть соединения с идущими запросами (чтение ответа в рабочем потоке завершится ошибкой)."""
+        with self._lock:
+            active = list(self._active)
+        for conn in active:
+            try:
+                if conn.sock is not None:
+                    conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
 
 
 class OllamaService:
     """Проверка доступности Ollama и коррекция текста через API."""
     DEFAULT_MODEL = "llama3.2"
 
-    def __init__(self, base_url: str = DEFAULT_BASE_URL):
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, workers: int = DEFAULT_WORKERS):
         self.base_url = base_url.rstrip("/")
+        self.workers = max(1, int(workers or 1))
         self._last_error: Optional[str] = None
+        self._pool = _ConnectionPool(self.base_url, size=self.workers)
+        self._cancel_event = threading.Event()
 
     def is_available(self) -> bool:
         """Проверяет, доступен ли Ollama (GET /api/tags или /api/version)."""
@@ -61,19 +197,71 @@ class OllamaService:
                 return name
         return full[0]
 
+    def cancel(self) -> None:
+        """Прервать коррекцию: запросы из очереди не отправляются, идущие обрываются (Ollama освобождает модель)."""
+        self._cancel_event.set()
+        self._pool.abort_active()
+
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
     def get_last_error(self) -> Optional[str]:
         """Текст последней ошибки API (для отображения пользователю)."""
         return self._last_error
 
+    @staticmethod
+    def _system_instruction(system_prompt: Optional[str]) -> str:
+        system_instruction = "You are a transcription corrector. Only fix typos, punctuation, and grammar. Never translate: keep the exact same language as the input."
+        if system_prompt and system_prompt.strip():
+            system_instruction = system_instruction + "\n\n" + system_prompt.strip()
+        return system_instruction
+
+    def _generate(
+        self,
+        prompt: str,
+        model: str,
+        system_prompt: Optional[str],
+        on_text: Optional[Callable[[str], None]] = None,
+    ) -> Optional[str]:
+        """
+        POST /api/generate; ответ модели или None при ошибке или отмене (см. get_last_error).
+        on_text(text_so_far) — потоковый режим: вызывается по мере генерации.
+        """
+        if self._cancel_event.is_set():
+            self._last_error = CANCELLED_ERROR
+            return None
+        body = {
+            "model": model,
+            "prompt": prompt,
+            "stream": on_text is not None,
+            "system": self._system_instruction(system_prompt),
+        }
+        parts: List[str] = []
+
+        def on_line(chunk: dict) -> None:
+            token = chunk.get("response") or ""
+            if token:
+                parts.append(token)
+                on_text("".join(parts))
+
+        try:
+            out = self._pool.request_json("POST", "/api/generate", body, on_line=on_line if on_text else None)
+            return "".join(parts) if on_text else out.get("response", "")
+        except Exception as e:
+            self._last_error = CANCELLED_ERROR if self._cancel_event.is_set() else (str(e) or type(e).__name__)
+            return None
+
     def correct_text(
         self,
         text: str,
         model: str = None,
         system_prompt: Optional[str] = None,
+        on_text: Optional[Callable[[str], None]] = None,
     ) -> Optional[str]:
         """
         Отправляет текст на коррекцию. Возвращает исправленный текст или None при ошибке.
         system_prompt: опционально — контекст (например, глоссарий терминов).
+        on_text(text_so_far) — потоковый ответ: частичный текст по мере генерации.
         """
         if not (text or "").strip():
             return text
@@ -85,40 +273,112 @@ class OllamaService:
 Text to correct:
 {text}"""
 
-        system_instruction = "You are a transcription corrector. Only fix typos, punctuation, and grammar. Never translate: keep the exact same language as the input."
-        if system_prompt and system_prompt.strip():
-            system_instruction = system_instruction + "\n\n" + system_prompt.strip()
-        body = {
-            "model": model,
-            "prompt": prompt,
-            "stream": False,
-            "system": system_instruction,
-        }
-
         self._last_error = None
-        try:
-            data = json.dumps(body).encode("utf-8")
-            req = urllib.request.Request(
-                f"{self.base_url}/api/generate",
-                data=data,
-                method="POST",
-                headers={"Content-Type": "application/json"},
-            )
-            with urllib.request.urlopen(req, timeout=120) as r:
-                out = json.loads(r.read().decode())
-            response = out.get("response", "").strip()
-            return response if response else text
-        except urllib.error.HTTPError as e:
-            try:
-                err_body = e.fp.read().decode() if e.fp else ""
-                parsed = json.loads(err_body) if err_body.strip().startswith("{") else {}
-                self._last_error = parsed.get("error", err_body) or f"{e.code} {e.reason}"
-            except Exception:
-                self._last_error = f"{e.code} {e.reason}"
+        response = self._generate(prompt, model, system_prompt, on_text=on_text)
+        if response is None:
             return None
-        except Exception as e:
-            self._last_error = str(e)
+        response = response.strip()
+        return response if response else text
+
+    @staticmethod
+    def plan_batches(
+        segments: List[dict],
+        batch_tokens: int,
+        max_segments: int = MAX_BATCH_SEGMENTS,
+        indices: Optional[Iterable[int]] = None,
+    ) -> List[List[int]]:
+        """
+        Индексы непустых сегментов, сгруппированные в пакеты подряд идущих сегментов:
+        в пакете не больше batch_tokens токенов текста (оценка) и max_segments сегментов.
+        Сегмент длиннее batch_tokens образует отдельный пакет. indices — только эти сегменты (по порядку).
+        """
+        batches: List[List[int]] = []
+        current: List[int] = []
+        used = 0
+        for i in (range(len(segments)) if indices is None else indices):
+            text = (segments[i].get("text") or "").strip()
+            if not text:
+                continue
+            cost = estimate_tokens(text) + 3  # + маркер [[n]]
+            if current and (used + cost > batch_tokens or len(current) >= max_segments):
+                batches.append(current)
+                current, used = [], 0
+            current.append(i)
+            used += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _batch_prompt(texts: List[str]) -> str:
+        numbered = "\n".join(f"[[{n}]] {' '.join(t.split())}" for n, t in enumerate(texts, start=1))
+        return f"""Correct the following transcription segments: fix only typos, punctuation, and grammar. Keep the EXACT SAME LANGUAGE as the input — do NOT translate. Each segment starts with a marker [[n]]. Return every segment with its marker, in the same order, one per line; do not merge, split or drop segments. Output ONLY the corrected segments, no explanations.
+
+Segments:
+{numbered}"""
+
+    @staticmethod
+    def _marked_texts(response: str, count: int) -> Dict[int, str]:
+        """{n: текст} по маркерам [[n]] частичного ответа (последний текст может быть неполным)."""
+        parts = _MARKER_RE.split(response or "")
+        out = {}
+        for k in range(1, len(parts) - 1, 2):
+            n = int(parts[k])
+            if 1 <= n <= count and n not in out:
+                out[n] = " ".join(parts[k + 1].split())
+        return out
+
+    @staticmethod
+    def parse_batch_response(response: str, count: int) -> Optional[List[str]]:
+        """Тексты сегментов 1..count из ответа с маркерами [[n]]; None, если маркеры неполные или повторяются."""
+        parts = _MARKER_RE.split(response or "")
+        # split: [до первого маркера, n1, текст1, n2, текст2, ...]
+        found = {}
+        for k in range(1, len(parts) - 1, 2):
+            n = int(parts[k])
+            text = " ".join(parts[k + 1].split())
+            if n in found or not 1 <= n <= count or not text:
+                return None
+            found[n] = text
+        if len(found) != count:
             return None
+        return [found[n] for n in range(1, count + 1)]
+
+    def _correct_batch(
+        self,
+        segments: List[dict],
+        indices: List[int],
+        model: str,
+        system_prompt: Optional[str],
+        on_partial: Optional[Callable[[int, str], None]] = None,
+    ):
+        """{index: corrected text} для пакета; при неразборчивом ответе — посегментно; None при ошибке API."""
+        texts = [segments[i].get("text", "").strip() for i in indices]
+        if len(indices) > 1:
+            on_text = None
+            if on_partial:
+                shown: Dict[int, str] = {}
+
+                def on_text(so_far: str) -> None:
+                    for n, text in self._marked_texts(so_far, len(indices)).items():
+                        if text and shown.get(n) != text:
+                            shown[n] = text
+                            on_partial(indices[n - 1], text)
+
+            response = self._generate(self._batch_prompt(texts), model, system_prompt, on_text=on_text)
+            if response is None:
+                return None
+            parsed = self.parse_batch_response(response, len(indices))
+            if parsed is not None:
+                return dict(zip(indices, parsed))
+        out = {}
+        for i, text in zip(indices, texts):
+            on_text = (lambda so_far, i=i: on_partial(i, so_far.strip())) if on_partial else None
+            corrected = self.correct_text(text, model=model, system_prompt=system_prompt, on_text=on_text)
+            if corrected is None:
+                return None
+            out[i] = corrected
+        return out
 
     def correct_segments(
         self,
@@ -126,30 +386,79 @@ Text to correct:
         model: str = None,
         system_prompt: Optional[str] = None,
         progress_callback=None,
+        on_segment: Optional[Callable[[int, dict], None]] = None,
+        workers: Optional[int] = None,
+        batch_tokens: int = 0,
+        on_partial: Optional[Callable[[int, str], None]] = None,
+        cache=None,
     ) -> Optional[List[dict]]:
         """
         Корректирует текст каждого сегмента (in-place не меняет, возвращает новый список).
-        progress_callback(current_index, total, segment_text) — опционально для UI.
+        Запросы идут параллельно (workers, по умолчанию self.workers) и ставятся в очередь по порядку индексов.
+        batch_tokens > 0: подряд идущие сегменты отправляются пакетами до batch_tokens токенов
+        с нумерованными маркерами (см. plan_batches); пакет, ответ на который не разобран, — посегментно.
+        progress_callback(done_count, total, segment_text) — опционально для UI;
+        on_segment(index, corrected_segment) — сразу по готовности сегмента (из рабочего потока).
+        on_partial(index, text_so_far) — потоковые ответы: частичный текст сегмента до готовности.
+        cache — CorrectionCacheService: найденные в нём сегменты не отправляются, новые ответы сохраняются.
+        При ошибке API или cancel() оставшиеся запросы отменяются, возвращается None.
         """
         if model is None:
             model = self.DEFAULT_MODEL
-        result = []
+        self._last_error = None
+        self._cancel_event.clear()
         total = len(segments)
+        result: List[Optional[dict]] = [dict(seg) for seg in segments]
+        done = 0
+
+        def report(i: int) -> None:
+            nonlocal done
+            done += 1
+            if on_segment:
+                on_segment(i, result[i])
+            if progress_callback:
+                progress_callback(done, total, result[i].get("text", ""))
+
+        system = self._system_instruction(system_prompt)
+        todo: List[int] = []
         for i, seg in enumerate(segments):
-            text = seg.get("text", "").strip()
-            if not text:
-                result.append(dict(seg))
-                if progress_callback:
-                    progress_callback(i + 1, total, text)
-                continue
-            corrected = self.correct_text(text, model=model, system_prompt=system_prompt)
-            if corrected is None:
-                # Ошибка API (например, модель не найдена) — прерываем, не спамим запросами
-                return None
+            text = (seg.get("text") or "").strip()
+            cached = cache.get(model, system, text) if cache is not None and text else None
+            if cached is not None:
+                result[i]["text"] = cached
+            if not text or cached is not None:
+                report(i)
             else:
-                new_seg = dict(seg)
-                new_seg["text"] = corrected
-                result.append(new_seg)
-            if progress_callback:
-                progress_callback(i + 1, total, corrected or text)
+                todo.append(i)
+        if batch_tokens and batch_tokens > 0:
+            units = self.plan_batches(segments, batch_tokens, indices=todo)
+        else:
+            units = [[i] for i in todo]
+        failed = threading.Event()
+
+        def correct_unit(indices: List[int]):
+            if failed.is_set():
+                return None
+            out = self._correct_batch(segments, indices, model, system_prompt, on_partial=on_partial)
+            if out is None:
+                failed.set()
+            return out
+
+        with ThreadPoolExecutor(max_workers=max(1, int(workers or self.workers))) as pool:
+            futures = [pool.submit(correct_unit, unit) for unit in units]
+            for fut in as_completed(futures):
+                corrected = fut.result()
+                if corrected is None:
+                    # Ошибка API (например, модель не найдена) — прерываем, не спамим запросами
+                    failed.set()
+                    for other in futures:
+                        other.cancel()
+                    break
+                for i, text in sorted(corrected.items()):
+                    result[i]["text"] = text
+                    if cache is not None:
+                        cache.put(model, system, segments[i].get("text", ""), text)
+                    report(i)
+        if failed.is_set():
+            return None
         return result
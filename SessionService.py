@@ -2,17 +2,31 @@
 """
 Session System — единый источник истины для проекта транскрибации.
 Файл .wiproject хранит: пути к аудио, транскрипт с таймлайнами, историю правок, ссылку на глоссарий.
+v3: .wiproject — компактный манифест, транскрипт каждого медиафайла — отдельный JSON в папке
+<имя>.witranscripts рядом с ним; при сохранении перезаписываются только изменённые транскрипты.
+Все записи атомарные (временный файл + os.replace). Файлы v1/v2 по-прежнему читаются.
+load_session(lazy=True) читает только манифест и текущий транскрипт; остальные подгружаются
+при обращении (LazyFileTranscripts с небольшим LRU-кэшем).
 """
 
+import copy
+import hashlib
 import json
 import os
-from dataclasses import asdict, dataclass, field
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from dataclasses import asdict, dataclass, field, replace
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 
 # Версия схемы для обратной совместимости при изменении формата
 SCHEMA_VERSION = 1
 SCHEMA_VERSION_MULTI_FILE = 2
+SCHEMA_VERSION_SPLIT = 3
+TRANSCRIPTS_DIR_SUFFIX = ".witranscripts"
+# Сколько прочитанных с диска транскриптов держать в памяти при ленивой загрузке
+DEFAULT_LAZY_CACHE_SIZE = 8
 
 
 @dataclass
@@ -87,9 +101,143 @@ class SessionData:
         return cls(**filtered)
 
 
+class LazyFileTranscripts(MutableMapping):
+    """
+    file_transcripts проекта v3 с загрузкой по требованию: rel_path -> сегменты.
+    Прочитанные с диска транскрипты хранятся в LRU-кэше на cache_size файлов вместе со снимком
+    сохранённого состояния: правки на месте (seg["text"] = ...) видны в is_modified, а при вытеснении
+    из кэша такой транскрипт не теряется, а остаётся в памяти как изменённый.
+    Присвоенные значения держатся в памяти до сохранения (mark_saved).
+    """
+
+    def __init__(
+        self,
+        project_path: str,
+        files: Dict[str, str],
+        segment_counts: Optional[Dict[str, int]] = None,
+        cache_size: int = DEFAULT_LAZY_CACHE_SIZE,
+    ):
+        self.project_path = os.path.abspath(project_path)
+        self._files = dict(files)  # rel -> имя файла в .witranscripts
+        self._counts = dict(segment_counts or {})
+        self._cache_size = max(1, int(cache_size))
+        self._cache: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self._modified: Dict[str, List[dict]] = {}
+        self._snapshots: Dict[str, List[dict]] = {}  # rel -> копия того, что лежит на диске
+        self._lock = threading.RLock()
+
+    def __getitem__(self, rel: str) -> List[dict]:
+        with self._lock:
+            if rel in self._modified:
+                return self._modified[rel]
+            if rel in self._cache:
+                self._cache.move_to_end(rel)
+                return self._cache[rel]
+            if rel not in self._files:
+                raise KeyError(rel)
+            segments = SessionService.load_file_transcript(self.project_path, rel, self._files[rel])
+            self._cache_put(rel, segments)
+            return segments
+
+    def _cache_put(self, rel: str, segments: List[dict]) -> None:
+        self._cache[rel] = segments
+        self._snapshots[rel] = copy.deepcopy(segments)
+        while len(self._cache) > self._cache_size:
+            old_rel, old = self._cache.popitem(last=False)
+            if old != self._snapshots.pop(old_rel, None):
+                self._modified[old_rel] = old  # изменён на месте и не сохранён — не выбрасываем
+
+    def __setitem__(self, rel: str, segments: List[dict]) -> None:
+        with self._lock:
+            self._cache.pop(rel, None)
+            self._snapshots.pop(rel, None)
+            self._modified[rel] = segments
+
+    def __delitem__(self, rel: str) -> None:
+        with self._lock:
+            found = rel in self._files or rel in self._modified
+            self._files.pop(rel, None)
+            self._counts.pop(rel, None)
+            self._cache.pop(rel, None)
+            self._snapshots.pop(rel, None)
+            self._modified.pop(rel, None)
+            if not found:
+                raise KeyError(rel)
+
+    def __iter__(self):
+        with self._lock:
+            keys = list(self._files) + [k for k in self._modified if k not in self._files]
+        return iter(keys)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(set(self._files) | set(self._modified))
+
+    def __contains__(self, rel) -> bool:
+        with self._lock:
+            return rel in self._files or rel in self._modified
+
+    def is_loaded(self, rel: str) -> bool:
+        """Транскрипт уже в памяти (изменён или в кэше)."""
+        with self._lock:
+            return rel in self._modified or rel in self._cache
+
+    def loaded_values(self) -> List[List[dict]]:
+        """Транскрипты, уже находящиеся в памяти (без чтения с диска)."""
+        with self._lock:
+            return list(self._modified.values()) + [v for k, v in self._cache.items() if k not in self._modified]
+
+    def is_modified(self, rel: str) -> bool:
+        """Присвоен заново или изменён на месте после чтения/сохранения."""
+        with self._lock:
+            if rel in self._modified:
+                return True
+            return rel in self._cache and self._cache[rel] != self._snapshots.get(rel)
+
+    def segment_count(self, rel: str) -> int:
+        """Число сегментов без чтения файла (из манифеста), для изменённых — фактическое."""
+        with self._lock:
+            if rel in self._modified:
+                return len(self._modified[rel])
+            if rel in self._cache:
+                return len(self._cache[rel])
+            if rel in self._counts:
+                return self._counts[rel]
+        return len(self.get(rel) or [])
+
+    def mark_saved(self, files: Dict[str, str], segment_counts: Dict[str, int]) -> None:
+        """После сохранения в project_path: изменённые транскрипты уходят в LRU-кэш."""
+        with self._lock:
+            self._files = dict(files)
+            self._counts = dict(segment_counts)
+            modified, self._modified = self._modified, {}
+            for rel, segments in self._cache.items():
+                self._snapshots[rel] = copy.deepcopy(segments)
+            for rel, segments in modified.items():
+                self._cache_put(rel, segments)
+
+
 class SessionService:
     """Сохранение и загрузка сессии в файл .wiproject (JSON)."""
 
+    @staticmethod
+    def has_transcript(file_transcripts, rel_path: str) -> bool:
+        """Есть ли непустой транскрипт (для LazyFileTranscripts — без чтения файла)."""
+        if isinstance(file_transcripts, LazyFileTranscripts):
+            return rel_path in file_transcripts and file_transcripts.segment_count(rel_path) > 0
+        return bool(file_transcripts.get(rel_path))
+
+    @staticmethod
+    def editable_transcript(file_transcripts, rel_path: str) -> List[dict]:
+        """Копия транскрипта для редактора: правки сегментов не меняют file_transcripts до store_transcript."""
+        return [dict(seg) for seg in (file_transcripts.get(rel_path) or [])]
+
+    @staticmethod
+    def store_transcript(file_transcripts, dirty: set, rel_path: str, segments: List[dict]) -> None:
+        """Записать транскрипт в file_transcripts и добавить rel_path в dirty (для save_session)."""
+        file_transcripts[rel_path] = list(segments)
+        dirty.add(rel_path)
+
     @staticmethod
     def _make_path_relative_to_project(audio_path: str, project_path: str) -> str:
         """Возвращает путь к аудио относительно папки, в которой лежит .wiproject."""
@@ -110,44 +258,111 @@ class SessionService:
         return resolved
 
     @staticmethod
-    def save_session(project_path: str, session: SessionData) -> bool:
+    def transcripts_dir(project_path: str) -> str:
+        """Папка с транскриптами v3: <project>.witranscripts рядом с .wiproject."""
+        return os.path.splitext(os.path.abspath(project_path))[0] + TRANSCRIPTS_DIR_SUFFIX
+
+    @staticmethod
+    def _transcript_file_name(rel_path: str) -> str:
+        """Имя файла транскрипта по относительному пути медиафайла (пути могут содержать подпапки)."""
+        key = rel_path.replace("\\", "/")
+        stem = os.path.splitext(os.path.basename(key))[0][:40]
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+        return f"{stem}-{digest}.json"
+
+    @staticmethod
+    def _write_json_atomic(path: str, data, compact: bool = True) -> None:
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            if compact:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            else:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load_file_transcript(project_path: str, rel_path: str, file_name: Optional[str] = None) -> List[dict]:
+        """Транскрипт одного файла проекта v3 (пустой список, если файла нет или он повреждён)."""
+        name = file_name or SessionService._transcript_file_name(rel_path)
+        try:
+            with open(os.path.join(SessionService.transcripts_dir(project_path), name), "r", encoding="utf-8") as f:
+                return list(json.load(f).get("segments") or [])
+        except Exception as e:
+            print(f"Transcript load error ({rel_path}): {e}")
+            return []
+
+    @staticmethod
+    def save_session(project_path: str, session: SessionData, dirty: Optional[Iterable[str]] = None) -> bool:
         """
-        Сохраняет сессию в файл .wiproject (JSON).
-        v2: пишем file_transcripts (ключи — относительные пути) и current_file (относительный).
-        v1-совместимость: если передан старый session с audio_path/transcript, сохраняем как v2 с одним файлом.
+        Сохраняет сессию (v3): манифест .wiproject + по файлу на транскрипт в <project>.witranscripts.
+        dirty — относительные пути изменённых транскриптов; None — переписать все.
+        Транскрипты, которых ещё нет на диске (новый проект, «Сохранить как»), пишутся всегда.
+        Если file_transcripts не задан, сохраняется единственный файл audio_path/transcript.
         """
         try:
             session.updated_at = datetime.utcnow().isoformat() + "Z"
-            payload = session.to_dict()
-            payload["version"] = SCHEMA_VERSION_MULTI_FILE
-            # v2: file_transcripts и current_file_rel уже в payload если заданы
             if session.file_transcripts is not None:
-                payload["file_transcripts"] = session.file_transcripts
-                payload["current_file"] = session.current_file_rel or ""
+                file_transcripts = session.file_transcripts
+                current_rel = session.current_file_rel or ""
             else:
-                # Сохранение из старого формата или единственного файла: один ключ в file_transcripts
-                rel = SessionService._make_path_relative_to_project(
-                    session.audio_path, project_path
-                )
-                payload["file_transcripts"] = {rel: list(session.transcript)}
-                payload["current_file"] = rel
-            # Для обратной совместимости читателей v1 оставляем audio_path и transcript
+                current_rel = SessionService._make_path_relative_to_project(session.audio_path, project_path)
+                file_transcripts = {current_rel: list(session.transcript)}
+            dirty_set = None if dirty is None else set(dirty)
+
+            tdir = SessionService.transcripts_dir(project_path)
+            os.makedirs(tdir, exist_ok=True)
+            lazy = file_transcripts if isinstance(file_transcripts, LazyFileTranscripts) else None
+            files = {}
+            counts = {}
+            for rel in list(file_transcripts.keys()):
+                name = SessionService._transcript_file_name(rel)
+                files[rel] = name
+                target = os.path.join(tdir, name)
+                if dirty_set is None or rel in dirty_set or not os.path.isfile(target) or (
+                    lazy is not None and lazy.is_modified(rel)
+                ):
+                    segments = list(file_transcripts.get(rel) or [])
+                    SessionService._write_json_atomic(target, {"file": rel, "segments": segments})
+                    counts[rel] = len(segments)
+                elif lazy is not None:
+                    counts[rel] = lazy.segment_count(rel)
+                else:
+                    counts[rel] = len(file_transcripts.get(rel) or [])
+
+            # Транскрипты пишутся отдельно — не копируем их в манифест (asdict делает глубокую копию)
+            payload = replace(session, transcript=[], file_transcripts=None).to_dict()
+            for key in ("transcript", "file_transcripts", "current_file_rel"):
+                payload.pop(key, None)
+            payload["version"] = SCHEMA_VERSION_SPLIT
             payload["audio_path"] = SessionService._make_path_relative_to_project(
                 session.audio_path, project_path
-            )
-            if "transcript" not in payload or payload["transcript"] is None:
-                payload["transcript"] = session.transcript
-            with open(project_path, "w", encoding="utf-8") as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
+            ) if session.audio_path else current_rel
+            payload["current_file"] = current_rel
+            payload["files"] = files
+            payload["segment_counts"] = counts
+            SessionService._write_json_atomic(project_path, payload, compact=False)
+            if lazy is not None and lazy.project_path == os.path.abspath(project_path):
+                lazy.mark_saved(files, counts)
+
+            # Удалить транскрипты файлов, которых больше нет в проекте (переименование/удаление)
+            keep = set(files.values())
+            for name in os.listdir(tdir):
+                if name.endswith(".json") and name not in keep:
+                    try:
+                        os.remove(os.path.join(tdir, name))
+                    except OSError:
+                        pass
             return True
         except Exception as e:
             print(f"Session save error: {e}")
             return False
 
     @staticmethod
-    def load_session(project_path: str) -> Optional[SessionData]:
+    def load_session(project_path: str, lazy: bool = False) -> Optional[SessionData]:
         """
         Загружает сессию из файла .wiproject.
+        v3: транскрипты читаются из папки <project>.witranscripts по манифесту "files";
+        lazy=True — file_transcripts = LazyFileTranscripts, с диска сразу читается только текущий файл.
         v2: заполняет file_transcripts (ключи остаются относительными), current_file_rel, audio_path = абсолютный текущий файл.
         v1: file_transcripts = { relpath(audio_path): transcript }, current_file_rel = relpath(audio_path).
         """
@@ -157,7 +372,16 @@ class SessionService:
             # v2: в файле могут быть "file_transcripts" и "current_file" (в JSON ключ current_file)
             file_transcripts = data.get("file_transcripts")
             current_file_rel = data.get("current_file")
-            if file_transcripts is None and data.get("audio_path"):
+            if data.get("version", 0) >= SCHEMA_VERSION_SPLIT:
+                files = data.get("files") or {}
+                if lazy:
+                    file_transcripts = LazyFileTranscripts(project_path, files, data.get("segment_counts"))
+                else:
+                    file_transcripts = {
+                        rel: SessionService.load_file_transcript(project_path, rel, name)
+                        for rel, name in files.items()
+                    }
+            elif file_transcripts is None and data.get("audio_path"):
                 # v1: один файл; в файле audio_path уже относительный
                 rel = data["audio_path"]
                 file_transcripts = {rel: data.get("transcript", [])}
@@ -217,7 +441,10 @@ class SessionService:
             dictionary_presets=dictionary_presets if dictionary_presets else None,
         )
         if project_path is not None and file_transcripts is not None:
-            s.file_transcripts = dict(file_transcripts)
+            # Ленивый словарь не копируем — иначе с диска прочитаются все транскрипты
+            s.file_transcripts = (
+                file_transcripts if isinstance(file_transcripts, LazyFileTranscripts) else dict(file_transcripts)
+            )
             s.current_file_rel = current_file_rel or (
                 SessionService._make_path_relative_to_project(audio_path, project_path)
                 if audio_path else None
@@ -2,10 +2,40 @@
 """
 TranscriptionService: facade over ASR backends.
 Selects backend by config key transcription_engine: "faster-whisper" | "whisper-streaming" | "whisperx".
+Loaded models are kept in an LRU cache keyed by (engine, model_size, device, compute_type, load options),
+so repeated Start presses and switching to/from the mic streaming engine reuse a warm model.
+transcribe_with_checkpoint() resumes an interrupted run from a TranscriptionCheckpoint (CheckpointService).
 """
+import gc
 import os
 import sys
-from typing import Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Примерный объём памяти модели (МБ) при float16; для остальных compute_type масштабируется
+_MODEL_MEMORY_MB = {
+    "tiny": 75,
+    "base": 145,
+    "small": 480,
+    "medium": 1500,
+    "large-v1": 3100,
+    "large-v2": 3100,
+    "large-v3": 3100,
+}
+_UNKNOWN_MODEL_MEMORY_MB = 3100
+_COMPUTE_TYPE_FACTOR = {
+    "float32": 2.0,
+    "float16": 1.0,
+    "bfloat16": 1.0,
+    "int8_float32": 0.5,
+    "int8_float16": 0.5,
+    "int8_bfloat16": 0.5,
+    "int8": 0.5,
+}
+# Бюджет памяти кэша моделей по умолчанию (config key model_cache_budget_mb)
+DEFAULT_MODEL_CACHE_BUDGET_MB = 8192
+
 
 # Avoid circular import: load_config is used lazily in get_backend
 def _load_config():
@@ -27,29 +57,62 @@ def _get_backend_class(engine: str):
     return FasterWhisperBackend
 
 
+def _estimate_model_mb(model_size: str, compute_type: str) -> float:
+    """Грубая оценка памяти, занимаемой загруженной моделью (для бюджета LRU-кэша)."""
+    base = _MODEL_MEMORY_MB.get((model_size or "").strip().lower(), _UNKNOWN_MODEL_MEMORY_MB)
+    return base * _COMPUTE_TYPE_FACTOR.get((compute_type or "").strip().lower(), 1.0)
+
+
 class TranscriptionService:
-    def __init__(self):
+    def __init__(self, max_memory_mb: Optional[float] = None):
+        """max_memory_mb: бюджет кэша моделей; None — из конфига (model_cache_budget_mb) или по умолчанию."""
         self._backend = None
         self._engine = None
         self._engine_override = None  # e.g. "whisper-streaming" for mic streaming
+        self._active_key = None
+        # key -> backend с загруженной моделью; порядок — от давно использованных к недавним
+        self._models: "OrderedDict[tuple, object]" = OrderedDict()
+        self._model_workers: Dict[tuple, int] = {}  # key -> num_workers, с которым загружена модель
+        self._max_memory_mb = max_memory_mb
+        self._lock = threading.RLock()
+        # Загрузка идёт вне _lock (скачивание и инициализация — секунды): один замок на ключ кэша,
+        # чтобы одну модель не грузили дважды, и набор бэкендов, которые сейчас загружаются
+        self._load_locks: Dict[tuple, threading.Lock] = {}
+        self._loading: set = set()
+        self._stop_requested = False
 
-    def _get_backend(self):
+    def _resolve_engine(self) -> str:
         cfg = _load_config()
         engine = self._engine_override or (cfg.get("transcription_engine") or "faster-whisper").strip().lower()
         if engine not in ("faster-whisper", "whisper-streaming", "whisperx"):
             engine = "faster-whisper"
-        if self._backend is None or self._engine != engine:
-            self._engine = engine
-            cls = _get_backend_class(engine)
-            self._backend = cls()
-        return self._backend
+        return engine
+
+    def _get_backend(self):
+        engine = self._resolve_engine()
+        with self._lock:
+            if self._backend is None or self._engine != engine:
+                self._engine = engine
+                self._backend, self._active_key = self._most_recent_for_engine(engine)
+                if self._backend is None:
+                    self._backend = _get_backend_class(engine)()
+            return self._backend
+
+    def _most_recent_for_engine(self, engine: str):
+        """Последняя использованная загруженная модель данного движка (тёплая), либо (None, None)."""
+        for key in reversed(self._models):
+            if key[0] == engine:
+                return self._models[key], key
+        return None, None
 
     def set_engine_override(self, engine: Optional[str]):
-        """Временно использовать указанный движок (например для потока с микрофона). None — сброс."""
+        """Временно использовать указанный движок (например для потока с микрофона). None — сброс.
+        Загруженные модели остаются в кэше, поэтому возврат к прежнему движку не требует перезагрузки."""
         if engine != self._engine_override:
             self._engine_override = engine
             self._backend = None
             self._engine = None
+            self._active_key = None
 
     def clear_engine_override(self):
         """Сбросить временный движок (после остановки потока)."""
@@ -66,6 +129,8 @@ class TranscriptionService:
     @model.setter
     def model(self, value):
         if value is None and self._backend is not None:
+            if self._active_key is not None:
+                self.unload(self._active_key)
             self._backend = None
             self._engine = None
 
@@ -75,20 +140,122 @@ class TranscriptionService:
             return os.path.join(os.path.dirname(sys.executable), "models")
         return os.path.join(os.getcwd(), "models")
 
+    @staticmethod
+    def _cache_key(engine: str, model_size: str, device: str, compute_type: str, load_kwargs: dict) -> tuple:
+        """Ключ кэша: движок, модель, устройство, тип вычислений и прочие опции загрузки
+        (например language/task у whisper-streaming, которые фиксируются при загрузке).
+        num_workers в ключ не входит: экземпляр с большим числом потоков годится и для меньшего."""
+        extra = tuple(sorted(
+            (k, v) for k, v in load_kwargs.items()
+            if k != "num_workers" and isinstance(v, (str, int, float, bool, type(None)))
+        ))
+        return (engine, model_size, device, compute_type, extra)
+
+    def _memory_budget_mb(self) -> float:
+        if self._max_memory_mb is not None:
+            return float(self._max_memory_mb)
+        try:
+            return float(_load_config().get("model_cache_budget_mb") or DEFAULT_MODEL_CACHE_BUDGET_MB)
+        except (TypeError, ValueError):
+            return float(DEFAULT_MODEL_CACHE_BUDGET_MB)
+
+    def cache_memory_mb(self) -> float:
+        """Оценка памяти, занятой всеми моделями в кэше (МБ)."""
+        with self._lock:
+            return sum(_estimate_model_mb(k[1], k[3]) for k in self._models)
+
+    def loaded_models(self) -> List[Tuple]:
+        """Ключи загруженных моделей, от давно использованных к недавним."""
+        with self._lock:
+            return list(self._models)
+
+    def _evict_to_budget(self, keep: tuple) -> None:
+        """LRU-вытеснение: выгружать самые старые модели, пока суммарная оценка превышает бюджет.
+        Модель keep и модели, занятые транскрибацией, не вытесняются."""
+        budget = self._memory_budget_mb()
+        for key in list(self._models):
+            if self.cache_memory_mb() <= budget:
+                break
+            if key == keep or getattr(self._models[key], "is_running", False):
+                continue
+            self._unload_key(key)
+
+    def _unload_key(self, key: tuple) -> None:
+        backend = self._models.pop(key, None)
+        self._model_workers.pop(key, None)
+        if backend is None:
+            return
+        try:
+            backend.unload()
+        except Exception as e:
+            print(f"Model unload error: {e}")
+        if backend is self._backend:
+            self._backend = None
+            self._engine = None
+            self._active_key = None
+
+    def unload(self, key: Optional[tuple] = None) -> None:
+        """Выгрузить модель по ключу кэша (см. loaded_models) или все модели, если key не задан."""
+        with self._lock:
+            keys = [key] if key is not None else list(self._models)
+            for k in keys:
+                self._unload_key(k)
+            if key is None:
+                self._backend = None
+                self._engine = None
+                self._active_key = None
+        gc.collect()
+
     def load_model(self, model_size="large-v3", device="cuda", compute_type="float16", engine_override=None, **kwargs):
         if engine_override is not None:
             self.set_engine_override(engine_override)
         kwargs = {k: v for k, v in kwargs.items() if k != "engine_override"}
-        backend = self._get_backend()
+        engine = self._resolve_engine()
+        key = self._cache_key(engine, model_size, device, compute_type, kwargs)
         self._last_load_error = None
-        ok = backend.load_model(
-            model_size=model_size,
-            device=device,
-            compute_type=compute_type,
-            **kwargs,
-        )
-        if not ok:
-            self._last_load_error = getattr(backend, "_load_error", None) or "Failed to load model."
+        workers = max(1, int(kwargs.get("num_workers") or 1))
+        with self._lock:
+            key_lock = self._load_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                cached = self._models.get(key)
+                if cached is not None and (
+                    self._model_workers.get(key, 1) >= workers or getattr(cached, "is_running", False)
+                ):
+                    # Занятую модель не перезагружаем — она обслужит и этот запуск, пусть и с меньшим числом потоков
+                    self._models.move_to_end(key)
+                    self._backend, self._engine, self._active_key = cached, engine, key
+                    return True
+                if cached is not None:
+                    self._unload_key(key)  # нужно больше потоков — перезагрузка на месте, без второй копии
+                # Новый экземпляр: уже загруженные (и загружающиеся) бэкенды принадлежат другим ключам кэша
+                backend = self._backend if (
+                    self._backend is not None and self._engine == engine and self._active_key is None
+                    and self._backend not in self._loading
+                ) else _get_backend_class(engine)()
+                self._loading.add(backend)
+                self._backend, self._engine, self._active_key = backend, engine, None
+            try:
+                if cached is not None:
+                    gc.collect()
+                ok = backend.load_model(
+                    model_size=model_size,
+                    device=device,
+                    compute_type=compute_type,
+                    **kwargs,
+                )
+            finally:
+                with self._lock:
+                    self._loading.discard(backend)
+            if not ok:
+                self._last_load_error = getattr(backend, "_load_error", None) or "Failed to load model."
+                return ok
+            with self._lock:
+                self._models[key] = backend
+                self._model_workers[key] = workers
+                self._backend, self._engine, self._active_key = backend, engine, key
+                self._evict_to_budget(keep=key)
+        gc.collect()
         return ok
 
     def transcribe(
@@ -116,7 +283,57 @@ class TranscriptionService:
             **kwargs,
         )
 
+    def transcribe_with_checkpoint(self, file_path, checkpoint, audio=None, progress_callback=None, **kwargs):
+        """
+        transcribe() с контрольной точкой: уже готовые сегменты берутся из checkpoint, аудио
+        обрезается с checkpoint.last_time (audio — 16 kHz массив файла, иначе файл декодируется),
+        новые сегменты сохраняются по ходу. После полного прохода точка удаляется, после stop() — остаётся.
+        Возвращает (segments, info) с абсолютным временем.
+        """
+        from asr_backends.base import SAMPLING_RATE, load_audio_16k
+
+        self._stop_requested = False
+        done_segments, offset = checkpoint.load()
+        source = file_path if audio is None else audio
+        if offset > 0:
+            if audio is None:
+                audio = load_audio_16k(file_path)
+            source = audio[int(offset * SAMPLING_RATE):]
+
+        def on_segment(seg):
+            checkpoint.add(dict(seg, start=seg.get("start", 0) + offset, end=seg.get("end", 0) + offset))
+
+        def on_progress(current_time, total_duration, text):
+            if progress_callback:
+                progress_callback(current_time + offset, (total_duration or 0) + offset, text)
+
+        try:
+            segments, info = self.transcribe(
+                source, progress_callback=on_progress, segment_callback=on_segment, **kwargs
+            )
+        finally:
+            checkpoint.flush()
+        segments = done_segments + [
+            dict(s, start=s.get("start", 0) + offset, end=s.get("end", 0) + offset) for s in (segments or [])
+        ]
+        if not self._stop_requested:
+            checkpoint.clear()
+        return segments, _ResumedInfo(info, offset)
+
+    def get_token_counter(self):
+        """count_tokens(text) токенизатором загруженной модели или None (нет модели / движок без токенизатора)."""
+        with self._lock:
+            backend = self._backend
+        if backend is None or not getattr(backend, "model", None) or not hasattr(backend, "count_tokens"):
+            return None
+        try:
+            backend.count_tokens("test")
+        except Exception:
+            return None
+        return backend.count_tokens
+
     def stop(self):
+        self._stop_requested = True
         if self._backend is not None:
             self._backend.stop()
 
@@ -126,6 +343,12 @@ class TranscriptionService:
             return False
         return getattr(self._backend, "is_running", False)
 
+    def supports_concurrent_transcribe(self) -> bool:
+        """Можно ли вызывать transcribe() текущего движка из нескольких потоков сразу (пакетная очередь).
+        Только faster-whisper: у остальных общее состояние (OnlineASRProcessor, флаг is_running)."""
+        backend = self._get_backend()
+        return bool(getattr(backend, "supports_concurrent_transcribe", lambda: False)())
+
     def supports_streaming(self):
         if self._backend is None:
             return False
@@ -137,3 +360,14 @@ class TranscriptionService:
         if not getattr(backend, "supports_streaming", lambda: False)():
             raise NotImplementedError("Current engine does not support streaming")
         return backend.streaming_transcribe(chunk_iterator, **kwargs)
+
+
+class _ResumedInfo:
+    """info бэкенда с длительностью всего файла (с учётом уже готовой части)."""
+
+    def __init__(self, info, offset: float):
+        self._info = info
+        self.duration = (getattr(info, "duration", 0) or 0) + offset
+
+    def __getattr__(self, name):
+        return getattr(self._info, name)
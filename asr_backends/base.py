@@ -2,9 +2,51 @@
 """
 Base contract for ASR backends.
 All backends return segments as list[dict] with keys: start, end, text; optional: speaker.
+transcribe() accepts a file path or in-memory audio: a float32 16 kHz mono NumPy array,
+or a buffer/memoryview of float32 samples (see prepare_audio_input).
 """
 from abc import ABC, abstractmethod
-from typing import Any, List, Optional, Tuple
+from typing import Any, List, Optional, Tuple, Union
+
+SAMPLING_RATE = 16000
+# Элемент chunk_iterator в streaming_transcribe: конец фразы — подтвердить текст и начать заново (время с 0)
+STREAM_FLUSH = "flush"
+
+# Путь к файлу или PCM float32 16 kHz mono (ndarray / bytes / memoryview)
+AudioInput = Union[str, Any]
+
+
+def prepare_audio_input(source: AudioInput) -> AudioInput:
+    """
+    Normalize transcribe() input. Paths (str / os.PathLike) are returned as str.
+    Buffers (bytes, bytearray, memoryview) are wrapped with np.frombuffer as float32 without copying;
+    arrays are converted to 1-D float32 (multi-channel is averaged to mono), copying only if needed.
+    """
+    if isinstance(source, str):
+        return source
+    if hasattr(source, "__fspath__"):
+        return str(source.__fspath__())
+    import numpy as np
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return np.frombuffer(source, dtype=np.float32)
+    audio = np.asarray(source)
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    return audio.astype(np.float32, copy=False)
+
+
+def load_audio_16k(path: str):
+    """Decode a media file to float32 16 kHz mono (faster-whisper's PyAV decoder, else librosa)."""
+    try:
+        from faster_whisper.audio import decode_audio
+    except ImportError:
+        import librosa
+        import numpy as np
+
+        audio, _ = librosa.load(path, sr=SAMPLING_RATE, mono=True, dtype=np.float32)
+        return audio
+    return decode_audio(path, sampling_rate=SAMPLING_RATE)
 
 
 class ASRBackend(ABC):
@@ -18,7 +60,7 @@ class ASRBackend(ABC):
     @abstractmethod
     def transcribe(
         self,
-        file_path: str,
+        file_path: AudioInput,
         *,
         language: Optional[str] = None,
         initial_prompt: Optional[str] = None,
@@ -27,12 +69,15 @@ class ASRBackend(ABC):
         task: str = "transcribe",
         word_timestamps: bool = False,
         progress_callback: Optional[Any] = None,
+        segment_callback: Optional[Any] = None,
         **kwargs,
     ) -> Tuple[List[dict], Any]:
         """
-        Transcribe file. Returns (segments, info).
+        Transcribe a file or in-memory 16 kHz audio. Returns (segments, info).
         segments: list of {"start": float, "end": float, "text": str, "speaker"?: str}
         info: object with at least .duration (for compatibility).
+        segment_callback(segment): called for each final segment in timeline order as soon as it is
+        known (used for checkpoints); segments after it never change.
         """
         pass
 
@@ -40,6 +85,14 @@ class ASRBackend(ABC):
         """Stop current transcription if running."""
         pass
 
+    def unload(self) -> None:
+        """Release the loaded model so its memory can be reclaimed."""
+        pass
+
+    def supports_concurrent_transcribe(self) -> bool:
+        """True if transcribe() may run in several threads at once on one instance (batch workers)."""
+        return False
+
     def supports_streaming(self) -> bool:
         """True if this backend supports streaming (chunk-by-chunk) for microphone."""
         return False
@@ -47,6 +100,7 @@ class ASRBackend(ABC):
     def streaming_transcribe(self, chunk_iterator, **kwargs):
         """
         If supports_streaming(): yield segments as they become available.
-        chunk_iterator yields (audio_float_array_16k_mono, sample_rate) or (audio_float_array_16k_mono,).
+        chunk_iterator yields (audio_float_array_16k_mono, sample_rate) or (audio_float_array_16k_mono,),
+        or STREAM_FLUSH after a pause: pending text is finalized and timestamps restart at 0.
         """
         raise NotImplementedError("Streaming not supported")
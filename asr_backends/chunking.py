@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Splitting long audio into windows at VAD silences and stitching per-window segments back together.
+Pure Python (no numpy) so it can be shared by backends and tested without ASR dependencies.
+Sample positions are ints at the given sampling rate; segment times are seconds.
+"""
+from typing import Dict, List, Sequence, Set, Tuple
+
+
+def plan_windows(
+    speech_timestamps: Sequence[Dict[str, int]],
+    sampling_rate: int = 16000,
+    max_window_s: float = 60.0,
+    overlap_s: float = 1.0,
+) -> List[Tuple[int, int]]:
+    """
+    Group speech regions ({"start", "end"} in samples, sorted) into windows of at most max_window_s.
+    Windows are cut in the silence between regions; a single region longer than max_window_s
+    is split hard with overlap_s of shared audio (de-duplicated later by stitch_segments).
+    Returns [(start_sample, end_sample), ...].
+    """
+    max_len = max(1, int(max_window_s * sampling_rate))
+    overlap = max(0, min(int(overlap_s * sampling_rate), max_len // 2))
+    windows: List[Tuple[int, int]] = []
+    cur_start = cur_end = None
+    for ts in speech_timestamps:
+        start, end = int(ts["start"]), int(ts["end"])
+        if end <= start:
+            continue
+        pieces = []
+        while end - start > max_len:
+            pieces.append((start, start + max_len))
+            start += max_len - overlap
+        pieces.append((start, end))
+        for p_start, p_end in pieces:
+            if cur_start is None:
+                cur_start, cur_end = p_start, p_end
+            elif p_start >= cur_end and p_end - cur_start <= max_len:
+                cur_end = p_end
+            else:
+                windows.append((cur_start, cur_end))
+                cur_start, cur_end = p_start, p_end
+    if cur_start is not None:
+        windows.append((cur_start, cur_end))
+    return windows
+
+
+def overlapping_windows(windows: Sequence[Tuple[int, int]]) -> Set[int]:
+    """Indices of windows that share audio with a neighbour (hard splits); only these need word timings to stitch."""
+    out: Set[int] = set()
+    for i in range(1, len(windows)):
+        if windows[i][0] < windows[i - 1][1]:
+            out.update((i - 1, i))
+    return out
+
+
+def stitch_segments(
+    window_results: Sequence[Tuple[float, List[dict]]],
+    tolerance: float = 0.05,
+) -> List[dict]:
+    """
+    Merge per-window segments into one timeline.
+    window_results: [(offset_seconds, segments)], segment times relative to their window;
+    segments may carry "words": [{"start", "end", "word"}] (word timestamps).
+    Timestamps are shifted by the window offset. Where windows overlap, words (or whole segments
+    without word timings) whose midpoint falls before the end of already emitted text are dropped.
+    Returned segments keep the backend schema: start, end, text (+ speaker if present).
+    """
+    out: List[dict] = []
+    last_end = float("-inf")
+    for offset, segments in sorted(window_results, key=lambda r: r[0]):
+        for seg in segments:
+            start = float(seg.get("start", 0)) + offset
+            end = float(seg.get("end", 0)) + offset
+            text = seg.get("text") or ""
+            words = seg.get("words")
+            if words:
+                kept = []
+                for w in words:
+                    w_start = float(w.get("start", 0)) + offset
+                    w_end = float(w.get("end", 0)) + offset
+                    if (w_start + w_end) / 2 > last_end + tolerance:
+                        kept.append((w_start, w_end, w.get("word") or ""))
+                if not kept:
+                    continue
+                if len(kept) < len(words):
+                    text = "".join(word for _, _, word in kept)
+                    start, end = kept[0][0], kept[-1][1]
+            elif (start + end) / 2 <= last_end + tolerance:
+                continue
+            new_seg = {"start": start, "end": end, "text": text}
+            if seg.get("speaker") is not None:
+                new_seg["speaker"] = seg["speaker"]
+            out.append(new_seg)
+            last_end = max(last_end, end)
+    return out
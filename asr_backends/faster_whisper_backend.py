@@ -1,12 +1,26 @@
 # -*- coding: utf-8 -*-
 """
 Faster-whisper ASR backend. Same behaviour as original TranscriptionService.
+Optional chunked mode: long files are split at VAD silences and the windows are decoded
+concurrently on one CTranslate2 model (load with num_workers > 1).
+Optional batched mode (batch_size > 1): faster-whisper's BatchedInferencePipeline decodes
+VAD segments in batches.
+Optional dynamic prompting (dynamic_prompt): 30 s windows, each one gets an initial_prompt built from
+the text decoded so far (e.g. DictionaryService.build_dynamic_prompt_provider). With chunked, windows are
+decoded in waves of chunk_workers: a wave is prompted with the text of all earlier waves.
 """
 import os
 import sys
-from typing import Any, List, Optional, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, List, Optional, Tuple
 
-from asr_backends.base import ASRBackend
+from asr_backends.base import SAMPLING_RATE, ASRBackend, AudioInput, prepare_audio_input
+from asr_backends.chunking import overlapping_windows, plan_windows, stitch_segments
+# Окна короче этого не имеет смысла делить (один проход модели — 30 с)
+MIN_CHUNKED_DURATION_S = 90.0
+# Окно при динамической подсказке: один проход модели, подсказка обновляется каждые 30 с
+DYNAMIC_PROMPT_WINDOW_S = 30.0
 
 
 class FasterWhisperBackend(ASRBackend):
@@ -14,9 +28,22 @@ class FasterWhisperBackend(ASRBackend):
 
     def __init__(self):
         self.model = None
-        self.is_running = False
+        # Несколько transcribe() могут идти параллельно (пакетная очередь с num_workers > 1),
+        # поэтому вместо общего флага — счётчик активных вызовов и событие остановки
+        self._active_runs = 0
+        self._runs_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._num_workers = 1
+        self._batched_pipeline = None
         self._setup_dlls()
 
+    @property
+    def is_running(self) -> bool:
+        return self._active_runs > 0
+
+    def supports_concurrent_transcribe(self) -> bool:
+        return True
+
     def _setup_dlls(self) -> None:
         """Setup CUDA DLL paths for correct operation on Windows."""
         if getattr(sys, "frozen", False):
@@ -57,9 +84,13 @@ class FasterWhisperBackend(ASRBackend):
         model_size: str = "large-v3",
         device: str = "cuda",
         compute_type: str = "float16",
+        num_workers: int = 1,
         **kwargs,
     ) -> bool:
+        """num_workers > 1 allows that many transcribe() calls to run concurrently on one model."""
         self._load_error = None
+        self._num_workers = max(1, int(num_workers or 1))
+        self._batched_pipeline = None
         from faster_whisper import WhisperModel
 
         try:
@@ -73,6 +104,7 @@ class FasterWhisperBackend(ASRBackend):
                 device=device,
                 compute_type=compute_type,
                 download_root=models_dir,
+                num_workers=max(1, int(num_workers or 1)),
             )
             return True
         except Exception as e:
@@ -81,7 +113,12 @@ class FasterWhisperBackend(ASRBackend):
             if device == "cuda":
                 print("Trying to switch to CPU...")
                 try:
-                    self.model = WhisperModel(model_size, device="cpu", compute_type="int8")
+                    self.model = WhisperModel(
+                        model_size,
+                        device="cpu",
+                        compute_type="int8",
+                        num_workers=max(1, int(num_workers or 1)),
+                    )
                     return True
                 except Exception as e2:
                     self._load_error = str(e2)
@@ -90,7 +127,7 @@ class FasterWhisperBackend(ASRBackend):
 
     def transcribe(
         self,
-        file_path: str,
+        file_path: AudioInput,
         *,
         language: Optional[str] = None,
         initial_prompt: Optional[str] = None,
@@ -99,12 +136,28 @@ class FasterWhisperBackend(ASRBackend):
         task: str = "transcribe",
         word_timestamps: bool = False,
         progress_callback: Optional[Any] = None,
+        segment_callback: Optional[Any] = None,
+        chunked: bool = False,
+        chunk_workers: Optional[int] = None,
+        chunk_length_s: float = 60.0,
+        batch_size: int = 0,
+        dynamic_prompt: Optional[Callable[[str], str]] = None,
         **kwargs,
     ) -> Tuple[List[dict], Any]:
+        """
+        chunked: split long audio at VAD silences into windows of up to chunk_length_s
+        and decode them concurrently with chunk_workers threads (default: model num_workers).
+        batch_size > 1: batched inference over VAD segments (BatchedInferencePipeline);
+        takes precedence over chunked. VAD is always on in this mode.
+        dynamic_prompt(previous_text) -> prompt: windows of up to DYNAMIC_PROMPT_WINDOW_S; the first uses
+        initial_prompt, the rest the returned prompt ("" = none). Without chunked the windows are decoded
+        one by one; with chunked, chunk_workers windows at a time (the prompt lags by one wave).
+        Ignored in batched mode.
+        """
         if not self.model:
             raise Exception("Model not loaded!")
+        file_path = prepare_audio_input(file_path)
 
-        self.is_running = True
         opts = dict(
             beam_size=beam_size,
             vad_filter=vad_filter,
@@ -116,24 +169,246 @@ class FasterWhisperBackend(ASRBackend):
         if language and language != "auto" and language.strip():
             opts["language"] = language.strip()
 
-        segments, info = self.model.transcribe(file_path, **opts)
+        if batch_size and int(batch_size) > 1:
+            pipeline = self._get_batched_pipeline()
+            if pipeline is not None:
+                batched_opts = dict(opts, vad_filter=True, batch_size=int(batch_size))
+                return self._transcribe_single(
+                    file_path, batched_opts, progress_callback, runner=pipeline, segment_callback=segment_callback
+                )
 
-        full_results = []
-        duration = getattr(info, "duration", 0)
+        if dynamic_prompt is not None:
+            return self._transcribe_chunked(
+                file_path, opts, vad_filter, progress_callback,
+                workers=(chunk_workers or self._num_workers) if chunked else 1,
+                chunk_length_s=min(chunk_length_s, DYNAMIC_PROMPT_WINDOW_S),
+                segment_callback=segment_callback,
+                prompt_provider=dynamic_prompt,
+            )
 
-        for segment in segments:
-            if not self.is_running:
-                break
-            full_results.append({
-                "start": segment.start,
-                "end": segment.end,
-                "text": segment.text,
-            })
-            if progress_callback:
-                progress_callback(segment.end, duration, segment.text)
+        if chunked:
+            return self._transcribe_chunked(
+                file_path, opts, vad_filter, progress_callback,
+                workers=chunk_workers or self._num_workers,
+                chunk_length_s=chunk_length_s,
+                segment_callback=segment_callback,
+            )
+
+        return self._transcribe_single(file_path, opts, progress_callback, segment_callback=segment_callback)
+
+    def count_tokens(self, text: str) -> int:
+        """Number of Whisper tokens in text (model tokenizer, as used for initial_prompt)."""
+        tokenizer = getattr(self.model, "hf_tokenizer", None)
+        if tokenizer is None:
+            raise RuntimeError("Tokenizer not available")
+        return len(tokenizer.encode(" " + text.strip(), add_special_tokens=False).ids)
+
+    def _get_batched_pipeline(self):
+        """BatchedInferencePipeline over the loaded model (created once per model); None if unavailable."""
+        if self._batched_pipeline is None:
+            try:
+                from faster_whisper import BatchedInferencePipeline
+            except ImportError:
+                print("BatchedInferencePipeline requires faster-whisper >= 1.1; using sequential decoding.")
+                return None
+            self._batched_pipeline = BatchedInferencePipeline(model=self.model)
+        return self._batched_pipeline
 
-        self.is_running = False
+    def _transcribe_single(
+        self,
+        source,
+        opts: dict,
+        progress_callback: Optional[Any],
+        runner: Optional[Any] = None,
+        segment_callback: Optional[Any] = None,
+    ) -> Tuple[List[dict], Any]:
+        """One transcribe pass over the whole source (path or 16 kHz array) with the model or a pipeline."""
+        self._begin_run()
+        try:
+            segments, info = (runner or self.model).transcribe(source, **opts)
+
+            full_results = []
+            duration = getattr(info, "duration", 0)
+
+            for segment in segments:
+                if self._stop_event.is_set():
+                    break
+                seg = {
+                    "start": segment.start,
+                    "end": segment.end,
+                    "text": segment.text,
+                }
+                full_results.append(seg)
+                if segment_callback:
+                    segment_callback(dict(seg))
+                if progress_callback:
+                    progress_callback(segment.end, duration, segment.text)
+        finally:
+            self._end_run()
         return full_results, info
 
+    def _transcribe_chunked(
+        self,
+        file_path,
+        opts: dict,
+        vad_filter: bool,
+        progress_callback: Optional[Any],
+        workers: int,
+        chunk_length_s: float,
+        segment_callback: Optional[Any] = None,
+        prompt_provider: Optional[Callable[[str], str]] = None,
+    ) -> Tuple[List[dict], Any]:
+        """
+        Decode VAD-delimited windows in a thread pool and stitch them with corrected offsets.
+        segment_callback receives stitched segments once all earlier windows are done.
+        With prompt_provider, windows after the first are decoded in waves of `workers` windows;
+        every window of a wave gets initial_prompt = prompt_provider(text of the earlier waves).
+        """
+        from faster_whisper.audio import decode_audio
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        audio = decode_audio(file_path, sampling_rate=SAMPLING_RATE) if isinstance(file_path, str) else file_path
+        duration = len(audio) / SAMPLING_RATE
+        if duration < MIN_CHUNKED_DURATION_S and prompt_provider is None:
+            return self._transcribe_single(audio, opts, progress_callback, segment_callback=segment_callback)
+
+        if vad_filter:
+            speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=500))
+        else:
+            speech = [{"start": 0, "end": len(audio)}]
+        windows = plan_windows(speech, SAMPLING_RATE, max_window_s=chunk_length_s)
+        # Окна уже выделены VAD; внутри окна тишина короткая — повторный VAD не нужен
+        window_opts = dict(opts, vad_filter=False)
+        # Время слов нужно только для склейки перекрывающихся окон (длинная речь без пауз);
+        # остальные окна стыкуются по границам сегментов
+        need_words = {windows[i] for i in overlapping_windows(windows)}
+
+        def decode_window(window, prompt=None):
+            start, end = window
+            if self._stop_event.is_set():
+                return start / SAMPLING_RATE, [], None  # окно уже взято пулом, но декодировать его незачем
+            run_opts = dict(window_opts)
+            if window in need_words:
+                run_opts["word_timestamps"] = True
+            if prompt is not None:
+                run_opts.pop("initial_prompt", None)
+                if prompt.strip():
+                    run_opts["initial_prompt"] = prompt.strip()
+            segs, win_info = self.model.transcribe(audio[start:end], **run_opts)
+            out = []
+            for seg in segs:
+                if self._stop_event.is_set():
+                    break
+                out.append({
+                    "start": seg.start,
+                    "end": seg.end,
+                    "text": seg.text,
+                    "words": [{"start": w.start, "end": w.end, "word": w.word} for w in (seg.words or [])],
+                })
+            return start / SAMPLING_RATE, out, win_info
+
+        # Готовые окна по индексу; наружу отдаём только непрерывный префикс (окна завершаются вразнобой)
+        finished = {}
+        emitted = [0, 0]  # [окон в префиксе, отданных сегментов]
+
+        def emit_prefix():
+            if not segment_callback:
+                return
+            advanced = False
+            while emitted[0] in finished:
+                emitted[0] += 1
+                advanced = True
+            if not advanced:
+                return
+            stitched = stitch_segments([finished[i] for i in range(emitted[0])])
+            for seg in stitched[emitted[1]:]:
+                segment_callback(dict(seg))
+            emitted[1] = len(stitched)
+
+        self._begin_run()
+        results = []
+        info = None
+        try:
+            if not windows:
+                return [], _ChunkedInfo(duration, opts.get("language"))
+            # Первое окно — последовательно: язык определяется один раз для всего файла
+            first = decode_window(windows[0])
+            results.append(first[:2])
+            finished[0] = first[:2]
+            emit_prefix()
+            info = first[2]
+            if "language" not in window_opts and getattr(info, "language", None):
+                window_opts["language"] = info.language
+            done_s = (windows[0][1] - windows[0][0]) / SAMPLING_RATE
+            if progress_callback:
+                progress_callback(done_s, duration, " ".join(s["text"].strip() for s in first[1]))
+            if prompt_provider is not None:
+                # Подсказка зависит от уже распознанного текста: окна идут волнами по workers,
+                # окна одной волны получают подсказку по тексту предыдущих волн
+                history = " ".join(s["text"].strip() for s in first[1])
+                wave_size = max(1, int(workers))
+                with ThreadPoolExecutor(max_workers=wave_size) as pool:
+                    for wave_start in range(1, len(windows), wave_size):
+                        if self._stop_event.is_set():
+                            break
+                        prompt = prompt_provider(history) or ""
+                        wave = range(wave_start, min(wave_start + wave_size, len(windows)))
+                        futures = [pool.submit(decode_window, windows[i], prompt) for i in wave]
+                        for i, fut in zip(wave, futures):
+                            offset, segs, _ = fut.result()
+                            results.append((offset, segs))
+                            if not self._stop_event.is_set():
+                                finished[i] = (offset, segs)
+                                emit_prefix()
+                            text = " ".join(s["text"].strip() for s in segs)
+                            history = (history + " " + text)[-4000:]
+                            done_s += (windows[i][1] - windows[i][0]) / SAMPLING_RATE
+                            if progress_callback:
+                                progress_callback(done_s, duration, text)
+            else:
+                with ThreadPoolExecutor(max_workers=max(1, int(workers))) as pool:
+                    futures = {pool.submit(decode_window, w): i for i, w in enumerate(windows) if i > 0}
+                    for fut in as_completed(futures):
+                        offset, segs, _ = fut.result()
+                        results.append((offset, segs))
+                        if not self._stop_event.is_set():
+                            finished[futures[fut]] = (offset, segs)
+                            emit_prefix()
+                        w_start, w_end = windows[futures[fut]]
+                        done_s += (w_end - w_start) / SAMPLING_RATE
+                        if progress_callback:
+                            progress_callback(done_s, duration, " ".join(s["text"].strip() for s in segs))
+                        if self._stop_event.is_set():
+                            for other in futures:
+                                other.cancel()
+                            break
+        finally:
+            self._end_run()
+        return stitch_segments(results), _ChunkedInfo(duration, getattr(info, "language", None))
+
+    def _begin_run(self) -> None:
+        with self._runs_lock:
+            if self._active_runs == 0:
+                self._stop_event.clear()
+            self._active_runs += 1
+
+    def _end_run(self) -> None:
+        with self._runs_lock:
+            self._active_runs = max(0, self._active_runs - 1)
+
     def stop(self) -> None:
-        self.is_running = False
+        """Stop all running transcriptions on this model."""
+        self._stop_event.set()
+
+    def unload(self) -> None:
+        self._stop_event.set()
+        self._batched_pipeline = None
+        self.model = None
+
+
+class _ChunkedInfo:
+    """Minimal TranscriptionInfo for chunked mode: whole-file duration and detected language."""
+
+    def __init__(self, duration: float, language: Optional[str]):
+        self.duration = duration
+        self.language = language
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковый ресемплинг для микрофона: аудио приходит блоками, и фильтр должен сохранять состояние
+между ними (ресемплинг каждого блока по отдельности даёт щелчки на границах и лишнюю работу).
+soxr.ResampleStream, если установлен; иначе полифазный FIR (как scipy.signal.resample_poly)
+на NumPy с историей входа — каждый сэмпл проходит через фильтр ровно один раз.
+"""
+from math import gcd
+
+from asr_backends.base import SAMPLING_RATE
+
+# Полуширина фильтра в периодах max(up, down) и окно Кайзера — как в scipy.signal.resample_poly
+_HALF_LEN_FACTOR = 10
+_KAISER_BETA = 5.0
+
+
+class StreamingResampler:
+    """
+    process(chunk) -> float32 mono на out_rate; flush() — остаток (задержка фильтра) в конце потока.
+    Вход — (n,) или (n, channels); каналы усредняются. Выход по длине совпадает с входом
+    (len(in) * out_rate / in_rate в сумме, с учётом flush), сдвига по времени нет.
+    engine: "passthrough" (частоты равны), "soxr" или "polyphase".
+    """
+
+    def __init__(self, in_rate: int, out_rate: int = SAMPLING_RATE, use_soxr: bool = True):
+        import numpy as np
+
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        self._soxr = None
+        if self.in_rate == self.out_rate:
+            self.engine = "passthrough"
+            return
+        if use_soxr:
+            try:
+                import soxr
+
+                self._soxr = soxr.ResampleStream(self.in_rate, self.out_rate, 1, dtype="float32", quality="HQ")
+                self.engine = "soxr"
+                return
+            except ImportError:
+                pass
+        self.engine = "polyphase"
+        g = gcd(self.in_rate, self.out_rate)
+        self._up, self._down = self.out_rate // g, self.in_rate // g
+        half_len = _HALF_LEN_FACTOR * max(self._up, self._down)
+        n = np.arange(2 * half_len + 1, dtype=np.float64) - half_len
+        h = np.sinc(n / max(self._up, self._down)) * np.kaiser(2 * half_len + 1, _KAISER_BETA)
+        h *= self._up / h.sum()
+        # Фаза p: отсчёты h[p], h[p + up], ...; taps фаз дополнены нулями до общей длины
+        self._taps = -(-len(h) // self._up)
+        padded = np.zeros(self._taps * self._up)
+        padded[:len(h)] = h
+        self._phases = padded.reshape(self._taps, self._up).T.astype(np.float32)
+        self._delay = half_len  # групповая задержка (в отсчётах повышенной частоты)
+        self._history = np.zeros(self._taps, dtype=np.float32)
+        self._consumed = 0  # входных сэмплов получено
+        self._produced = 0  # выходных сэмплов выдано
+
+    @staticmethod
+    def _mono(chunk):
+        import numpy as np
+
+        audio = np.asarray(chunk, dtype=np.float32)
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1, dtype=np.float32) if audio.shape[1] > 1 else audio[:, 0]
+        return audio
+
+    def process(self, chunk):
+        audio = self._mono(chunk)
+        if self.engine == "passthrough":
+            return audio
+        if self._soxr is not None:
+            return self._soxr.resample_chunk(audio, last=False)
+        return self._polyphase(audio, final=False)
+
+    def flush(self):
+        """Выдать хвост, задержанный фильтром (вход считается законченным)."""
+        import numpy as np
+
+        empty = np.zeros(0, dtype=np.float32)
+        if self.engine == "passthrough":
+            return empty
+        if self._soxr is not None:
+            return self._soxr.resample_chunk(empty, last=True)
+        return self._polyphase(empty, final=True)
+
+    def _polyphase(self, audio, final: bool):
+        import numpy as np
+
+        start = self._consumed - len(self._history)  # абсолютный индекс x_ext[0]
+        self._consumed += len(audio)
+        ext = np.concatenate([self._history, audio])
+        if final:
+            # Нули после конца входа: фильтр «дотягивает» последние выходные сэмплы
+            ext = np.concatenate([ext, np.zeros(self._taps, dtype=np.float32)])
+            end = -(-self._consumed * self._up // self._down)
+        else:
+            # Выход k готов, когда известен самый новый вход, от которого он зависит
+            end = max(self._produced, ((self._consumed - 1) * self._up - self._delay) // self._down + 1)
+        k = np.arange(self._produced, end, dtype=np.int64)
+        out = np.empty(0, dtype=np.float32)
+        if len(k):
+            pos = k * self._down + self._delay
+            newest = pos // self._up - start  # индекс в ext самого нового входа для каждого выхода
+            idx = newest[:, None] - np.arange(self._taps)[None, :]
+            valid = idx >= 0
+            window = np.where(valid, ext[np.clip(idx, 0, len(ext) - 1)], 0.0)
+            out = np.einsum("ij,ij->i", window, self._phases[pos % self._up]).astype(np.float32)
+        self._produced = end
+        # ext всегда не короче истории, поэтому хвост — ровно taps сэмплов
+        self._history = np.zeros(self._taps, dtype=np.float32) if final else ext[-self._taps:]
+        return out
+
@@ -8,7 +8,8 @@ import subprocess
 import sys
 from typing import Any, Iterator, List, Optional, Tuple
 
-from asr_backends.base import ASRBackend
+from asr_backends.base import SAMPLING_RATE, STREAM_FLUSH, ASRBackend, AudioInput, prepare_audio_input
+from asr_backends.resampling import StreamingResampler
 
 
 def _ensure_whisper_streaming_installed() -> tuple[bool, str | None]:
@@ -138,7 +139,7 @@ class WhisperStreamingBackend(ASRBackend):
 
     def transcribe(
         self,
-        file_path: str,
+        file_path: AudioInput,
         *,
         language: Optional[str] = None,
         initial_prompt: Optional[str] = None,
@@ -147,22 +148,25 @@ class WhisperStreamingBackend(ASRBackend):
         task: str = "transcribe",
         word_timestamps: bool = False,
         progress_callback: Optional[Any] = None,
+        segment_callback: Optional[Any] = None,
         **kwargs,
     ) -> Tuple[List[dict], Any]:
-        """Streaming backend: transcribe file by simulating stream (read file, feed chunks)."""
+        """Streaming backend: transcribe file or 16 kHz array by simulating stream (feed 1 s chunks)."""
         if not self._online or not self._asr:
             raise Exception("Model not loaded!")
 
-        try:
-            import numpy as np
-            import librosa
-        except ImportError:
-            raise Exception("librosa required for WhisperStreaming file transcription")
+        audio = prepare_audio_input(file_path)
+        if isinstance(audio, str):
+            try:
+                import numpy as np
+                import librosa
+            except ImportError:
+                raise Exception("librosa required for WhisperStreaming file transcription")
+            audio, sr = librosa.load(audio, sr=SAMPLING_RATE, dtype=np.float32)
+            if sr != SAMPLING_RATE:
+                audio = librosa.resample(audio.astype(np.float32), orig_sr=sr, target_sr=SAMPLING_RATE)
 
         self.is_running = True
-        audio, sr = librosa.load(file_path, sr=16000, dtype=np.float32)
-        if sr != 16000:
-            audio = librosa.resample(audio.astype(np.float32), orig_sr=sr, target_sr=16000)
 
         self._online.init()
         min_chunk = int(1.0 * 16000)  # 1 second
@@ -184,6 +188,8 @@ class WhisperStreamingBackend(ASRBackend):
                     "end": offset + end,
                     "text": (text or "").strip(),
                 })
+                if segment_callback:
+                    segment_callback(dict(segments_out[-1]))
                 if progress_callback:
                     progress_callback(offset + end, duration_sec, (text or "").strip())
             i += len(chunk)
@@ -196,6 +202,8 @@ class WhisperStreamingBackend(ASRBackend):
                 "end": offset + end,
                 "text": (text or "").strip(),
             })
+            if segment_callback:
+                segment_callback(dict(segments_out[-1]))
 
         self.is_running = False
         class Info:
@@ -205,6 +213,11 @@ class WhisperStreamingBackend(ASRBackend):
     def stop(self) -> None:
         self.is_running = False
 
+    def unload(self) -> None:
+        self.is_running = False
+        self._online = None
+        self._asr = None
+
     def supports_streaming(self) -> bool:
         return True
 
@@ -215,42 +228,57 @@ class WhisperStreamingBackend(ASRBackend):
     ) -> Iterator[Tuple[float, float, str]]:
         """
         Yield (start, end, text) for each confirmed segment.
-        chunk_iterator yields (audio_float32_16k, sample_rate) or (audio_float32_16k,).
+        chunk_iterator yields (audio_float32_16k, sample_rate) or (audio_float32_16k,), or STREAM_FLUSH
+        at a pause: the online processor is finished (pending text confirmed) and re-initialized.
         """
         if not self._online:
             return
         try:
             import numpy as np
-            import librosa
         except ImportError:
             return
 
         self._online.init()
-        for item in chunk_iterator:
-            if not self.is_running:
-                break
-            if isinstance(item, (tuple, list)):
-                if len(item) >= 2:
-                    audio, sr = item[0], item[1]
+        # Чанки не 16 kHz — один ресемплер на весь поток (состояние фильтра сохраняется между чанками)
+        resamplers = {}
+        # stop() обрывает цикл; флаг сбрасывается и при закрытии генератора потребителем
+        self.is_running = True
+        try:
+            for item in chunk_iterator:
+                if not self.is_running:
+                    break
+                if isinstance(item, str) and item == STREAM_FLUSH:
+                    beg, end, text = self._online.finish()
+                    if beg is not None and end is not None and (text or "").strip():
+                        yield (beg, end, (text or "").strip())
+                    self._online.init()
+                    continue
+                if isinstance(item, (tuple, list)):
+                    if len(item) >= 2:
+                        audio, sr = item[0], item[1]
+                    else:
+                        audio = item[0]
+                        sr = 16000
                 else:
-                    audio = item[0]
+                    audio = item
                     sr = 16000
-            else:
-                audio = item
-                sr = 16000
 
-            if hasattr(audio, "dtype") and audio.dtype != np.float32:
-                audio = audio.astype(np.float32)
-            if sr != 16000:
-                audio = librosa.resample(audio.astype(np.float32), orig_sr=sr, target_sr=16000)
+                if hasattr(audio, "dtype") and audio.dtype != np.float32:
+                    audio = audio.astype(np.float32)
+                if sr != SAMPLING_RATE:
+                    if sr not in resamplers:
+                        resamplers[sr] = StreamingResampler(sr, SAMPLING_RATE)
+                    audio = resamplers[sr].process(audio)
 
-            self._online.insert_audio_chunk(audio)
-            result = self._online.process_iter()
-            beg, end, text = result
+                self._online.insert_audio_chunk(audio)
+                result = self._online.process_iter()
+                beg, end, text = result
+                if beg is not None and end is not None and (text or "").strip():
+                    yield (beg, end, (text or "").strip())
+
+            last = self._online.finish()
+            beg, end, text = last
             if beg is not None and end is not None and (text or "").strip():
                 yield (beg, end, (text or "").strip())
-
-        last = self._online.finish()
-        beg, end, text = last
-        if beg is not None and end is not None and (text or "").strip():
-            yield (beg, end, (text or "").strip())
+        finally:
+            self.is_running = False
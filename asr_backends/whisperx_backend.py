@@ -5,7 +5,7 @@ Requires: whisperx (torch, transformers, faster-whisper). HF token needed for di
 """
 from typing import Any, List, Optional, Tuple
 
-from asr_backends.base import ASRBackend
+from asr_backends.base import ASRBackend, AudioInput, prepare_audio_input
 
 
 class WhisperXBackend(ASRBackend):
@@ -59,7 +59,7 @@ class WhisperXBackend(ASRBackend):
 
     def transcribe(
         self,
-        file_path: str,
+        file_path: AudioInput,
         *,
         language: Optional[str] = None,
         initial_prompt: Optional[str] = None,
@@ -68,6 +68,7 @@ class WhisperXBackend(ASRBackend):
         task: str = "transcribe",
         word_timestamps: bool = False,
         progress_callback: Optional[Any] = None,
+        segment_callback: Optional[Any] = None,
         diarize: bool = False,
         hf_token: Optional[str] = None,
         min_speakers: Optional[int] = None,
@@ -83,7 +84,8 @@ class WhisperXBackend(ASRBackend):
 
         self.is_running = True
         try:
-            audio = load_audio(file_path)
+            source = prepare_audio_input(file_path)
+            audio = load_audio(source) if isinstance(source, str) else source
             batch_size = 16
             result = self._model.transcribe(audio, batch_size=batch_size)
 
@@ -94,11 +96,14 @@ class WhisperXBackend(ASRBackend):
                 segments = result.get("segments", [])
                 out = []
                 for s in segments:
-                    out.append({
+                    seg = {
                         "start": s.get("start", 0),
                         "end": s.get("end", 0),
                         "text": (s.get("text") or "").strip(),
-                    })
+                    }
+                    out.append(seg)
+                    if segment_callback:
+                        segment_callback(dict(seg))
                     if progress_callback:
                         progress_callback(s.get("end", 0), result.get("duration") or 0, (s.get("text") or "").strip())
                 self.is_running = False
@@ -113,13 +118,13 @@ class WhisperXBackend(ASRBackend):
                     result["segments"],
                     align_model,
                     align_metadata,
-                    file_path,
+                    audio,
                     "cuda",
                 )
 
             diarize_model = DiarizationPipeline(use_auth_token=hf_token or None, device="cuda")
             diarize_segments = diarize_model(
-                file_path,
+                audio,
                 min_speakers=min_speakers,
                 max_speakers=max_speakers,
             )
@@ -137,6 +142,8 @@ class WhisperXBackend(ASRBackend):
                 if s.get("speaker") is not None:
                     seg["speaker"] = str(s["speaker"])
                 out.append(seg)
+                if segment_callback:
+                    segment_callback(dict(seg))
                 if progress_callback:
                     progress_callback(s.get("end", 0), duration, (s.get("text") or "").strip())
 
@@ -151,3 +158,7 @@ class WhisperXBackend(ASRBackend):
 
     def stop(self) -> None:
         self.is_running = False
+
+    def unload(self) -> None:
+        self.is_running = False
+        self._model = None
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Кольцевой буфер записи с микрофона: заранее выделенный numpy-массив на capacity кадров.
+Один писатель (callback аудиопотока) копирует блок на место без аллокаций; читатели получают
+срезы-представления (без копирования) по абсолютной позиции и хвост для осциллограммы за O(n).
+Вся сессия сохраняется: заполненные блоки по spill_block кадров фоновый поток дописывает в сырой
+float32-файл (spill_path), который растёт вместе с записью, — память не зависит от длительности.
+"""
+
+import os
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+class AudioRingBuffer:
+    """
+    write(block) — только из одного потока (callback); позиции — абсолютные номера кадров с начала записи.
+    read(pos) -> (данные, новая позиция): представление, если данные не пересекают конец кольца.
+    Представления действительны, пока писатель не ушёл вперёд на capacity кадров — держать дольше — копировать.
+    spill_path=None — хранится только последнее capacity кадров (iter_blocks отдаст лишь их).
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        channels: int = 1,
+        spill_path: Optional[str] = None,
+        spill_block: Optional[int] = None,
+    ):
+        self.capacity = max(1, int(capacity))
+        self.channels = max(1, int(channels))
+        self._ring = np.zeros((self.capacity, self.channels), dtype=np.float32)
+        self._written = 0  # кадров записано всего; меняет только писатель
+        self.dropped = 0  # кадров, потерянных читателями/сбросом на диск из-за отставания
+        self.spill_path = spill_path
+        self._spill_block = max(1, min(int(spill_block or self.capacity // 4), self.capacity))
+        self._spilled = 0
+        self._spill_file = None
+        self._spill_lock = threading.Lock()
+        self._spill_wakeup = threading.Event()
+        self._spill_thread: Optional[threading.Thread] = None
+        self._closed = False
+        if spill_path:
+            self._spill_file = open(spill_path, "wb")
+            self._spill_thread = threading.Thread(target=self._spill_loop, daemon=True)
+            self._spill_thread.start()
+
+    @property
+    def written(self) -> int:
+        return self._written
+
+    def write(self, block, gain: float = 1.0) -> None:
+        """Дописать блок (frames,) или (frames, channels); gain применяется при копировании в кольцо."""
+        block = np.asarray(block)
+        if block.ndim == 1:
+            block = block.reshape(-1, 1)
+        frames = len(block)
+        if frames > self.capacity:
+            self.dropped += frames - self.capacity
+            self._written += frames - self.capacity
+            block = block[-self.capacity:]
+            frames = self.capacity
+        start = self._written % self.capacity
+        first = min(frames, self.capacity - start)
+        for dst, src in ((self._ring[start:start + first], block[:first]), (self._ring[:frames - first], block[first:])):
+            if not len(src):
+                continue
+            if gain != 1.0:
+                np.multiply(src, gain, out=dst, casting="unsafe")
+            else:
+                dst[...] = src
+        # Счётчик — после копирования: читатели не увидят кадры, которых ещё нет в кольце
+        self._written += frames
+        if self._spill_thread is not None and self._written - self._spilled >= self._spill_block:
+            self._spill_wakeup.set()
+
+    def _views(self, start: int, end: int) -> List["np.ndarray"]:
+        """Кадры [start, end) как одно или два представления кольца."""
+        if end <= start:
+            return []
+        a = start % self.capacity
+        b = a + (end - start)
+        if b <= self.capacity:
+            return [self._ring[a:b]]
+        return [self._ring[a:], self._ring[:b - self.capacity]]
+
+    def _clamp(self, pos: int) -> int:
+        """Позиция, ещё не перезаписанная в кольце; потерянные кадры учитываются в dropped."""
+        oldest = max(0, self._written - self.capacity)
+        if pos < oldest:
+            self.dropped += oldest - pos
+            return oldest
+        return pos
+
+    def read(self, pos: int, max_frames: Optional[int] = None) -> Tuple[Optional["np.ndarray"], int]:
+        """Кадры с позиции pos (не больше max_frames) и позиция следующего чтения; (None, pos) — новых нет."""
+        end = self._written
+        pos = self._clamp(pos)
+        if max_frames is not None:
+            end = min(end, pos + max_frames)
+        views = self._views(pos, end)
+        if not views:
+            return None, pos
+        data = views[0] if len(views) == 1 else np.concatenate(views, axis=0)
+        return data, end
+
+    def tail(self, frames: int) -> Optional["np.ndarray"]:
+        """Копия последних frames кадров (не больше capacity); None — ещё пусто."""
+        end = self._written
+        start = max(0, end - min(int(frames), self.capacity))
+        views = self._views(start, end)
+        if not views:
+            return None
+        return np.concatenate(views, axis=0) if len(views) > 1 else views[0].copy()
+
+    # --- сброс на диск ---
+
+    def _spill_loop(self) -> None:
+        while not self._closed:
+            self._spill_wakeup.wait(timeout=0.5)
+            self._spill_wakeup.clear()
+            self._spill(self._spill_block)
+
+    def _spill(self, min_frames: int) -> None:
+        """Дописать в spill-файл все готовые кадры (не меньше min_frames за раз)."""
+        with self._spill_lock:
+            if self._spill_file is None:
+                return
+            end = self._written
+            if end - self._spilled < min_frames:
+                return
+            start = self._spilled
+            if start < end - self.capacity:
+                self.dropped += end - self.capacity - start
+                start = end - self.capacity
+            for view in self._views(start, end):
+                view.tofile(self._spill_file)
+            self._spill_file.flush()
+            self._spilled = end
+
+    def flush(self) -> None:
+        """Сбросить на диск всё записанное (после остановки потока, перед iter_blocks)."""
+        self._spill(1)
+
+    def iter_blocks(self, block_frames: int = 1 << 16) -> Iterator["np.ndarray"]:
+        """Вся сессия блоками по block_frames (spill-файл через memmap + несброшенный остаток кольца)."""
+        if self._spill_file is not None:
+            self.flush()
+            with self._spill_lock:
+                spilled = self._spilled
+            if spilled and os.path.getsize(self.spill_path) > 0:
+                disk = np.memmap(self.spill_path, dtype=np.float32, mode="r").reshape(-1, self.channels)
+                for i in range(0, len(disk), block_frames):
+                    yield disk[i:i + block_frames]
+                del disk
+            return
+        for view in self._views(max(0, self._written - self.capacity), self._written):
+            for i in range(0, len(view), block_frames):
+                yield view[i:i + block_frames]
+
+    def close(self, remove_spill: bool = True) -> None:
+        """Остановить поток сброса и (по умолчанию) удалить spill-файл."""
+        self._closed = True
+        self._spill_wakeup.set()
+        if self._spill_thread is not None:
+            self._spill_thread.join(timeout=2.0)
+            self._spill_thread = None
+        with self._spill_lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+        if remove_spill and self.spill_path:
+            try:
+                os.unlink(self.spill_path)
+            except OSError:
+                pass
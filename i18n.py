@@ -33,6 +33,16 @@ def get_dictionaries_dir() -> str:
     return path
 
 
+def get_cache_dir() -> str:
+    """Папка служебных кэшей приложения (рядом с конфигурацией). Создаётся при первом использовании."""
+    path = os.path.join(os.path.dirname(_config_path()), "cache")
+    try:
+        os.makedirs(path, exist_ok=True)
+    except Exception:
+        pass
+    return path
+
+
 def save_locale_preference(code: str) -> None:
     """Сохранить выбранный язык интерфейса в конфиг."""
     code = (code or "en").strip().lower()
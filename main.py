@@ -18,7 +18,8 @@ import customtkinter as ctk
 from tkinter import filedialog, messagebox, Canvas, Frame, StringVar, Toplevel, Label, Menu, simpledialog
 from TranscriptionService import TranscriptionService
 import YouTubeDownloadService
-from MicRecordService import MicRecordService
+from MicRecordService import RECORD_FORMATS as MIC_RECORD_FORMATS, RECOVERY_DIR_NAME as MIC_RECOVERY_DIR, MicRecordService
+from BatchTranscriptionService import BatchTranscriptionQueue, JOB_DONE, JOB_FAILED
 
 
 class DarkScrollbar(Canvas):
@@ -118,13 +119,20 @@ class DarkScrollbar(Canvas):
 
 
 from ExportService import ExportService
-from SessionService import SessionService
-from DictionaryService import DictionaryService, DictionaryData
-from OllamaService import OllamaService
+from SessionService import LazyFileTranscripts, SessionService
+from DictionaryService import DEFAULT_PROMPT_TOKEN_BUDGET, DictionaryService, DictionaryData
+from OllamaService import DEFAULT_BATCH_TOKENS as OLLAMA_DEFAULT_BATCH_TOKENS, DEFAULT_WORKERS as OLLAMA_DEFAULT_WORKERS, OllamaService
+from AudioCacheService import DEFAULT_MAX_MB as AUDIO_CACHE_DEFAULT_MB, AudioCacheService
 from AudioPlaybackService import AudioPlaybackService
+from segment_editor import SegmentListView
+from segment_view_model import ROWS_CHANGED, SegmentViewModel
+from streaming_pipeline import OVERFLOW_MERGE, StreamingPipeline, chunk_asr, streaming_asr
+from vad_gate import DEFAULT_PAUSE_S as VAD_DEFAULT_PAUSE_S, VadGate
+from CheckpointService import TranscriptionCheckpoint
+from CorrectionCacheService import CACHE_FILE_NAME as CORRECTION_CACHE_FILE, DEFAULT_MAX_MB as CORRECTION_CACHE_DEFAULT_MB, CorrectionCacheService
 from language_names import get_language_combo_values, language_display_to_code
 # UI strings: use t("key") for localized text; keys are in locales/en.json, locales/ru.json
-from i18n import t, set_locale, get_locale, get_available_locales, load_locale_preference, save_locale_preference, load_config, save_config
+from i18n import t, set_locale, get_locale, get_available_locales, load_locale_preference, save_locale_preference, load_config, save_config, get_cache_dir
 
 # Версия приложения (для заголовка, строки состояния и проверки обновлений)
 APP_VERSION = "1.0.0"
@@ -220,17 +228,27 @@ class App(ctk.CTk):
         self.service = TranscriptionService()
         self.export_service = ExportService()
         self.ollama_service = OllamaService()
+        self._correction_cache = None  # CorrectionCacheService (создаётся при первой коррекции)
+        self._audio_cache = None  # AudioCacheService папки проекта (создаётся по требованию)
         self.audio_playback = AudioPlaybackService(
-            schedule_in_main_thread=lambda ms, cb: self.after(int(ms), cb)
+            schedule_in_main_thread=lambda ms, cb: self.after(int(ms), cb),
+            pcm_loader=lambda path: self._cached_audio(path, playback=True, decode=False),
+            pcm_prefetch=lambda path: self._cached_audio(path, playback=True),
         )
-        self.mic_record = MicRecordService()
+        self.mic_record = MicRecordService(recovery_dir=os.path.join(get_cache_dir(), MIC_RECOVERY_DIR))
         self.full_results = []
+        # Изменения сегментов редактора — через модель; список обновляет только изменившиеся строки
+        self._segments_vm = SegmentViewModel(self.full_results)
+        self._segments_vm.subscribe(self._on_segments_changed)
         self.current_file = None
         self.current_session_path = None  # путь к открытому/сохранённому .wiproject
         self.current_project_dir = None  # папка проекта (для нового проекта или папка с .wiproject)
         self._session_dirty = False  # были ли изменения после последнего сохранения
         self.enabled_dictionary_ids = []  # IDs of global dictionaries enabled for this project
         self.file_transcripts = {}  # rel_path -> list of segments (multi-file project state)
+        self._dirty_transcripts = set()  # rel_path транскриптов, изменённых после сохранения
+        self._project_text_revision = 0  # растёт при изменении транскриптов (кэш частот терминов)
+        self._term_freq_cache = None  # (ревизия, словари, частоты)
 
         if project_dir and os.path.isdir(project_dir):
             self.current_project_dir = os.path.abspath(project_dir)
@@ -281,6 +299,13 @@ class App(ctk.CTk):
             command=self._refresh_project_files_list,
         )
         self._left_panel_refresh_btn.grid(row=0, column=1, padx=(0, 8), pady=(10, 8), sticky="e")
+        self._left_panel_batch_btn = ctk.CTkButton(
+            self._left_panel_header, text=t("project_files.transcribe_all"), font=ctk.CTkFont(size=11),
+            height=24, command=self._on_batch_transcribe_clicked,
+        )
+        self._left_panel_batch_btn.grid(row=1, column=0, columnspan=2, padx=8, pady=(0, 8), sticky="ew")
+        self._bind_tooltip(self._left_panel_batch_btn, "project_files.transcribe_all_tooltip")
+        self._batch_queue = None
         self._left_panel_sep = ctk.CTkFrame(self._left_panel, fg_color=("gray75", "gray28"), height=1)
         self._left_panel_sep.grid(row=1, column=0, sticky="ew", padx=8, pady=(4, 4))
         self._left_panel_sep.grid_propagate(False)
@@ -384,10 +409,19 @@ class App(ctk.CTk):
         self._editor_container.grid_rowconfigure(0, weight=1)
         self.txt_output = ctk.CTkTextbox(self._editor_container, font=("Segoe UI", 12))
         self.txt_output.grid(row=0, column=0, sticky="nsew")
-        self._segment_scroll = ctk.CTkScrollableFrame(self._editor_container, fg_color="transparent")
-        self._segment_scroll.grid(row=0, column=0, sticky="nsew")
-        self._segment_scroll.grid_columnconfigure(0, weight=1)
-        self._segment_scroll.grid_remove()  # по умолчанию показываем txt_output (пустой)
+        # Виртуализированный список: виджеты только для видимых строк, переиспользуются при прокрутке
+        self._segment_list = SegmentListView(
+            self._editor_container,
+            on_play=self._play_segment,
+            on_accept=lambda ix: self._segments_vm.accept(ix),
+            on_reject=lambda ix: self._segments_vm.reject(ix),
+            on_edit_text=self._edit_segment_text,
+            on_edit_speaker=self._edit_segment_speaker,
+            on_accept_all=lambda: self._segments_vm.accept_all(),
+            on_reject_all=lambda: self._segments_vm.reject_all(),
+        )
+        self._segment_list.grid(row=0, column=0, sticky="nsew")
+        self._segment_list.grid_remove()  # по умолчанию показываем txt_output (пустой)
 
         # Единая панель записи с микрофона: переключатель режима, глоссарий (по режиму), Старт/Стоп, таймер, осциллограф
         self._recording_panel_container = ctk.CTkFrame(self, fg_color=("gray92", "gray22"), corner_radius=6)
@@ -512,6 +546,7 @@ class App(ctk.CTk):
         self.geometry(f"{800 + self._left_panel_width + self._right_panel_width}x600")
         self.after(100, self._force_update_scroll_regions)
         self.after(50, self._maximize_window)
+        self.after(1000, self._recover_interrupted_recordings)
         self.bind("<Configure>", lambda e: self._update_mic_panel_width(e))
         # Строка вкладок — сразу вверху, без отступа
         self._settings_tab_index = 0  # 0=Transcription, 1=Glossary, 2=Interface
@@ -671,7 +706,7 @@ class App(ctk.CTk):
         _max_name_len = 36
         for i, name in enumerate(names):
             rel_path = name
-            has_transcript = bool(self.file_transcripts.get(rel_path))
+            has_transcript = SessionService.has_transcript(self.file_transcripts, rel_path)
             suffix = " \u2713" if has_transcript else ""
             display_text = (name[: _max_name_len - len(suffix) - 1] + "\u2026" + suffix) if len(name) + len(suffix) > _max_name_len else (name + suffix)
             row_f = ctk.CTkFrame(
@@ -786,8 +821,8 @@ class App(ctk.CTk):
             except Exception as e:
                 messagebox.showerror(t("project_files.rename"), str(e))
                 return
-            if self.file_transcripts.get(rel_path) is not None:
-                self.file_transcripts[new_name] = self.file_transcripts.pop(rel_path)
+            if rel_path in self.file_transcripts:
+                self._store_file_transcript(new_name, self.file_transcripts.pop(rel_path))
             if self.current_file == abs_path:
                 self.current_file = new_abs
                 self.lbl_file.configure(text=os.path.basename(new_abs))
@@ -844,10 +879,10 @@ class App(ctk.CTk):
             prev_rel = SessionService._make_path_relative_to_project(
                 self.current_file, os.path.join(self.current_project_dir, "_.wiproject")
             )
-            self.file_transcripts[prev_rel] = list(self.full_results)
+            self._store_file_transcript(prev_rel, self.full_results)
         abs_path = os.path.normpath(os.path.join(self.current_project_dir, rel_path))
         self.current_file = abs_path
-        self.full_results = list(self.file_transcripts.get(rel_path, []))
+        self.full_results = SessionService.editable_transcript(self.file_transcripts, rel_path)
         self.lbl_file.configure(text=os.path.basename(abs_path))
         if self.full_results:
             self._show_segment_editor()
@@ -856,7 +891,7 @@ class App(ctk.CTk):
             self.btn_save_session.configure(state="normal")
             self.btn_ollama.configure(state="normal")
         else:
-            self._segment_scroll.grid_remove()
+            self._segment_list.grid_remove()
             self.txt_output.grid(row=0, column=0, sticky="nsew")
             self.txt_output.delete("1.0", "end")
             self.btn_export_txt.configure(state="disabled")
@@ -1304,6 +1339,14 @@ class App(ctk.CTk):
             self._settings_vad.deselect()
         self._settings_vad.grid(row=row, column=0, sticky="w", padx=6, pady=8)
         row += 1
+        self._settings_chunked = ctk.CTkCheckBox(win, text=t("settings.chunked"), command=lambda: self._save_transcription_settings())
+        if _cfg.get("transcription_chunked", False):
+            self._settings_chunked.select()
+        else:
+            self._settings_chunked.deselect()
+        self._settings_chunked.grid(row=row, column=0, sticky="w", padx=6, pady=(0, 8))
+        self._bind_tooltip(self._settings_chunked, "settings.chunked_tooltip")
+        row += 1
         _add_hr()
         self._lbl_task = ctk.CTkLabel(win, text=t("settings.task"), font=ctk.CTkFont(weight="bold"))
         self._lbl_task.grid(row=row, column=0, sticky="w", padx=6, pady=(10, 2))
@@ -1343,6 +1386,17 @@ class App(ctk.CTk):
         self._settings_compute.grid(row=row, column=0, padx=6, pady=(0, 8), sticky="w")
         row += 1
         _add_hr()
+        self._lbl_batch_workers = ctk.CTkLabel(win, text=t("settings.batch_workers"), font=ctk.CTkFont(weight="bold"))
+        self._lbl_batch_workers.grid(row=row, column=0, sticky="w", padx=6, pady=(10, 2))
+        row += 1
+        self._lbl_batch_workers_hint = ctk.CTkLabel(win, text=t("settings.batch_workers_hint"), font=_hint_font, text_color=_hint_color, wraplength=240, justify="left")
+        self._lbl_batch_workers_hint.grid(row=row, column=0, sticky="w", padx=6, pady=(0, 2))
+        row += 1
+        self._batch_workers_var = StringVar(value=str(_cfg.get("batch_workers") or 1))
+        self._settings_batch_workers = ctk.CTkSegmentedButton(win, values=["1", "2", "4"], variable=self._batch_workers_var)
+        self._settings_batch_workers.grid(row=row, column=0, padx=6, pady=(0, 8), sticky="w")
+        row += 1
+        _add_hr()
         self._btn_reset_transcription = ctk.CTkButton(win, text=t("settings.reset_to_default"), fg_color=("gray75", "gray35"), command=self._reset_transcription_settings)
         self._btn_reset_transcription.grid(row=row, column=0, padx=6, pady=(10, 12), sticky="ew")
         row += 1
@@ -1350,6 +1404,7 @@ class App(ctk.CTk):
         self._task_var.trace_add("write", lambda *a: app._save_transcription_settings())
         self._device_var.trace_add("write", lambda *a: app._save_transcription_settings())
         self._compute_var.trace_add("write", lambda *a: app._save_transcription_settings())
+        self._batch_workers_var.trace_add("write", lambda *a: app._save_transcription_settings())
 
         # Не прокручивать панель настроек колёсиком, когда курсор над списками модели или языков
         self._settings_scroll = scroll
@@ -1369,6 +1424,10 @@ class App(ctk.CTk):
         self._update_status_bar()
         if hasattr(self, "_status_support_btn"):
             self._status_support_btn.configure(text=t("status.support_project"))
+        if hasattr(self, "_left_panel_title"):
+            self._left_panel_title.configure(text=t("project_files.title"))
+            self._left_panel_refresh_btn.configure(text=t("project_files.refresh"))
+            self._update_batch_button()
         if not self.current_file:
             self.lbl_file.configure(text=t("top.no_file_formats"))
         self.btn_export_txt.configure(text=t("export.txt"))
@@ -1440,6 +1499,8 @@ class App(ctk.CTk):
             ("settings.device", "_lbl_device"),
             ("settings.compute_type", "_lbl_compute_type"),
             ("settings.compute_type_hint", "_lbl_compute_type_hint"),
+            ("settings.batch_workers", "_lbl_batch_workers"),
+            ("settings.batch_workers_hint", "_lbl_batch_workers_hint"),
         ]:
             w = getattr(self, attr, None)
             if w:
@@ -1468,6 +1529,8 @@ class App(ctk.CTk):
             self._lang_selection_label.configure(text=t("settings.selection", value=self._settings_language_value))
         if hasattr(self, "_settings_vad"):
             self._settings_vad.configure(text=t("settings.vad"))
+        if hasattr(self, "_settings_chunked"):
+            self._settings_chunked.configure(text=t("settings.chunked"))
         if hasattr(self, "_settings_word_ts"):
             self._settings_word_ts.configure(text=t("settings.word_timestamps"))
         if hasattr(self, "_btn_reset_transcription"):
@@ -1634,12 +1697,18 @@ class App(ctk.CTk):
             "transcription_language": code,
             "transcription_beam_size": int(self._settings_beam_size.get()) if hasattr(self, "_settings_beam_size") else 5,
             "transcription_vad": bool(self._settings_vad.get()) if hasattr(self, "_settings_vad") else True,
+            "transcription_chunked": bool(self._settings_chunked.get()) if hasattr(self, "_settings_chunked") else False,
             "transcription_word_timestamps": bool(self._settings_word_ts.get()) if hasattr(self, "_settings_word_ts") else False,
             "transcription_task": self._task_var.get().strip() or "transcribe",
             "transcription_device": (_dv.get().strip() or "auto") if (_dv := getattr(self, "_device_var", None)) else "auto",
             "transcription_compute_type": (_cv.get().strip() or "float16") if (_cv := getattr(self, "_compute_var", None)) else "float16",
             "transcription_engine": eng,
         }
+        if hasattr(self, "_batch_workers_var"):
+            try:
+                out["batch_workers"] = max(1, int(self._batch_workers_var.get()))
+            except ValueError:
+                out["batch_workers"] = 1
         if hasattr(self, "_control_diarize_cb"):
             out["whisperx_diarize"] = bool(self._control_diarize_cb.get())
         if hasattr(self, "_settings_hf_token"):
@@ -1657,8 +1726,6 @@ class App(ctk.CTk):
             except (ValueError, AttributeError):
                 out["whisperx_max_speakers"] = None
         save_config(out)
-        if getattr(self, "service", None) is not None:
-            self.service.model = None
 
     def _reset_transcription_settings(self):
         """Сбросить настройки транскрибации на значения по умолчанию."""
@@ -1667,6 +1734,7 @@ class App(ctk.CTk):
             "transcription_language": None,
             "transcription_beam_size": 5,
             "transcription_vad": True,
+            "transcription_chunked": False,
             "transcription_word_timestamps": False,
             "transcription_task": "transcribe",
             "transcription_device": "auto",
@@ -1676,6 +1744,7 @@ class App(ctk.CTk):
             "whisperx_hf_token": None,
             "whisperx_min_speakers": None,
             "whisperx_max_speakers": None,
+            "batch_workers": 1,
         }
         save_config(defaults)
         if hasattr(self, "_control_diarize_cb"):
@@ -1698,10 +1767,13 @@ class App(ctk.CTk):
         self._settings_beam_size.set(5)
         self._beam_size_label.configure(text="5")
         self._settings_vad.select()
+        self._settings_chunked.deselect()
         self._settings_word_ts.deselect()
         self._task_var.set("transcribe")
         self._device_var.set("auto")
         self._compute_var.set("float16")
+        if hasattr(self, "_batch_workers_var"):
+            self._batch_workers_var.set("1")
 
     def _refresh_model_status_labels(self):
         """Обновить подписи статуса (Скачана X MB/GB или Не скачана) для всех моделей."""
@@ -1857,8 +1929,9 @@ class App(ctk.CTk):
                 shutil.rmtree(folder)
             self._refresh_model_status_labels()
             messagebox.showinfo(t("app.title"), t("model.delete_done"))
-            if mid == getattr(self, "_settings_model_value", None):
-                self.service.model = None
+            for key in self.service.loaded_models():
+                if key[1] == mid:
+                    self.service.unload(key)
         except Exception as e:
             messagebox.showerror(t("app.title"), str(e) or t("model.delete_error"))
 
@@ -1915,6 +1988,11 @@ class App(ctk.CTk):
         self._lang_inner.update_idletasks()
         self._force_update_scroll_regions()
 
+    def _store_file_transcript(self, rel_path, segments):
+        """Записать транскрипт файла проекта в память и пометить его для следующего сохранения."""
+        SessionService.store_transcript(self.file_transcripts, self._dirty_transcripts, rel_path, segments)
+        self._project_text_revision += 1
+
     def _save_session(self, force_dialog=False):
         """Сохранить проект. Возвращает True если сохранено, False если пользователь отменил.
         Если открыт проект (current_session_path) и не force_dialog — сохраняет в тот же файл без диалога."""
@@ -1964,7 +2042,8 @@ class App(ctk.CTk):
         project_dir = os.path.dirname(os.path.abspath(path))
         current_rel = SessionService._make_path_relative_to_project(self.current_file, path)
         if path == self.current_session_path and self.current_project_dir == project_dir:
-            file_transcripts_to_save = dict(self.file_transcripts)
+            # Тот же проект: словарь не копируем (при ленивой загрузке копия прочитала бы все файлы)
+            file_transcripts_to_save = self.file_transcripts
         else:
             file_transcripts_to_save = {}
         file_transcripts_to_save[current_rel] = transcript_for_save
@@ -1979,10 +2058,13 @@ class App(ctk.CTk):
             file_transcripts=file_transcripts_to_save,
             current_file_rel=current_rel,
         )
-        if SessionService.save_session(path, session):
+        dirty = set(self._dirty_transcripts) | {current_rel}
+        if SessionService.save_session(path, session, dirty=dirty):
+            self._detach_batch_queue(project_dir)
             self.current_session_path = path
             self.current_project_dir = project_dir
             self.file_transcripts = file_transcripts_to_save
+            self._dirty_transcripts.clear()
             self._session_dirty = False
             self._last_save_time = datetime.now()
             self._update_session_title()
@@ -2005,7 +2087,8 @@ class App(ctk.CTk):
         self._open_session_with_path(path)
 
     def _open_session_with_path(self, path: str):
-        session = SessionService.load_session(path)
+        # Манифест и текущий транскрипт; остальные файлы читаются при выборе в списке
+        session = SessionService.load_session(path, lazy=True)
         if not session:
             messagebox.showerror("Error", "Failed to load session or invalid file.")
             return
@@ -2014,13 +2097,14 @@ class App(ctk.CTk):
                 "Audio file not found",
                 f"The audio file was not found:\n{session.audio_path}\n\nTranscript will be loaded, but you won't be able to re-transcribe without the file."
             )
+        self._detach_batch_queue(os.path.dirname(os.path.abspath(path)))
         self.file_transcripts = getattr(session, "file_transcripts", None) or {}
+        self._dirty_transcripts = set()
         self.current_file = session.audio_path
-        self.full_results = session.transcript
+        self.full_results = [dict(seg) for seg in session.transcript]
         self.lbl_file.configure(text=os.path.basename(session.audio_path))
         if session.model_used and session.model_used in ("tiny", "base", "small", "medium", "large-v3"):
             self._pick_model(session.model_used)
-        self.full_results = session.transcript
         try:
             self._show_segment_editor()
             self._rebuild_segment_list()
@@ -2069,18 +2153,75 @@ class App(ctk.CTk):
                     pass
             self.after(0, _do_refresh_dict_ui)
 
+    def _get_enabled_dictionaries(self):
+        dicts = []
+        for did in self.enabled_dictionary_ids or []:
+            d = DictionaryService.load_by_id(did)
+            if d:
+                dicts.append(d)
+        return dicts
+
+    @staticmethod
+    def _get_prompt_token_budget():
+        try:
+            return int(load_config().get("initial_prompt_token_budget", DEFAULT_PROMPT_TOKEN_BUDGET) or 0)
+        except (TypeError, ValueError):
+            return DEFAULT_PROMPT_TOKEN_BUDGET
+
+    def _get_dynamic_prompt_provider(self):
+        """Подсказка для каждого окна по уже распознанному тексту (transcription_dynamic_prompt); None — выключено."""
+        cfg = load_config()
+        if not cfg.get("transcription_dynamic_prompt", False):
+            return None
+        if (cfg.get("transcription_engine") or "faster-whisper").strip().lower() != "faster-whisper":
+            return None
+        dicts = self._get_enabled_dictionaries()
+        if not dicts:
+            return None
+        return DictionaryService.build_dynamic_prompt_provider(
+            dicts, token_budget=self._get_prompt_token_budget(), count_tokens=self.service.get_token_counter()
+        )
+
     def _get_initial_prompt_text(self):
-        """Initial prompt for Whisper: from enabled global dictionaries."""
+        """Initial prompt for Whisper: from enabled global dictionaries, within initial_prompt_token_budget."""
         if self.enabled_dictionary_ids:
-            dicts = []
-            for did in self.enabled_dictionary_ids:
-                d = DictionaryService.load_by_id(did)
-                if d:
-                    dicts.append(d)
+            dicts = self._get_enabled_dictionaries()
             if dicts:
-                return DictionaryService.build_initial_prompt_text(dicts) or None
+                budget = self._get_prompt_token_budget()
+                freqs = self._get_term_frequencies(dicts) if budget > 0 else None
+                return DictionaryService.build_initial_prompt_text(
+                    dicts,
+                    token_budget=budget,
+                    count_tokens=self.service.get_token_counter(),
+                    term_frequencies=freqs,
+                ) or None
         return None
 
+    def _get_term_frequencies(self, dicts):
+        """Частоты терминов в текстах проекта; пересчёт только после изменения транскриптов или словарей."""
+        revision = self._project_text_revision
+        cached = self._term_freq_cache
+        if (
+            cached is not None and cached[0] == revision and len(cached[1]) == len(dicts)
+            and all(a is b for a, b in zip(cached[1], dicts))
+        ):
+            return cached[2]
+        freqs = DictionaryService.count_term_frequencies(dicts, self._project_texts())
+        self._term_freq_cache = (revision, list(dicts), freqs)
+        return freqs
+
+    def _project_texts(self):
+        """Тексты транскриптов проекта, уже загруженных в память (для ранжирования терминов подсказки)."""
+        transcripts = [self.full_results]
+        try:
+            if isinstance(self.file_transcripts, LazyFileTranscripts):
+                transcripts.extend(self.file_transcripts.loaded_values())
+            else:
+                transcripts.extend(list(self.file_transcripts.values()))
+        except RuntimeError:
+            pass  # словарь меняется из главного потока — берём то, что есть
+        return [s.get("text") or "" for segs in transcripts for s in (segs or [])]
+
     def _has_dictionaries(self):
         """True if any dictionaries are available for transcription."""
         return bool(self.enabled_dictionary_ids)
@@ -2097,6 +2238,15 @@ class App(ctk.CTk):
             entries.extend(DictionaryService.get_correction_entries_from_dictionaries(dicts))
         return entries
 
+    @staticmethod
+    def _get_correction_options():
+        """Режимы постобработки из конфига: только целые слова / без учёта регистра."""
+        cfg = load_config()
+        return {
+            "word_boundary": bool(cfg.get("corrections_word_boundary", False)),
+            "ignore_case": bool(cfg.get("corrections_ignore_case", False)),
+        }
+
     def _build_dictionaries_panel(self, parent):
         """Собирает вкладку Словари: глобальный пул, включение в проекте, пресеты, постобработка."""
         win = parent
@@ -2507,7 +2657,7 @@ class App(ctk.CTk):
                         if not new_name:
                             refresh_global_list()
                             return
-                        data = DictionaryService.load_by_id(did_)
+                        data = DictionaryService.load_by_id(did_, editable=True)
                         if not data:
                             refresh_global_list()
                             return
@@ -2647,7 +2797,7 @@ class App(ctk.CTk):
         def _save_entry_from_form():
             if not self._selected_dictionary_id:
                 return
-            data = DictionaryService.load_by_id(self._selected_dictionary_id)
+            data = DictionaryService.load_by_id(self._selected_dictionary_id, editable=True)
             if not data:
                 return
             from DictionaryService import DictionaryEntry
@@ -2684,7 +2834,7 @@ class App(ctk.CTk):
         def _delete_entry_at(index: int):
             if not self._selected_dictionary_id:
                 return
-            data = DictionaryService.load_by_id(self._selected_dictionary_id)
+            data = DictionaryService.load_by_id(self._selected_dictionary_id, editable=True)
             if not data or index >= len(data.entries):
                 return
             data.entries.pop(index)
@@ -2702,7 +2852,7 @@ class App(ctk.CTk):
             term = self._dict_term_entry.get().strip()
             if not term:
                 return
-            data = DictionaryService.load_by_id(self._selected_dictionary_id)
+            data = DictionaryService.load_by_id(self._selected_dictionary_id, editable=True)
             if not data:
                 return
             from DictionaryService import DictionaryEntry
@@ -2719,7 +2869,7 @@ class App(ctk.CTk):
             corr = self._dict_corr_entry.get().strip()
             if not orig:
                 return
-            data = DictionaryService.load_by_id(self._selected_dictionary_id)
+            data = DictionaryService.load_by_id(self._selected_dictionary_id, editable=True)
             if not data:
                 return
             from DictionaryService import DictionaryEntry
@@ -3412,7 +3562,7 @@ class App(ctk.CTk):
             except Exception:
                 pass
         if getattr(self, "_mic_streaming_stop_flag", None) is not None:
-            self._mic_streaming_stop_flag.append(True)
+            self._signal_mic_streaming_stop()
             self._mic_streaming_worker_done.wait(timeout=10.0)
             if getattr(self, "_mic_streaming_timer_job", [None])[0] is not None:
                 try:
@@ -3429,12 +3579,14 @@ class App(ctk.CTk):
                 if load_config().get("apply_corrections_post") and self.full_results:
                     correction_entries = self._get_correction_entries_for_post()
                     if correction_entries:
-                        DictionaryService.apply_corrections_to_segments(self.full_results, correction_entries)
+                        DictionaryService.apply_corrections_to_segments(
+                            self.full_results, correction_entries, **self._get_correction_options()
+                        )
                 if self.current_project_dir:
                     rel = SessionService._make_path_relative_to_project(
                         path, os.path.join(self.current_project_dir, "_.wiproject")
                     )
-                    self.file_transcripts[rel] = list(self.full_results)
+                    self._store_file_transcript(rel, self.full_results)
                     self._refresh_project_files_list()
                 self._session_dirty = True
                 self._show_segment_editor()
@@ -3457,9 +3609,25 @@ class App(ctk.CTk):
         else:
             self._on_mic_streaming_stop()
 
+    @staticmethod
+    def _get_mic_record_format() -> str:
+        """Формат файла записи с микрофона (ключ mic_record_format: wav или flac)."""
+        fmt = str(load_config().get("mic_record_format") or "wav").lower()
+        return fmt if fmt in MIC_RECORD_FORMATS else "wav"
+
+    def _recover_interrupted_recordings(self):
+        """Записи, оборванные сбоем при прошлом запуске: восстановить заголовки и сообщить пути."""
+        paths = MicRecordService.recover_interrupted(self.mic_record.recovery_dir)
+        if paths:
+            messagebox.showinfo("Microphone", t("mic.recovered", paths="\n".join(paths)))
+
     def _on_mic_normal_start(self):
         self.mic_record.set_gain(self._mic_software_gain.get())
-        err = self.mic_record.start_recording(device=self._get_mic_device_index())
+        err = self.mic_record.start_recording(
+            device=self._get_mic_device_index(),
+            output_dir=self.current_project_dir or tempfile.gettempdir(),
+            file_format=self._get_mic_record_format(),
+        )
         if err:
             messagebox.showerror("Microphone", err)
             return
@@ -3551,25 +3719,28 @@ class App(ctk.CTk):
         self._mic_start_btn.configure(state="disabled")
         self._mic_stop_btn.configure(state="normal")
         self._mic_streaming_stop_flag = []
+        self._mic_streaming_stop_event = threading.Event()
         self._mic_streaming_worker_done = threading.Event()
         self.txt_output.delete("1.0", "end")
-        self._segment_scroll.grid_remove()
+        self._segment_list.grid_remove()
         self.txt_output.grid(row=0, column=0, sticky="nsew")
         self._start_mic_streaming_worker()
 
-    # Interval (seconds) for streaming mic: take chunks and transcribe
+    # Target latency (seconds) for streaming mic: chunk size for per-chunk transcription / online ASR
     _STREAMING_CHUNK_INTERVAL_SEC = 4
+    _STREAMING_LATENCY_SEC = 1.0
 
     def _start_mic_streaming_worker(self):
         """Запуск потоковой записи: загрузка модели, старт микрофона, цикл транскрибации в панели."""
-        import soundfile as sf
         output_dir = self.current_project_dir if self.current_project_dir else tempfile.gettempdir()
         if not hasattr(self, "_mic_streaming_stop_flag") or self._mic_streaming_stop_flag is None:
             self._mic_streaming_stop_flag = []
+        self._mic_streaming_stop_event = threading.Event()
         self._mic_streaming_worker_done = threading.Event()
         self._mic_streaming_timer_job = [None]
         self._mic_streaming_elapsed = [0.0]
         self._mic_streaming_results = []
+        self._mic_streaming_pipeline = None  # StreamingPipeline (создаётся после загрузки модели)
 
         def update_timer():
             if not getattr(self, "_mic_panel_visible", True):
@@ -3578,6 +3749,10 @@ class App(ctk.CTk):
             m, s = int(self._mic_streaming_elapsed[0]) // 60, int(self._mic_streaming_elapsed[0]) % 60
             try:
                 self._mic_timer.configure(text=f"{m:02d}:{s:02d}")
+                pipeline = getattr(self, "_mic_streaming_pipeline", None)
+                if pipeline is not None and pipeline.gate is not None:
+                    speech = int(round(pipeline.gate.stats()["speech_ratio"] * 100))
+                    self._mic_status.configure(text=t("mic.recording_streaming_vad", speech=speech))
             except Exception:
                 return
             if not self._mic_streaming_stop_flag and self.mic_record.is_recording() and getattr(self, "_mic_panel_visible", True):
@@ -3618,7 +3793,12 @@ class App(ctk.CTk):
                         pass
                 self.after(0, lambda: safe_status(t("mic.recording_streaming")))
                 self.mic_record.set_gain(self._mic_software_gain.get())
-                err = self.mic_record.start_recording(device=self._get_mic_device_index())
+                err = self.mic_record.start_recording(
+                    device=self._get_mic_device_index(),
+                    output_dir=output_dir,
+                    file_format=self._get_mic_record_format(),
+                    asr_rate=16000,
+                )
                 if err:
                     self.after(0, lambda e=err: (
                         messagebox.showerror("Microphone", e),
@@ -3648,74 +3828,13 @@ class App(ctk.CTk):
                 word_ts = self._settings_word_ts.get() if hasattr(self, "_settings_word_ts") else False
                 use_glossary = self._mic_streaming_use_glossary_var.get() and self._has_dictionaries()
                 initial_prompt = self._get_initial_prompt_text() if use_glossary else None
-                interval = self._STREAMING_CHUNK_INTERVAL_SEC
-                stream_interval = interval
-                cumulative_offset = [0.0]
                 use_streaming_api = self.service.supports_streaming()
                 if use_streaming_api:
-                    import queue as queue_module
-                    import numpy as np
-                    try:
-                        import librosa
-                    except ImportError:
-                        use_streaming_api = False
-                if use_streaming_api:
-                    audio_queue = queue_module.Queue()
-                    streaming_done = threading.Event()
-                    def chunk_iter():
-                        while True:
-                            x = audio_queue.get()
-                            if x is None:
-                                return
-                            yield x
-                    def streaming_consumer():
-                        try:
-                            for start, end, text in self.service.streaming_transcribe(chunk_iter()):
-                                if not getattr(self, "_mic_streaming_stop_flag", []):
-                                    self._mic_streaming_results.append({
-                                        "start": start,
-                                        "end": end,
-                                        "text": text or "",
-                                    })
-                                    if text:
-                                        def safe_append(bit):
-                                            if not getattr(self, "_mic_panel_visible", True):
-                                                return
-                                            try:
-                                                self.txt_output.insert("end", bit + " ")
-                                                self.txt_output.see("end")
-                                            except Exception:
-                                                pass
-                                        self.after(0, lambda t=text: safe_append(t))
-                        finally:
-                            streaming_done.set()
-                    consumer_thread = threading.Thread(target=streaming_consumer, daemon=True)
-                    consumer_thread.start()
-                    stream_interval = max(0.5, min(2.0, interval * 0.5))
+                    asr = streaming_asr(self.service.streaming_transcribe)
                 else:
-                    stream_interval = interval
-                while len(self._mic_streaming_stop_flag) == 0:
-                    time.sleep(stream_interval if use_streaming_api else interval)
-                    if len(self._mic_streaming_stop_flag) > 0:
-                        break
-                    data = self.mic_record.take_accumulated_chunks()
-                    if data is None or len(data) == 0:
-                        continue
-                    if use_streaming_api:
-                        sr = self.mic_record.sample_rate
-                        arr = data if hasattr(data, "dtype") else np.frombuffer(data, dtype=np.int16)
-                        audio_f = (arr.astype(np.float32) / 32768.0) if (getattr(arr, "dtype", None) == np.int16) else arr.astype(np.float32)
-                        if sr != 16000:
-                            audio_16k = librosa.resample(audio_f, orig_sr=sr, target_sr=16000)
-                        else:
-                            audio_16k = audio_f
-                        audio_queue.put((audio_16k, 16000))
-                        continue
-                    tmp = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-                    try:
-                        sf.write(tmp.name, data, self.mic_record.sample_rate)
-                        segs, info = self.service.transcribe(
-                            tmp.name,
+                    def transcribe_chunk(audio):
+                        segs, _info = self.service.transcribe(
+                            audio,
                             language=language,
                             initial_prompt=initial_prompt,
                             beam_size=beam_size,
@@ -3723,34 +3842,57 @@ class App(ctk.CTk):
                             task=task,
                             word_timestamps=word_ts,
                         )
-                        duration = getattr(info, "duration", 0) or 0
-                        offset = cumulative_offset[0]
-                        for s in (segs or []):
-                            self._mic_streaming_results.append({
-                                "start": s.get("start", 0) + offset,
-                                "end": s.get("end", 0) + offset,
-                                "text": s.get("text", ""),
-                            })
-                        cumulative_offset[0] += duration
-                        text_bit = " ".join((s.get("text") or "").strip() for s in (segs or []))
-                        if text_bit:
-                            def safe_append(bit):
-                                if not getattr(self, "_mic_panel_visible", True):
-                                    return
-                                try:
-                                    self.txt_output.insert("end", bit + " ")
-                                    self.txt_output.see("end")
-                                except Exception:
-                                    pass
-                            self.after(0, lambda t=text_bit: safe_append(t))
-                    finally:
-                        try:
-                            os.unlink(tmp.name)
-                        except Exception:
-                            pass
-                if use_streaming_api:
-                    audio_queue.put(None)
-                    streaming_done.wait(timeout=15.0)
+                        return segs
+                    asr = chunk_asr(transcribe_chunk)
+
+                def safe_append(bit):
+                    if not getattr(self, "_mic_panel_visible", True):
+                        return
+                    try:
+                        self.txt_output.insert("end", bit + " ")
+                        self.txt_output.see("end")
+                    except Exception:
+                        pass
+
+                def on_result(result):
+                    self._mic_streaming_results.append(result)
+                    text_bit = (result.get("text") or "").strip()
+                    if text_bit:
+                        self.after(0, lambda t=text_bit: safe_append(t))
+
+                # Захват -> ASR по событиям: фрагмент уходит в ASR, как только набралась целевая задержка
+                cfg = load_config()
+                default_latency = self._STREAMING_LATENCY_SEC if use_streaming_api else self._STREAMING_CHUNK_INTERVAL_SEC
+                try:
+                    target_latency = float(cfg.get("mic_streaming_latency_sec") or default_latency)
+                except (TypeError, ValueError):
+                    target_latency = default_latency
+                # VAD: тишина не идёт в ASR, долгая пауза закрывает фразу (ключи mic_streaming_vad*)
+                gate = None
+                if cfg.get("mic_streaming_vad", True):
+                    try:
+                        pause = float(cfg.get("mic_streaming_vad_pause_sec") or VAD_DEFAULT_PAUSE_S)
+                    except (TypeError, ValueError):
+                        pause = VAD_DEFAULT_PAUSE_S
+                    gate = VadGate(pause_s=max(0.2, pause))
+                pipeline = StreamingPipeline(
+                    read_audio=lambda final: self.mic_record.take_asr_audio(final=final),
+                    wait_audio=self.mic_record.wait_for_audio,
+                    asr=asr,
+                    on_result=on_result,
+                    target_latency_s=max(0.2, target_latency),
+                    overflow=cfg.get("mic_streaming_overflow") or OVERFLOW_MERGE,
+                    on_error=lambda e: self.after(0, lambda m=str(e): messagebox.showerror("Microphone", m)),
+                    gate=gate,
+                )
+                self._mic_streaming_pipeline = pipeline
+                pipeline.start()
+                self._mic_streaming_stop_event.wait()
+                # Остаток записи дочитывается и распознаётся (не дольше, чем ждёт остановка в UI)
+                pipeline.stop(timeout=8.0)
+                stats = pipeline.stats()
+                if stats["dropped_s"]:
+                    print(f"Mic streaming: ASR fell behind, {stats['dropped_s']} s of audio dropped")
             except Exception as e:
                 self.after(0, lambda: messagebox.showerror("Microphone", str(e)))
             finally:
@@ -3758,9 +3900,15 @@ class App(ctk.CTk):
 
         threading.Thread(target=worker, daemon=True).start()
 
+    def _signal_mic_streaming_stop(self):
+        self._mic_streaming_stop_flag.append(True)
+        event = getattr(self, "_mic_streaming_stop_event", None)
+        if event is not None:
+            event.set()
+
     def _on_mic_streaming_stop(self):
         """Остановить потоковую запись и сохранить результат."""
-        self._mic_streaming_stop_flag.append(True)
+        self._signal_mic_streaming_stop()
         self._mic_streaming_worker_done.wait(timeout=10.0)
         try:
             self.service.clear_engine_override()
@@ -3789,16 +3937,26 @@ class App(ctk.CTk):
             return
         self.current_file = path
         self.lbl_file.configure(text=os.path.basename(path))
+        pipeline = getattr(self, "_mic_streaming_pipeline", None)
+        if pipeline is not None and pipeline.gate is not None:
+            vad = pipeline.gate.stats()
+            summary = t(
+                "mic.streaming_vad_summary",
+                speech=int(round(vad["speech_ratio"] * 100)), utterances=vad["utterances"],
+            )
+            self.lbl_file.configure(text=f"{os.path.basename(path)} | {summary}")
         self.full_results = list(getattr(self, "_mic_streaming_results", []))
         if load_config().get("apply_corrections_post") and self.full_results:
             correction_entries = self._get_correction_entries_for_post()
             if correction_entries:
-                DictionaryService.apply_corrections_to_segments(self.full_results, correction_entries)
+                DictionaryService.apply_corrections_to_segments(
+                    self.full_results, correction_entries, **self._get_correction_options()
+                )
         if self.current_project_dir and path:
             rel = SessionService._make_path_relative_to_project(
                 path, os.path.join(self.current_project_dir, "_.wiproject")
             )
-            self.file_transcripts[rel] = list(self.full_results)
+            self._store_file_transcript(rel, self.full_results)
             self._refresh_project_files_list()
         self._session_dirty = True
         self._show_segment_editor()
@@ -3832,58 +3990,290 @@ class App(ctk.CTk):
         # Запуск в отдельном потоке
         threading.Thread(target=self._run_logic, args=(model_size,), daemon=True).start()
 
+    @staticmethod
+    def _use_chunked_transcription(cfg) -> bool:
+        """Параллельная транскрибация окнами (только faster-whisper)."""
+        engine = (cfg.get("transcription_engine") or "faster-whisper").strip().lower()
+        return engine == "faster-whisper" and bool(cfg.get("transcription_chunked", False))
+
+    @staticmethod
+    def _get_chunk_workers(cfg) -> int:
+        try:
+            return max(1, int(cfg.get("transcription_chunk_workers") or 0))
+        except (TypeError, ValueError):
+            pass
+        return max(2, min(4, (os.cpu_count() or 2) // 2))
+
+    def _get_load_model_kwargs(self, model_size):
+        """Параметры load_model из настроек транскрибации."""
+        device = self._device_var.get().strip().lower()
+        if device == "auto":
+            device = "cuda"
+        compute_type = self._compute_var.get().strip().lower()
+        load_kw = dict(model_size=model_size, device=device, compute_type=compute_type)
+        cfg = load_config()
+        if self._use_chunked_transcription(cfg):
+            load_kw["num_workers"] = self._get_chunk_workers(cfg)
+        return load_kw
+
+    def _get_prompt_kwargs(self):
+        """initial_prompt и dynamic_prompt из словарей; бюджет токенов считается токенизатором загруженной модели."""
+        prompt_kw = {"initial_prompt": self._get_initial_prompt_text()}
+        dynamic_prompt = self._get_dynamic_prompt_provider()
+        if dynamic_prompt is not None:
+            prompt_kw["dynamic_prompt"] = dynamic_prompt
+        return prompt_kw
+
+    def _get_transcribe_kwargs(self, with_prompt=True):
+        """
+        Параметры transcribe из настроек транскрибации (без progress_callback).
+        with_prompt=False — без подсказок словарей: их считают после load_model (_get_prompt_kwargs).
+        """
+        transcribe_kw = dict(
+            language=language_display_to_code(self._settings_language_value),
+            beam_size=int(self._settings_beam_size.get()),
+            vad_filter=self._settings_vad.get(),
+            task=self._task_var.get().strip() or "transcribe",
+            word_timestamps=self._settings_word_ts.get(),
+        )
+        cfg = load_config()
+        if with_prompt:
+            transcribe_kw.update(self._get_prompt_kwargs())
+        if self._use_chunked_transcription(cfg):
+            transcribe_kw["chunked"] = True
+            transcribe_kw["chunk_workers"] = self._get_chunk_workers(cfg)
+        try:
+            batch_size = int(cfg.get("transcription_batch_size") or 0)
+        except (TypeError, ValueError):
+            batch_size = 0
+        if batch_size > 1 and (cfg.get("transcription_engine") or "faster-whisper").strip().lower() == "faster-whisper":
+            transcribe_kw["batch_size"] = batch_size
+        if (cfg.get("transcription_engine") or "").strip().lower() == "whisperx":
+            transcribe_kw["diarize"] = bool(cfg.get("whisperx_diarize", False))
+            transcribe_kw["hf_token"] = (cfg.get("whisperx_hf_token") or "").strip() or None
+            transcribe_kw["min_speakers"] = cfg.get("whisperx_min_speakers")
+            transcribe_kw["max_speakers"] = cfg.get("whisperx_max_speakers")
+        return transcribe_kw
+
+    def _postprocess_results(self, results):
+        """Удаление хвостовых галлюцинаций и (опционально) исправления из словарей."""
+        results = self._strip_tail_hallucinations(results)
+        if load_config().get("apply_corrections_post") and results:
+            correction_entries = self._get_correction_entries_for_post()
+            if correction_entries:
+                DictionaryService.apply_corrections_to_segments(
+                    results, correction_entries, **self._get_correction_options()
+                )
+        return results
+
+    def _get_audio_cache(self):
+        """Кэш декодированного аудио в папке проекта; None без проекта/numpy или при audio_cache_enabled = false."""
+        if not self.current_project_dir or not AudioCacheService.is_available():
+            return None
+        cfg = load_config()
+        if not cfg.get("audio_cache_enabled", True):
+            return None
+        cache_dir = os.path.abspath(AudioCacheService.cache_dir_for_project(self.current_project_dir))
+        if self._audio_cache is None or self._audio_cache.cache_dir != cache_dir:
+            try:
+                max_mb = float(cfg.get("audio_cache_max_mb") or AUDIO_CACHE_DEFAULT_MB)
+            except (TypeError, ValueError):
+                max_mb = AUDIO_CACHE_DEFAULT_MB
+            self._audio_cache = AudioCacheService(cache_dir, max_mb=max_mb)
+        return self._audio_cache
+
+    def _cached_audio(self, path, playback=False, decode=True):
+        """PCM файла из кэша (memmap) или None — тогда бэкенд/плеер декодирует файл сам.
+        decode=False — только уже готовая запись (плеер не ждёт декодирования при первом Play)."""
+        cache = self._get_audio_cache()
+        if cache is None or not path:
+            return None
+        return cache.get_playback_audio(path, decode=decode) if playback else cache.get_asr_audio(path)
+
+    @staticmethod
+    def _checkpoint_for(project_dir, media_path, model_size, transcribe_kw):
+        """Контрольная точка файла в папке проекта (None при transcription_checkpoints = false)."""
+        cfg = load_config()
+        if not cfg.get("transcription_checkpoints", True):
+            return None
+        settings = {
+            "engine": (cfg.get("transcription_engine") or "faster-whisper").strip().lower(),
+            "model": model_size,
+            "language": transcribe_kw.get("language"),
+            "task": transcribe_kw.get("task"),
+        }
+        return TranscriptionCheckpoint.for_project(project_dir, media_path, settings)
+
+    def _get_checkpoint(self, model_size, transcribe_kw):
+        """Контрольная точка текущего файла в папке проекта (None без проекта или при transcription_checkpoints = false)."""
+        if not self.current_project_dir or not self.current_file:
+            return None
+        checkpoint = self._checkpoint_for(self.current_project_dir, self.current_file, model_size, transcribe_kw)
+        if checkpoint is None:
+            return None
+        _, resume_from = checkpoint.load()
+        if resume_from > 0:
+            m, s = int(resume_from) // 60, int(resume_from) % 60
+            self._update_status(f"Resuming from {m:02d}:{s:02d}...")
+        return checkpoint
+
     def _run_logic(self, model_size):
         try:
-            device = self._device_var.get().strip().lower()
-            if device == "auto":
-                device = "cuda"
-            compute_type = self._compute_var.get().strip().lower()
             self._update_status("Loading model... (may take some time)")
-            if not self.service.load_model(model_size=model_size, device=device, compute_type=compute_type):
+            if not self.service.load_model(**self._get_load_model_kwargs(model_size)):
                 self._on_complete("Error loading model.")
                 return
 
-            language = language_display_to_code(self._settings_language_value)
-            beam_size = int(self._settings_beam_size.get())
-            vad_filter = self._settings_vad.get()
-            task = self._task_var.get().strip() or "transcribe"
-            word_timestamps = self._settings_word_ts.get()
-
             self._update_status("Processing...")
-            initial_prompt = self._get_initial_prompt_text()
-            transcribe_kw = dict(
-                language=language,
-                initial_prompt=initial_prompt,
-                beam_size=beam_size,
-                vad_filter=vad_filter,
-                task=task,
-                word_timestamps=word_timestamps,
-                progress_callback=self._on_progress,
-            )
-            cfg = load_config()
-            if (cfg.get("transcription_engine") or "").strip().lower() == "whisperx":
-                transcribe_kw["diarize"] = bool(cfg.get("whisperx_diarize", False))
-                transcribe_kw["hf_token"] = (cfg.get("whisperx_hf_token") or "").strip() or None
-                transcribe_kw["min_speakers"] = cfg.get("whisperx_min_speakers")
-                transcribe_kw["max_speakers"] = cfg.get("whisperx_max_speakers")
-            results, info = self.service.transcribe(self.current_file, **transcribe_kw)
-            results = self._strip_tail_hallucinations(results)
-            self.full_results = results
-            if load_config().get("apply_corrections_post") and self.full_results:
-                correction_entries = self._get_correction_entries_for_post()
-                if correction_entries:
-                    DictionaryService.apply_corrections_to_segments(self.full_results, correction_entries)
+            transcribe_kw = self._get_transcribe_kwargs()
+            transcribe_kw["progress_callback"] = self._on_progress
+            source = self._cached_audio(self.current_file)
+            checkpoint = self._get_checkpoint(model_size, transcribe_kw)
+            if checkpoint is not None:
+                results, info = self.service.transcribe_with_checkpoint(
+                    self.current_file, checkpoint, audio=source, **transcribe_kw
+                )
+            else:
+                results, info = self.service.transcribe(
+                    self.current_file if source is None else source, **transcribe_kw
+                )
+            self.full_results = self._postprocess_results(results)
             if self.current_project_dir and self.current_file:
                 rel = SessionService._make_path_relative_to_project(
                     self.current_file, os.path.join(self.current_project_dir, "_.wiproject")
                 )
-                self.file_transcripts[rel] = list(self.full_results)
+                self._store_file_transcript(rel, self.full_results)
                 self.after(0, self._refresh_project_files_list)
             self._on_complete("Done!")
 
         except Exception as e:
             self._on_complete(f"An error occurred: {str(e)}")
 
+    def _update_batch_button(self):
+        """Подпись кнопки пакетной транскрибации: старт / отмена / продолжить."""
+        q = self._batch_queue
+        if q is not None and q.is_running:
+            text = t("project_files.batch_cancel")
+        elif q is not None and q.has_pending():
+            text = t("project_files.batch_resume")
+        else:
+            text = t("project_files.transcribe_all")
+        self._left_panel_batch_btn.configure(text=text)
+
+    def _on_batch_transcribe_clicked(self):
+        """Транскрибировать все файлы проекта без транскрипта (или отменить / продолжить пакет)."""
+        q = self._batch_queue
+        if q is not None and q.is_running:
+            q.cancel()
+            self._update_batch_button()
+            return
+        if q is not None and q.has_pending():
+            q.resume()
+            self._on_batch_started()
+            return
+        if not self.current_project_dir or not os.path.isdir(self.current_project_dir):
+            messagebox.showwarning("Warning", t("project_files.no_project"))
+            return
+        # Текущий транскрипт в кэш, чтобы не транскрибировать его повторно
+        if self.current_file and self.full_results:
+            rel = SessionService._make_path_relative_to_project(
+                self.current_file, os.path.join(self.current_project_dir, "_.wiproject")
+            )
+            self._store_file_transcript(rel, self.full_results)
+        rel_paths = BatchTranscriptionQueue.find_untranscribed(self.current_project_dir, self.file_transcripts)
+        if not rel_paths:
+            messagebox.showinfo(t("project_files.transcribe_all"), t("project_files.batch_nothing"))
+            return
+        try:
+            workers = max(1, int(load_config().get("batch_workers") or 1))
+        except (TypeError, ValueError):
+            workers = 1
+        project_dir = self.current_project_dir
+        model_size = self._settings_model_value
+        transcribe_kw = self._get_transcribe_kwargs(with_prompt=False)
+        self._batch_queue = BatchTranscriptionQueue(
+            self.service,
+            project_dir,
+            workers=workers,
+            load_kwargs=self._get_load_model_kwargs(model_size),
+            transcribe_kwargs=transcribe_kw,
+            late_transcribe_kwargs=self._get_prompt_kwargs,
+            on_job_progress=lambda job: self.after(0, self._on_batch_progress),
+            on_job_done=lambda job: self.after(0, lambda: self._on_batch_job_done(job)),
+            on_finished=lambda cancelled: self.after(0, lambda: self._on_batch_finished(cancelled)),
+            postprocess=self._postprocess_results,
+            audio_loader=self._cached_audio,
+            checkpoint_factory=lambda path: self._checkpoint_for(project_dir, path, model_size, transcribe_kw),
+        )
+        self._batch_queue.add(rel_paths)
+        self._batch_queue.start()
+        self._on_batch_started()
+
+    def _on_batch_started(self):
+        self.btn_start.configure(state="disabled")
+        self.btn_mic_record.configure(state="disabled")
+        self.progress_bar.set(0)
+        self._update_batch_button()
+        self._on_batch_progress()
+
+    def _on_batch_progress(self):
+        q = self._batch_queue
+        if q is None:
+            return
+        jobs = list(q.jobs)
+        total = len(jobs) or 1
+        finished = sum(1 for j in jobs if j.status in (JOB_DONE, JOB_FAILED))
+        running = [j for j in jobs if j.status == "running"]
+        self.progress_bar.set((finished + sum(j.progress for j in running)) / total)
+        current = ", ".join(f"{j.rel_path} {int(j.progress * 100)}%" for j in running)
+        self.lbl_file.configure(text=t("project_files.batch_status", done=finished, total=len(jobs), current=current))
+
+    def _detach_batch_queue(self, project_dir):
+        """Пакет относится к папке своего проекта: при переходе в другой проект он отменяется и забывается,
+        иначе готовые задания записали бы чужие относительные пути в новый проект."""
+        q = self._batch_queue
+        if q is None or q.project_dir == os.path.abspath(project_dir):
+            return
+        q.cancel()
+        self._batch_queue = None
+        self.btn_start.configure(state="normal")
+        self.btn_mic_record.configure(state="normal")
+        self._update_batch_button()
+
+    def _on_batch_job_done(self, job):
+        q = self._batch_queue
+        if q is None or not self.current_project_dir or q.project_dir != os.path.abspath(self.current_project_dir):
+            return  # пакет другого проекта (проект сменился, пока шло задание)
+        if job.status == JOB_DONE:
+            self._store_file_transcript(job.rel_path, job.segments)
+            self._session_dirty = True
+            if self.current_file and os.path.normpath(self.current_file) == os.path.normpath(job.abs_path):
+                self.full_results = list(job.segments)
+                self._show_segment_editor()
+                self._rebuild_segment_list()
+            self._refresh_project_files_list()
+        self._on_batch_progress()
+
+    def _on_batch_finished(self, cancelled):
+        q = self._batch_queue
+        self.btn_start.configure(state="normal")
+        self.btn_mic_record.configure(state="normal")
+        self._update_batch_button()
+        if q is None:
+            return
+        if q.get_last_error():
+            messagebox.showerror(t("project_files.transcribe_all"), q.get_last_error())
+            return
+        counts = q.counts()
+        self.progress_bar.set(1.0 if not cancelled else self.progress_bar.get())
+        self.lbl_file.configure(text=t(
+            "project_files.batch_finished", done=counts[JOB_DONE], failed=counts[JOB_FAILED], pending=counts["pending"],
+        ))
+        if self.full_results:
+            self.btn_export_txt.configure(state="normal")
+            self.btn_save_session.configure(state="normal")
+            self.btn_ollama.configure(state="normal")
+
     def _on_progress(self, current_time, total_duration, text):
         # Обновление UI из потока
         progress = current_time / total_duration if total_duration > 0 else 0
@@ -3914,67 +4304,43 @@ class App(ctk.CTk):
     def _show_segment_editor(self):
         """Показать редактор сегментов (список с Play-at-line), скрыть потоковый текст."""
         self.txt_output.grid_remove()
-        self._segment_scroll.grid(row=0, column=0, sticky="nsew")
+        self._segment_list.grid(row=0, column=0, sticky="nsew")
 
     def _show_streaming_output(self):
         """Показать потоковый вывод (во время транскрипции)."""
-        self._segment_scroll.grid_remove()
+        self._segment_list.grid_remove()
         self.txt_output.grid(row=0, column=0, sticky="nsew")
 
     def _rebuild_segment_list(self):
-        """Построить список сегментов: кнопка Play, таймкод, текст; при наличии suggested — подсветка и Accept/Reject."""
-        try:
-            scroll = self._segment_scroll
-            content = scroll.winfo_children()[0] if scroll.winfo_children() else None
-            if content is not None:
-                for w in list(content.winfo_children()):
-                    try:
-                        w.destroy()
-                    except Exception:
-                        pass
-        except Exception:
-            pass
-        if not self.full_results:
-            return
-        for idx, seg in enumerate(self.full_results):
-            start = seg.get("start", 0)
-            end = seg.get("end", 0)
-            text = (seg.get("text") or "").strip()
-            suggested = (seg.get("suggested_text") or "").strip()
-            row_f = ctk.CTkFrame(self._segment_scroll, fg_color=("gray90", "gray25"), corner_radius=4)
-            row_f.grid(row=idx, column=0, sticky="ew", padx=0, pady=2)
-            row_f.grid_columnconfigure(1, weight=1)
-            # Play
-            def _play(ix=idx):
-                self._play_segment(ix)
-            btn_play = ctk.CTkButton(row_f, text=t("editor.play"), width=50, command=_play)
-            btn_play.grid(row=0, column=0, padx=6, pady=4, sticky="w")
-            time_lbl = ctk.CTkLabel(row_f, text=f"[{start:.1f}s – {end:.1f}s]", text_color="gray", font=ctk.CTkFont(size=11))
-            time_lbl.grid(row=0, column=1, padx=(0, 8), pady=4, sticky="w")
-            speaker = seg.get("speaker")
-            if speaker:
-                sp_lbl = ctk.CTkLabel(row_f, text=speaker, text_color=("gray50", "gray55"), font=ctk.CTkFont(size=10))
-                sp_lbl.grid(row=0, column=2, padx=(0, 8), pady=4, sticky="w")
-            if suggested and suggested != text:
-                orig_lbl = ctk.CTkLabel(row_f, text=text, text_color="gray", anchor="w", wraplength=400)
-                orig_lbl.grid(row=1, column=0, columnspan=2, padx=(56, 8), pady=(0, 2), sticky="w")
-                sug_lbl = ctk.CTkLabel(row_f, text=suggested, text_color="#2d7d46", anchor="w", wraplength=400)
-                sug_lbl.grid(row=2, column=0, columnspan=2, padx=(56, 8), pady=(0, 4), sticky="w")
-                def _accept(ix=idx):
-                    self.full_results[ix]["text"] = self.full_results[ix].pop("suggested_text", self.full_results[ix]["text"])
-                    self._session_dirty = True
-                    self._rebuild_segment_list()
-                def _reject(ix=idx):
-                    self.full_results[ix].pop("suggested_text", None)
-                    self._session_dirty = True
-                    self._rebuild_segment_list()
-                btn_accept = ctk.CTkButton(row_f, text=t("editor.accept"), width=70, fg_color="green", hover_color="darkgreen", command=_accept)
-                btn_accept.grid(row=3, column=0, padx=(56, 4), pady=(0, 4), sticky="w")
-                btn_reject = ctk.CTkButton(row_f, text=t("editor.reject"), width=70, fg_color="gray", command=_reject)
-                btn_reject.grid(row=3, column=1, padx=(0, 8), pady=(0, 4), sticky="w")
-            else:
-                text_lbl = ctk.CTkLabel(row_f, text=text or "—", anchor="w", wraplength=500)
-                text_lbl.grid(row=1, column=0, columnspan=2, padx=(56, 8), pady=(0, 4), sticky="w")
+        """Показать full_results в списке сегментов (строки переиспользуются, см. SegmentListView)."""
+        self._segments_vm.reset(self.full_results)
+
+    def _on_segments_changed(self, change):
+        """RowChange из SegmentViewModel: перерисовать только затронутые строки."""
+        self._project_text_revision += 1
+        if change.kind == ROWS_CHANGED:
+            self._session_dirty = True
+            self._segment_list.refresh_rows(change.indices)
+        else:
+            self._segment_list.set_segments(self._segments_vm.segments)
+        self._segment_list.set_bulk_actions_visible(self._segments_vm.has_pending_suggestions())
+
+    def _edit_segment_text(self, index: int):
+        seg = self.full_results[index]
+        text = simpledialog.askstring(
+            t("editor.edit_text"), f"[{seg.get('start', 0):.1f}s – {seg.get('end', 0):.1f}s]",
+            initialvalue=(seg.get("text") or "").strip(), parent=self,
+        )
+        if text is not None:
+            self._segments_vm.set_text(index, text.strip())
+
+    def _edit_segment_speaker(self, index: int):
+        speaker = simpledialog.askstring(
+            t("editor.edit_speaker"), t("editor.edit_speaker_prompt"),
+            initialvalue=self.full_results[index].get("speaker") or "", parent=self,
+        )
+        if speaker is not None:
+            self._segments_vm.set_speaker(index, speaker.strip() or None)
 
     def _play_segment(self, index: int):
         """Воспроизвести сегмент по индексу (требуется current_file и audio_playback)."""
@@ -4008,50 +4374,142 @@ class App(ctk.CTk):
             messagebox.showerror("Ollama", "No models found in Ollama. Run: ollama pull llama3.2 (or another model).")
             return
         system_prompt = self._get_initial_prompt_text()
-        self.btn_ollama.configure(state="disabled")
+        # Во время коррекции кнопка Ollama останавливает её
+        self.btn_ollama.configure(text=t("export.ollama_stop"), command=self._ollama_cancel, state="normal")
         self.btn_export_txt.configure(state="disabled")
         self.btn_save_session.configure(state="disabled")
+        # Предложения показываются по мере готовности; запросы работают со снимком текста
+        target = self.full_results
+        snapshot = [dict(seg) for seg in target]
+        if self._segments_vm.segments is not target:
+            self._rebuild_segment_list()
+        self._show_segment_editor()
+        cfg = load_config()
+        try:
+            workers = int(cfg.get("ollama_parallel_requests", OLLAMA_DEFAULT_WORKERS) or 1)
+        except (TypeError, ValueError):
+            workers = OLLAMA_DEFAULT_WORKERS
+        try:
+            batch_tokens = int(cfg.get("ollama_batch_tokens", OLLAMA_DEFAULT_BATCH_TOKENS) or 0)
+        except (TypeError, ValueError):
+            batch_tokens = OLLAMA_DEFAULT_BATCH_TOKENS
+        stream = bool(cfg.get("ollama_stream", True))
+        cache = self._get_correction_cache(cfg)
+        if cache is not None:
+            cache.reset_stats()
+
+        # Частичные и готовые тексты копятся здесь и применяются не чаще раза в _OLLAMA_UI_FLUSH_MS
+        pending = {}
+        pending_lock = threading.Lock()
+        flush_scheduled = [False]
+        partial_only = set()  # сегменты с частичным текстом без окончательного ответа
+
+        def flush():
+            with pending_lock:
+                items = list(pending.items())
+                pending.clear()
+                flush_scheduled[0] = False
+            for index, text in items:
+                self._apply_ollama_suggestion(target, index, text)
+
+        def push(index, text, final):
+            with pending_lock:
+                pending[index] = text
+                if final:
+                    partial_only.discard(index)
+                else:
+                    partial_only.add(index)
+                if flush_scheduled[0]:
+                    return
+                flush_scheduled[0] = True
+            self.after(self._OLLAMA_UI_FLUSH_MS, flush)
+
+        def finish():
+            flush()
+            # Прерванные на середине ответы не оставляем как предложения
+            for index in sorted(partial_only):
+                if self._segments_vm.segments is target:
+                    self._segments_vm.reject(index)
+                elif index < len(target):
+                    target[index].pop("suggested_text", None)
+            self._ollama_done()
 
         def run():
             try:
-                total = len(self.full_results)
+                def on_segment(index, seg):
+                    push(index, seg.get("text", ""), True)
+
                 def on_progress(current, tot, _):
                     progress = current / tot if tot else 0
+                    status = f"Ollama: {current}/{tot}"
+                    if cache is not None:
+                        status += f" (cache: {cache.hits} hits, {cache.misses} misses)"
                     self.after(0, lambda: self.progress_bar.set(progress))
                     self.after(0, lambda: self.lbl_file.configure(
-                        text=f"{os.path.basename(self.current_file)} | Ollama: {current}/{tot}"
+                        text=f"{os.path.basename(self.current_file or '')} | {status}"
                     ))
                 result = self.ollama_service.correct_segments(
-                    self.full_results,
+                    snapshot,
                     model=model,
                     system_prompt=system_prompt,
                     progress_callback=on_progress,
+                    on_segment=on_segment,
+                    workers=workers,
+                    batch_tokens=batch_tokens,
+                    on_partial=(lambda index, text: push(index, text, False)) if stream else None,
+                    cache=cache,
                 )
                 if result is not None:
-                    self.after(0, lambda: self._apply_ollama_suggestions(result))
+                    done_status = "Ollama done"
+                    if cache is not None:
+                        done_status += f" (cache: {cache.hits} hits, {cache.misses} misses)"
+                    self.after(0, lambda: self._on_ollama_finished(done_status))
+                elif self.ollama_service.is_cancelled():
+                    self.after(0, lambda: self._on_ollama_finished("Ollama stopped"))
                 else:
                     err = self.ollama_service.get_last_error() or "Unknown error."
                     self.after(0, lambda: messagebox.showerror("Ollama", f"Correction failed.\n\n{err}"))
             except Exception as e:
                 self.after(0, lambda: messagebox.showerror("Ollama", str(e)))
             finally:
-                self.after(0, self._ollama_done)
+                self.after(0, finish)
 
         threading.Thread(target=run, daemon=True).start()
 
-    def _apply_ollama_suggestions(self, result):
-        """Сохранить ответ Ollama как предложения (suggested_text); не менять принятый text до Accept."""
-        for i, seg in enumerate(self.full_results):
-            if i < len(result):
-                self.full_results[i]["suggested_text"] = result[i].get("text", "")
-        self._show_segment_editor()
-        self._rebuild_segment_list()
+    # Интервал применения потоковых ответов Ollama к редактору, мс
+    _OLLAMA_UI_FLUSH_MS = 100
+
+    def _get_correction_cache(self, cfg):
+        """Кэш коррекций Ollama в папке конфигурации; None при ollama_cache_enabled = false."""
+        if not cfg.get("ollama_cache_enabled", True):
+            return None
+        if self._correction_cache is None:
+            try:
+                max_mb = float(cfg.get("ollama_cache_max_mb", CORRECTION_CACHE_DEFAULT_MB))
+            except (TypeError, ValueError):
+                max_mb = CORRECTION_CACHE_DEFAULT_MB
+            cache = CorrectionCacheService(os.path.join(get_cache_dir(), CORRECTION_CACHE_FILE), max_mb=max_mb)
+            self._correction_cache = cache if cache.is_available() else None
+        return self._correction_cache
+
+    def _ollama_cancel(self):
+        self.btn_ollama.configure(state="disabled")
+        self.ollama_service.cancel()
+
+    def _apply_ollama_suggestion(self, target, index, text):
+        """Сохранить ответ Ollama как предложение (suggested_text); принятый text не меняется до Accept."""
+        if self._segments_vm.segments is target:
+            self._segments_vm.set_suggestion(index, text)
+        elif index < len(target):
+            target[index]["suggested_text"] = text  # пользователь переключил файл — строку не рисуем
+
+    def _on_ollama_finished(self, status="Ollama done"):
         name = os.path.basename(self.current_file) if self.current_file else "Transcript"
-        self.lbl_file.configure(text=f"{name} | Ollama done")
+        self.lbl_file.configure(text=f"{name} | {status}")
 
     def _ollama_done(self):
         self.progress_bar.set(1.0)
-        self.btn_ollama.configure(state="normal")
+        self.btn_ollama.configure(text=t("export.ollama"), command=self._ollama_correct, state="normal")
         self.btn_export_txt.configure(state="normal")
         self.btn_save_session.configure(state="normal")
 
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Виртуализированный список сегментов для редактора транскрипта.
+Виджеты создаются только для видимых строк (строки выкладываются по их реальной высоте, пока
+не заполнят область) и переиспользуются при прокрутке: прокрутка — это смена индекса первой строки и перепривязка строк к данным.
+refresh_rows(indices) обновляет только указанные строки (события SegmentViewModel), не трогая остальные.
+"""
+
+import tkinter
+from typing import Callable, Iterable, List, Optional
+
+import customtkinter as ctk
+
+from i18n import t
+
+# Минимальная высота строки (кнопка Play + текст); строки с предложением Ollama выше
+MIN_ROW_HEIGHT = 34
+ROW_PADY = 2
+WHEEL_ROWS = 3
+
+
+class _SegmentRow(ctk.CTkFrame):
+    """Строка списка: Play, таймкод, спикер, текст или (при suggested_text) оригинал/предложение + Accept/Reject."""
+
+    def __init__(self, master, view: "SegmentListView"):
+        super().__init__(master, fg_color=("gray90", "gray25"), corner_radius=4)
+        self.index = -1
+        self.grid_columnconfigure(1, weight=1)
+        self._btn_play = ctk.CTkButton(self, text=t("editor.play"), width=50, command=lambda: view._row_action("play", self))
+        self._btn_play.grid(row=0, column=0, padx=6, pady=4, sticky="w")
+        self._time_lbl = ctk.CTkLabel(self, text="", text_color="gray", font=ctk.CTkFont(size=11))
+        self._time_lbl.grid(row=0, column=1, padx=(0, 8), pady=4, sticky="w")
+        self._speaker_lbl = ctk.CTkLabel(self, text="", text_color=("gray50", "gray55"), font=ctk.CTkFont(size=10))
+        self._text_lbl = ctk.CTkLabel(self, text="", anchor="w", justify="left", wraplength=500)
+        self._orig_lbl = ctk.CTkLabel(self, text="", text_color="gray", anchor="w", justify="left", wraplength=400)
+        self._sug_lbl = ctk.CTkLabel(self, text="", text_color="#2d7d46", anchor="w", justify="left", wraplength=400)
+        self._btn_accept = ctk.CTkButton(
+            self, text=t("editor.accept"), width=70, fg_color="green", hover_color="darkgreen",
+            command=lambda: view._row_action("accept", self),
+        )
+        self._btn_reject = ctk.CTkButton(
+            self, text=t("editor.reject"), width=70, fg_color="gray", command=lambda: view._row_action("reject", self)
+        )
+        self._has_suggestion = None
+        self._speaker_shown = False
+        # Двойной щелчок: по тексту — правка текста, по таймкоду/спикеру — смена спикера
+        for lbl in (self._text_lbl, self._orig_lbl):
+            lbl.bind("<Double-Button-1>", lambda _e: view._row_action("edit_text", self), add="+")
+        for lbl in (self._time_lbl, self._speaker_lbl):
+            lbl.bind("<Double-Button-1>", lambda _e: view._row_action("edit_speaker", self), add="+")
+
+    def bind_segment(self, index: int, seg: dict) -> None:
+        """Показать сегмент index; виджеты не пересоздаются, только перенастраиваются."""
+        self.index = index
+        text = (seg.get("text") or "").strip()
+        suggested = (seg.get("suggested_text") or "").strip()
+        self._time_lbl.configure(text=f"[{seg.get('start', 0):.1f}s – {seg.get('end', 0):.1f}s]")
+        speaker = seg.get("speaker")
+        if speaker:
+            self._speaker_lbl.configure(text=speaker)
+            if not self._speaker_shown:
+                self._speaker_lbl.grid(row=0, column=2, padx=(0, 8), pady=4, sticky="w")
+                self._speaker_shown = True
+        elif self._speaker_shown:
+            self._speaker_lbl.grid_remove()
+            self._speaker_shown = False
+        has_suggestion = bool(suggested) and suggested != text
+        if has_suggestion:
+            self._orig_lbl.configure(text=text)
+            self._sug_lbl.configure(text=suggested)
+        else:
+            self._text_lbl.configure(text=text or "—")
+        if has_suggestion != self._has_suggestion:
+            self._has_suggestion = has_suggestion
+            if has_suggestion:
+                self._text_lbl.grid_remove()
+                self._orig_lbl.grid(row=1, column=0, columnspan=2, padx=(56, 8), pady=(0, 2), sticky="w")
+                self._sug_lbl.grid(row=2, column=0, columnspan=2, padx=(56, 8), pady=(0, 4), sticky="w")
+                self._btn_accept.grid(row=3, column=0, padx=(56, 4), pady=(0, 4), sticky="w")
+                self._btn_reject.grid(row=3, column=1, padx=(0, 8), pady=(0, 4), sticky="w")
+            else:
+                for w in (self._orig_lbl, self._sug_lbl, self._btn_accept, self._btn_reject):
+                    w.grid_remove()
+                self._text_lbl.grid(row=1, column=0, columnspan=2, padx=(56, 8), pady=(0, 4), sticky="w")
+
+
+class SegmentListView(ctk.CTkFrame):
+    """
+    Список сегментов с прокруткой по строкам.
+    on_play(index), on_accept(index), on_reject(index) — действия кнопок строки;
+    on_edit_text(index), on_edit_speaker(index) — двойной щелчок по тексту / таймкоду;
+    on_accept_all(), on_reject_all() — кнопки панели над списком (см. set_bulk_actions_visible).
+    set_segments(segments) — показать список (тот же объект списка — позиция прокрутки сохраняется);
+    refresh_rows(indices) — перерисовать только эти строки; refresh() — все видимые (после вставки/удаления).
+    """
+
+    def __init__(
+        self,
+        master,
+        on_play: Optional[Callable[[int], None]] = None,
+        on_accept: Optional[Callable[[int], None]] = None,
+        on_reject: Optional[Callable[[int], None]] = None,
+        on_edit_text: Optional[Callable[[int], None]] = None,
+        on_edit_speaker: Optional[Callable[[int], None]] = None,
+        on_accept_all: Optional[Callable[[], None]] = None,
+        on_reject_all: Optional[Callable[[], None]] = None,
+        **kwargs,
+    ):
+        kwargs.setdefault("fg_color", "transparent")
+        super().__init__(master, **kwargs)
+        self._callbacks = {
+            "play": on_play, "accept": on_accept, "reject": on_reject,
+            "edit_text": on_edit_text, "edit_speaker": on_edit_speaker,
+        }
+        self._segments: List[dict] = []
+        self._first = 0
+        self._rows: List[_SegmentRow] = []
+        self._visible_rows = 0
+        self._whole_rows = 0  # сколько из видимых строк помещаются целиком
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+        # Панель «Принять все / Отклонить все» — только пока есть непринятые предложения
+        self._bulk_bar = ctk.CTkFrame(self, fg_color="transparent")
+        ctk.CTkButton(
+            self._bulk_bar, text=t("editor.accept_all"), width=110, fg_color="green", hover_color="darkgreen",
+            command=lambda: on_accept_all and on_accept_all(),
+        ).pack(side="left", padx=(0, 6))
+        ctk.CTkButton(
+            self._bulk_bar, text=t("editor.reject_all"), width=110, fg_color="gray",
+            command=lambda: on_reject_all and on_reject_all(),
+        ).pack(side="left")
+        self._viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self._viewport.grid(row=1, column=0, sticky="nsew")
+        self._viewport.pack_propagate(False)
+        self._scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self._scrollbar.grid(row=1, column=1, sticky="ns")
+        self._viewport.bind("<Configure>", lambda _e: self._render())
+        self._bind_wheel(self._viewport)
+
+    # --- данные ---
+
+    def set_segments(self, segments: Optional[List[dict]]) -> None:
+        """Показать сегменты. Новый список — прокрутка в начало."""
+        segments = segments if segments is not None else []
+        if segments is not self._segments:
+            self._first = 0
+        self._segments = segments
+        self._render()
+
+    def refresh(self) -> None:
+        self._render()
+
+    def refresh_rows(self, indices: Iterable[int]) -> None:
+        """Обновить строки indices, которые сейчас видны (остальные строки не трогаются)."""
+        wanted = set(indices)
+        for row in self._rows[:self._visible_rows]:
+            if row.index in wanted and 0 <= row.index < len(self._segments):
+                row.bind_segment(row.index, self._segments[row.index])
+
+    def set_bulk_actions_visible(self, visible: bool) -> None:
+        if visible:
+            self._bulk_bar.grid(row=0, column=0, columnspan=2, sticky="w", pady=(0, 4))
+        else:
+            self._bulk_bar.grid_remove()
+
+    def scroll_to(self, index: int) -> None:
+        """Прокрутить так, чтобы строка index была первой видимой."""
+        self._first = max(0, min(int(index), len(self._segments) - 1))
+        self._render()
+
+    # --- отрисовка ---
+
+    def _render(self) -> None:
+        total = len(self._segments)
+        self._first = max(0, min(self._first, total - 1)) if total else 0
+        # Высота строк разная (предложение Ollama добавляет две строки и кнопки), поэтому строки
+        # выкладываются по одной и меряются, пока не заполнят область (последняя может быть обрезана)
+        height = max(self._viewport.winfo_height(), MIN_ROW_HEIGHT)
+        used = 0
+        shown = whole = 0
+        while self._first + shown < total and used < height:
+            if shown == len(self._rows):
+                row = _SegmentRow(self._viewport, self)
+                self._bind_wheel(row)
+                self._rows.append(row)
+            row = self._rows[shown]
+            row.bind_segment(self._first + shown, self._segments[self._first + shown])
+            if not row.winfo_manager():
+                row.pack(fill="x", padx=0, pady=ROW_PADY)
+            row.update_idletasks()
+            used += max(row.winfo_reqheight(), MIN_ROW_HEIGHT) + 2 * ROW_PADY
+            shown += 1
+            if used <= height:
+                whole = shown
+        for row in self._rows[shown:]:
+            if row.winfo_manager():
+                row.pack_forget()
+                row.index = -1
+        self._visible_rows = shown
+        self._whole_rows = whole
+        self._update_scrollbar()
+
+    def _fully_visible_rows(self) -> int:
+        """Сколько строк от первой помещаются в области целиком."""
+        self._viewport.update_idletasks()
+        height = self._viewport.winfo_height()
+        n = 0
+        for row in self._rows[:self._visible_rows]:
+            if row.winfo_y() + row.winfo_height() > height:
+                break
+            n += 1
+        return n
+
+    def _update_scrollbar(self) -> None:
+        total = len(self._segments)
+        if not total:
+            self._scrollbar.set(0.0, 1.0)
+            return
+        shown = max(1, min(self._whole_rows, total - self._first))
+        self._scrollbar.set(self._first / total, (self._first + shown) / total)
+
+    # --- прокрутка ---
+
+    def _scroll_by(self, rows: int) -> None:
+        if not rows or not self._segments:
+            return
+        if rows > 0 and self._first + self._fully_visible_rows() >= len(self._segments):
+            return  # последняя строка уже видна целиком
+        new_first = max(0, min(self._first + rows, len(self._segments) - 1))
+        if new_first != self._first:
+            self._first = new_first
+            self._render()
+
+    def _on_scrollbar(self, *args) -> None:
+        if not args:
+            return
+        if args[0] == "moveto":
+            target = int(float(args[1]) * len(self._segments))
+            self._scroll_by(target - self._first)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            page = max(1, self._fully_visible_rows())
+            self._scroll_by(step * (page if len(args) > 2 and args[2] == "pages" else 1))
+
+    def _on_wheel(self, event) -> str:
+        if getattr(event, "num", None) == 4:
+            rows = -WHEEL_ROWS
+        elif getattr(event, "num", None) == 5:
+            rows = WHEEL_ROWS
+        else:
+            rows = -WHEEL_ROWS if event.delta > 0 else WHEEL_ROWS
+        if rows > 0:
+            rows = min(rows, max(1, self._fully_visible_rows()))  # не перескакивать строки, не показанные целиком
+        self._scroll_by(rows)
+        return "break"
+
+    def _bind_wheel(self, widget) -> None:
+        """Колесо мыши над любой частью строки (включая внутренние виджеты CTk) прокручивает список."""
+        for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            tkinter.Misc.bind(widget, seq, self._on_wheel, add="+")
+        for child in widget.winfo_children():
+            self._bind_wheel(child)
+
+    def _row_action(self, action: str, row: _SegmentRow) -> None:
+        callback = self._callbacks.get(action)
+        if callback and 0 <= row.index < len(self._segments):
+            callback(row.index)
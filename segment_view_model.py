@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Модель представления редактора сегментов (без UI).
+Все изменения сегментов (Accept/Reject предложений Ollama, правка текста, смена спикера) идут через
+методы модели; подписчики получают RowChange только с индексами строк, чьё отображаемое состояние
+действительно изменилось, — редактор обновляет эти строки, а не весь список.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+
+ROWS_CHANGED = "changed"  # строки indices изменились на месте
+ROWS_RESET = "reset"  # список заменён целиком
+
+
+@dataclass(frozen=True)
+class RowChange:
+    kind: str
+    indices: Tuple[int, ...] = ()
+
+
+def _row_state(seg: dict) -> tuple:
+    """То, что видно в строке редактора: сравнение состояний до и после — основа событий."""
+    text = (seg.get("text") or "").strip()
+    suggested = (seg.get("suggested_text") or "").strip()
+    return (
+        seg.get("start", 0),
+        seg.get("end", 0),
+        text,
+        suggested if suggested and suggested != text else None,
+        seg.get("speaker") or None,
+    )
+
+
+def has_pending_suggestion(seg: dict) -> bool:
+    return _row_state(seg)[3] is not None
+
+
+class SegmentViewModel:
+    """
+    Сегменты редактора (список dict, обычно App.full_results — изменяется на месте).
+    subscribe(listener) — listener(RowChange) вызывается после каждого изменения.
+    """
+
+    def __init__(self, segments: Optional[List[dict]] = None):
+        self.segments: List[dict] = segments if segments is not None else []
+        self._listeners: List[Callable[[RowChange], None]] = []
+
+    def subscribe(self, listener: Callable[[RowChange], None]) -> Callable[[], None]:
+        """Подписаться на изменения; возвращает функцию отписки."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener) if listener in self._listeners else None
+
+    def _emit(self, change: RowChange) -> None:
+        for listener in list(self._listeners):
+            listener(change)
+
+    def reset(self, segments: Optional[List[dict]]) -> None:
+        """Показать другой список (смена файла, новая транскрипция)."""
+        self.segments = segments if segments is not None else []
+        self._emit(RowChange(ROWS_RESET))
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def pending_suggestions(self) -> List[int]:
+        """Индексы сегментов с непринятым предложением."""
+        return [i for i, seg in enumerate(self.segments) if has_pending_suggestion(seg)]
+
+    def has_pending_suggestions(self) -> bool:
+        return any(has_pending_suggestion(seg) for seg in self.segments)
+
+    def _apply(self, indices, mutate: Callable[[dict, int], None]) -> Tuple[int, ...]:
+        """Изменить сегменты indices за один проход; одно событие с реально изменившимися строками."""
+        changed = []
+        for i in indices:
+            if not 0 <= i < len(self.segments):
+                continue
+            seg = self.segments[i]
+            before = _row_state(seg)
+            mutate(seg, i)
+            if _row_state(seg) != before:
+                changed.append(i)
+        if changed:
+            self._emit(RowChange(ROWS_CHANGED, tuple(changed)))
+        return tuple(changed)
+
+    @staticmethod
+    def _accept_one(seg: dict, _index: int) -> None:
+        # Пустое или совпадающее с текстом предложение не заменяет text
+        if has_pending_suggestion(seg):
+            seg["text"] = seg["suggested_text"]
+        seg.pop("suggested_text", None)
+
+    @staticmethod
+    def _reject_one(seg: dict, _index: int) -> None:
+        seg.pop("suggested_text", None)
+
+    def set_suggestions(self, texts: Sequence[str]) -> Tuple[int, ...]:
+        """Предложения коррекции по порядку сегментов (лишние игнорируются); text не меняется до accept."""
+        def mutate(seg, i):
+            seg["suggested_text"] = texts[i] or ""
+        return self._apply(range(min(len(texts), len(self.segments))), mutate)
+
+    def set_suggestion(self, index: int, text: str) -> bool:
+        """Предложение для одного сегмента (результаты коррекции приходят по мере готовности)."""
+        def mutate(seg, _i):
+            seg["suggested_text"] = text or ""
+        return bool(self._apply((index,), mutate))
+
+    def accept(self, index: int) -> bool:
+        return bool(self._apply((index,), self._accept_one))
+
+    def reject(self, index: int) -> bool:
+        return bool(self._apply((index,), self._reject_one))
+
+    def accept_all(self) -> int:
+        """Принять все предложения за один проход; число изменённых строк."""
+        return len(self._apply(range(len(self.segments)), self._accept_one))
+
+    def reject_all(self) -> int:
+        """Отклонить все предложения за один проход; число изменённых строк."""
+        return len(self._apply(range(len(self.segments)), self._reject_one))
+
+    def set_text(self, index: int, text: str) -> bool:
+        """Правка текста сегмента; устаревшее предложение для него сбрасывается."""
+        def mutate(seg, _i):
+            seg["text"] = text
+            seg.pop("suggested_text", None)
+        return bool(self._apply((index,), mutate))
+
+    def set_speaker(self, index: int, speaker: Optional[str]) -> bool:
+        """Сменить спикера сегмента (пусто — убрать)."""
+        def mutate(seg, _i):
+            if speaker:
+                seg["speaker"] = speaker
+            else:
+                seg.pop("speaker", None)
+        return bool(self._apply((index,), mutate))
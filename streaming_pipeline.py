@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+Конвейер потоковой транскрибации: захват (16 kHz) -> ASR -> результаты, без опроса по таймеру.
+Поток захвата просыпается по событию «пришёл новый блок» (MicRecordService.wait_for_audio) и отдаёт
+в ASR фрагмент, как только набралось target_latency_s секунд. Между стадиями — ограниченная очередь:
+если ASR не успевает, новый фрагмент склеивается с последним ожидающим (overflow="merge") или
+выбрасывается самый старый (overflow="drop"); отставание ограничено max_backlog_s.
+С gate (VadGate) в ASR идёт только речь, а после долгой паузы фрагмент помечается концом фразы —
+онлайн-ASR сбрасывается (STREAM_FLUSH), время результатов остаётся от начала записи.
+Фрагменты разных фраз не склеиваются: при "merge" начало новой фразы встаёт в очередь сверх max_chunks
+(аудио не теряется, пока отставание не превысит max_backlog_s).
+Источник и ASR — обычные функции, поэтому конвейер не зависит от App и проверяется синтетическим звуком.
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional
+
+from asr_backends.base import STREAM_FLUSH
+from vad_gate import VadGate
+
+SAMPLE_RATE = 16000
+OVERFLOW_MERGE = "merge"
+OVERFLOW_DROP = "drop"
+DEFAULT_TARGET_LATENCY_S = 1.0
+DEFAULT_MAX_CHUNKS = 4
+DEFAULT_MAX_BACKLOG_S = 30.0
+
+
+@dataclass
+class AudioChunk:
+    """
+    Фрагмент для ASR: start — секунды от начала записи, captured_at — time.monotonic() последнего сэмпла;
+    ends_utterance — после фрагмента пауза (VAD), аудио может быть пустым.
+    """
+    start: float
+    audio: Any
+    captured_at: float
+    ends_utterance: bool = False
+
+    @property
+    def duration(self) -> float:
+        return len(self.audio) / SAMPLE_RATE
+
+
+class _ChunkQueue:
+    """Ограниченная очередь фрагментов с политикой переполнения (Condition вместо sleep)."""
+
+    def __init__(self, max_chunks: int, max_backlog_s: float, overflow: str):
+        self.max_chunks = max(1, int(max_chunks))
+        self.max_backlog_s = max(0.0, float(max_backlog_s))
+        self.overflow = overflow if overflow in (OVERFLOW_MERGE, OVERFLOW_DROP) else OVERFLOW_MERGE
+        self._items: Deque[AudioChunk] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.merged = 0
+        self.dropped_s = 0.0
+
+    def put(self, chunk: AudioChunk) -> None:
+        import numpy as np
+
+        with self._cond:
+            if len(self._items) >= self.max_chunks:
+                last = self._items[-1]
+                # Склеивать можно только непрерывное аудио одной фразы
+                if self.overflow == OVERFLOW_MERGE and not last.ends_utterance and abs(
+                    last.start + last.duration - chunk.start
+                ) < 0.5 / SAMPLE_RATE:
+                    last.audio = np.concatenate([last.audio, chunk.audio])
+                    last.captured_at = chunk.captured_at
+                    last.ends_utterance = chunk.ends_utterance
+                    self.merged += 1
+                elif self.overflow == OVERFLOW_MERGE:
+                    self._items.append(chunk)  # граница фразы — склеивать нельзя, ограничение по max_backlog_s
+                else:
+                    oldest = self._oldest_audio_index()
+                    if oldest is not None:
+                        self._drop_audio_at(oldest)
+                    self._items.append(chunk)
+            else:
+                self._items.append(chunk)
+            self._trim_backlog()
+            self._cond.notify()
+
+    def _trim_backlog(self) -> None:
+        """Отставание больше max_backlog_s — отбросить самое старое аудио (ASR всё равно не догонит)."""
+        if not self.max_backlog_s:
+            return
+        excess = sum(c.duration for c in self._items) - self.max_backlog_s
+        while excess > 0:
+            oldest = self._oldest_audio_index()
+            if oldest is None:
+                break
+            head = self._items[oldest]
+            if head.duration <= excess and oldest < len(self._items) - 1:
+                excess -= head.duration
+                self._drop_audio_at(oldest)
+                continue
+            cut = min(int(round(excess * SAMPLE_RATE)), len(head.audio))
+            head.audio = head.audio[cut:]
+            head.start += cut / SAMPLE_RATE
+            self.dropped_s += cut / SAMPLE_RATE
+            break
+
+    def _oldest_audio_index(self) -> Optional[int]:
+        for i, item in enumerate(self._items):
+            if len(item.audio):
+                return i
+        return None
+
+    def _drop_audio_at(self, index: int) -> None:
+        """
+        Выбросить аудио фрагмента. Метка конца фразы сохраняется пустым фрагментом, если начало фразы
+        могло уже уйти в ASR (фрагмент первый в очереди), — иначе онлайн-ASR не сбросится перед следующей.
+        Если перед фрагментом только пустые метки, его фраза целиком выброшена — метка не нужна.
+        """
+        item = self._items[index]
+        self.dropped_s += item.duration
+        if item.ends_utterance and index == 0:
+            item.audio = item.audio[:0]
+        else:
+            del self._items[index]
+
+    def get(self) -> Optional[AudioChunk]:
+        """Следующий фрагмент; None — очередь закрыта и пуста."""
+        with self._cond:
+            while not self._items and not self._closed:
+                self._cond.wait()
+            return self._items.popleft() if self._items else None
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def backlog_s(self) -> float:
+        with self._cond:
+            return sum(c.duration for c in self._items)
+
+
+class StreamingPipeline:
+    """
+    read_audio(final) -> float32 16 kHz mono с прошлого вызова или None (final=True — последний вызов, с хвостом);
+    wait_audio(timeout) -> bool — ждать нового аудио (событие от захвата);
+    asr(chunks) -> итератор результатов (dict start/end/text) — см. streaming_asr / chunk_asr;
+    on_result(result) вызывается в потоке ASR.
+    gate — VadGate: тишина не идёт в ASR, паузы закрывают фразы.
+    start() / stop(timeout) — stop дочитывает источник, дожидается ASR и возвращает False, если не успел.
+    """
+
+    def __init__(
+        self,
+        read_audio: Callable[[bool], Any],
+        wait_audio: Callable[[float], bool],
+        asr: Callable[[Iterable[AudioChunk]], Iterable[Dict[str, Any]]],
+        on_result: Callable[[Dict[str, Any]], None],
+        target_latency_s: float = DEFAULT_TARGET_LATENCY_S,
+        overflow: str = OVERFLOW_MERGE,
+        max_chunks: int = DEFAULT_MAX_CHUNKS,
+        max_backlog_s: float = DEFAULT_MAX_BACKLOG_S,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        gate: Optional[VadGate] = None,
+    ):
+        self._read_audio = read_audio
+        self._wait_audio = wait_audio
+        self._asr = asr
+        self._on_result = on_result
+        self._on_error = on_error
+        self.gate = gate
+        self.target_samples = max(1, int(float(target_latency_s) * SAMPLE_RATE))
+        self._queue = _ChunkQueue(max_chunks, max_backlog_s, overflow)
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._pending: List[Any] = []  # аудио, ещё не набравшее target_latency_s
+        self._pending_samples = 0
+        self._pending_start = 0  # позиция первого сэмпла _pending от начала записи
+        self._read_samples = 0  # сэмплов прочитано из источника
+        self._latencies: Deque[float] = deque(maxlen=200)
+        self.chunks = 0
+        self.results = 0
+        self.error: Optional[Exception] = None
+
+    # --- запуск / остановка ---
+
+    def start(self) -> None:
+        self._threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._asr_loop, daemon=True),
+        ]
+        for th in self._threads:
+            th.start()
+
+    def stop(self, timeout: float = 15.0) -> bool:
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        for th in self._threads:
+            th.join(max(0.0, deadline - time.monotonic()))
+        return not any(th.is_alive() for th in self._threads)
+
+    # --- стадии ---
+
+    def _capture_loop(self) -> None:
+        try:
+            while not self._stop.is_set():
+                self._wait_audio(0.5)
+                self._take(final=False)
+            self._take(final=True)
+            self._emit(force=True)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._queue.close()
+
+    def _take(self, final: bool) -> None:
+        audio = self._read_audio(final)
+        parts = []
+        if audio is not None and len(audio):
+            parts = self.gate.process(audio) if self.gate is not None else [(self._read_samples, audio)]
+            self._read_samples += len(audio)
+        if final and self.gate is not None:
+            parts += self.gate.finish()
+        for start, part in parts:
+            if part is None:
+                self._emit(force=True, ends_utterance=True)
+                continue
+            if self._pending_samples and start != self._pending_start + self._pending_samples:
+                self._emit(force=True)
+            if not self._pending_samples:
+                self._pending_start = start
+            self._pending.append(part)
+            self._pending_samples += len(part)
+            self._emit(force=False)
+
+    def _emit(self, force: bool, ends_utterance: bool = False) -> None:
+        import numpy as np
+
+        if not ends_utterance and (not self._pending_samples or (not force and self._pending_samples < self.target_samples)):
+            return
+        if self._pending:
+            audio = self._pending[0] if len(self._pending) == 1 else np.concatenate(self._pending)
+        else:
+            audio = np.zeros(0, dtype=np.float32)  # конец фразы сразу после отправленного фрагмента
+        start = self._pending_start if self._pending else self._read_samples
+        self._pending, self._pending_samples = [], 0
+        self._queue.put(AudioChunk(start / SAMPLE_RATE, audio, time.monotonic(), ends_utterance))
+        self.chunks += 1
+
+    def _chunks(self) -> Iterator[AudioChunk]:
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            self._latencies.append(time.monotonic() - chunk.captured_at)
+            yield chunk
+
+    def _asr_loop(self) -> None:
+        try:
+            for result in self._asr(self._chunks()):
+                self.results += 1
+                self._on_result(result)
+        except Exception as e:
+            self._fail(e)
+            self._queue.close()
+
+    def _fail(self, error: Exception) -> None:
+        if self.error is None:
+            self.error = error
+            if self._on_error is not None:
+                self._on_error(error)
+        self._stop.set()
+
+    # --- метрики ---
+
+    def stats(self) -> Dict[str, float]:
+        """
+        chunks, results, merged, dropped_s, backlog_s и ожидание фрагмента в очереди (queue_wait_avg/max_s);
+        с gate — ещё доли речи и тишины (см. VadGate.stats).
+        """
+        waits = list(self._latencies)
+        stats = {
+            "chunks": self.chunks,
+            "results": self.results,
+            "merged": self._queue.merged,
+            "dropped_s": round(self._queue.dropped_s, 3),
+            "backlog_s": round(self._queue.backlog_s(), 3),
+            "queue_wait_avg_s": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "queue_wait_max_s": round(max(waits), 3) if waits else 0.0,
+        }
+        if self.gate is not None:
+            stats.update(self.gate.stats())
+        return stats
+
+
+def streaming_asr(streaming_transcribe: Callable[[Iterator], Iterable]) -> Callable[[Iterable[AudioChunk]], Iterator[dict]]:
+    """
+    ASR для движков с онлайн-обработкой: streaming_transcribe(iter((audio, 16000) | STREAM_FLUSH)) -> (start, end, text).
+    После конца фразы отправляется STREAM_FLUSH; время в движке начинается заново — к нему добавляется начало фразы.
+    """
+    def run(chunks: Iterable[AudioChunk]) -> Iterator[dict]:
+        base = [None]  # начало текущей фразы (секунды от начала записи)
+
+        def items():
+            for chunk in chunks:
+                if len(chunk.audio):
+                    if base[0] is None:
+                        base[0] = chunk.start
+                    yield chunk.audio, SAMPLE_RATE
+                if chunk.ends_utterance and base[0] is not None:
+                    yield STREAM_FLUSH
+                    base[0] = None
+
+        # Результаты фразы приходят до того, как items() перейдёт к следующей, — base[0] ещё её
+        for start, end, text in streaming_transcribe(items()):
+            offset = base[0] or 0.0
+            yield {"start": start + offset, "end": end + offset, "text": text or ""}
+    return run
+
+
+def chunk_asr(transcribe: Callable[[Any], Optional[List[dict]]]) -> Callable[[Iterable[AudioChunk]], Iterator[dict]]:
+    """ASR по фрагментам: transcribe(audio) -> сегменты; время сдвигается на начало фрагмента."""
+    def run(chunks: Iterable[AudioChunk]) -> Iterator[dict]:
+        for chunk in chunks:
+            if not len(chunk.audio):
+                continue
+            for seg in transcribe(chunk.audio) or []:
+                yield {
+                    "start": seg.get("start", 0) + chunk.start,
+                    "end": seg.get("end", 0) + chunk.start,
+                    "text": seg.get("text", ""),
+                }
+    return run
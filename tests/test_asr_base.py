@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for asr_backends.base.prepare_audio_input (paths and in-memory audio).
+"""
+from pathlib import Path
+
+import pytest
+
+from asr_backends.base import prepare_audio_input
+
+
+def test_path_passthrough():
+    assert prepare_audio_input("a.wav") == "a.wav"
+    assert prepare_audio_input(Path("dir") / "a.wav") == str(Path("dir") / "a.wav")
+
+
+def test_buffer_is_wrapped_without_copy():
+    np = pytest.importorskip("numpy")
+    samples = np.array([0.0, 0.5, -0.5], dtype=np.float32)
+    audio = prepare_audio_input(memoryview(samples))
+    assert audio.dtype == np.float32
+    assert audio.tolist() == [0.0, 0.5, -0.5]
+    assert np.shares_memory(audio, samples)
+
+
+def test_array_converted_to_mono_float32():
+    np = pytest.importorskip("numpy")
+    same = np.zeros(4, dtype=np.float32)
+    assert prepare_audio_input(same) is same
+    stereo = np.array([[1.0, 0.0], [0.5, 0.5]], dtype=np.float64)
+    audio = prepare_audio_input(stereo)
+    assert audio.dtype == np.float32
+    assert audio.tolist() == [0.5, 0.5]
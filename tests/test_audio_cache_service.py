@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for AudioCacheService with a fake decoder (no ffmpeg/librosa needed).
+"""
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from AudioCacheService import AudioCacheService  # noqa: E402
+
+
+class CountingDecoder:
+    def __init__(self, seconds=1.0):
+        self.calls = []
+        self.seconds = seconds
+
+    def __call__(self, path, sample_rate, channels):
+        self.calls.append((path, sample_rate, channels))
+        n = int(self.seconds * sample_rate)
+        mono = np.linspace(-1.0, 1.0, n, dtype=np.float32)
+        return mono if channels == 1 else np.stack([mono] * channels, axis=1)
+
+
+@pytest.fixture
+def media(tmp_path):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(b"fake mp3")
+    return path
+
+
+def test_decodes_once_and_returns_memmap(tmp_path, media):
+    decoder = CountingDecoder()
+    cache = AudioCacheService(str(tmp_path / ".wicache"), decoder=decoder)
+    first = cache.get_asr_audio(str(media))
+    second = cache.get_asr_audio(str(media))
+    assert isinstance(second, np.memmap)
+    assert second.shape == (16000,) and second.dtype == np.float32
+    assert np.array_equal(first, second)
+    assert len(decoder.calls) == 1
+
+
+def test_playback_pcm_is_stereo(tmp_path, media):
+    cache = AudioCacheService(str(tmp_path / ".wicache"), decoder=CountingDecoder(0.5))
+    pcm = cache.get_playback_audio(str(media))
+    assert pcm.shape == (22050, 2)
+
+
+def test_no_decode_returns_only_ready_entries(tmp_path, media):
+    decoder = CountingDecoder(0.5)
+    cache = AudioCacheService(str(tmp_path / ".wicache"), decoder=decoder)
+    assert cache.get_playback_audio(str(media), decode=False) is None
+    assert decoder.calls == []
+    cache.get_playback_audio(str(media))
+    pcm = cache.get_playback_audio(str(media), decode=False)
+    assert pcm.shape == (22050, 2)
+    assert len(decoder.calls) == 1
+
+
+def test_changed_file_is_decoded_again(tmp_path, media):
+    decoder = CountingDecoder()
+    cache = AudioCacheService(str(tmp_path / ".wicache"), decoder=decoder)
+    cache.get_asr_audio(str(media))
+    media.write_bytes(b"different, longer content")
+    cache.get_asr_audio(str(media))
+    assert len(decoder.calls) == 2
+
+
+def test_eviction_keeps_total_under_limit(tmp_path):
+    # 1 s mono at 16 kHz = 64000 bytes; limit fits one entry
+    cache = AudioCacheService(str(tmp_path / ".wicache"), max_mb=0.1, decoder=CountingDecoder())
+    for name in ("a.wav", "b.wav"):
+        (tmp_path / name).write_bytes(name.encode())
+        assert cache.get_asr_audio(str(tmp_path / name)) is not None
+    assert cache.total_bytes() == 64000
+    assert len(os.listdir(tmp_path / ".wicache")) == 1
+
+
+def test_missing_file_and_decode_error_return_none(tmp_path, media):
+    def broken(path, sample_rate, channels):
+        raise RuntimeError("no codec")
+
+    cache = AudioCacheService(str(tmp_path / ".wicache"), decoder=broken)
+    assert cache.get_asr_audio(str(tmp_path / "missing.wav")) is None
+    assert cache.get_asr_audio(str(media)) is None
+
+
+def test_file_larger_than_cache_is_not_decoded(tmp_path, media):
+    decoder = CountingDecoder()
+    # 2 ч stereo 44.1 kHz ~ 1.3 GB при лимите 0.1 MB
+    cache = AudioCacheService(
+        str(tmp_path / ".wicache"), max_mb=0.1, decoder=decoder, duration_probe=lambda path: 7200.0
+    )
+    assert cache.get_playback_audio(str(media)) is None
+    assert cache.get_playback_audio(str(media)) is None
+    assert decoder.calls == [] and cache.total_bytes() == 0
+
+
+def test_oversized_pcm_without_duration_is_not_stored(tmp_path, media):
+    decoder = CountingDecoder(seconds=2.0)
+    cache = AudioCacheService(str(tmp_path / ".wicache"), max_mb=0.1, decoder=decoder, duration_probe=lambda path: None)
+    assert cache.get_asr_audio(str(media)) is None
+    assert cache.get_asr_audio(str(media)) is None
+    assert len(decoder.calls) == 1 and cache.total_bytes() == 0
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for AudioRingBuffer (microphone capture buffer, no audio device needed).
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from audio_ring_buffer import AudioRingBuffer  # noqa: E402
+
+
+def _blocks(total, size):
+    data = np.arange(total, dtype=np.float32)
+    return data, [data[i:i + size] for i in range(0, total, size)]
+
+
+def test_read_returns_views_and_advances():
+    buf = AudioRingBuffer(10)
+    buf.write(np.array([1, 2, 3], dtype=np.float32))
+    data, pos = buf.read(0)
+    assert pos == 3 and data.shape == (3, 1)
+    assert np.shares_memory(data, buf._ring)  # без копирования
+    assert buf.read(pos) == (None, 3)
+    buf.write(np.array([4, 5], dtype=np.float32), gain=2.0)
+    data, pos = buf.read(pos)
+    assert data.ravel().tolist() == [8.0, 10.0] and pos == 5
+
+
+def test_wraparound_tail_and_dropped_frames():
+    buf = AudioRingBuffer(8)
+    data, blocks = _blocks(20, 3)
+    for block in blocks:
+        buf.write(block)
+    assert buf.written == 20
+    assert buf.tail(5).ravel().tolist() == data[-5:].tolist()
+    assert buf.tail(100).ravel().tolist() == data[-8:].tolist()
+    chunk, pos = buf.read(0)  # отставший читатель догоняет с самого старого кадра
+    assert chunk.ravel().tolist() == data[-8:].tolist() and pos == 20
+    assert buf.dropped == 12
+
+
+def test_spill_keeps_whole_session(tmp_path):
+    path = tmp_path / "spill.f32"
+    buf = AudioRingBuffer(16, channels=2, spill_path=str(path), spill_block=4)
+    mono, blocks = _blocks(200, 5)
+    for block in blocks:
+        buf.write(np.stack([block, -block], axis=1))
+        buf._spill(buf._spill_block)  # как поток сброса, но детерминированно
+    saved = np.concatenate(list(buf.iter_blocks(block_frames=7)), axis=0)
+    assert saved.shape == (200, 2)
+    assert saved[:, 0].tolist() == mono.tolist() and saved[:, 1].tolist() == (-mono).tolist()
+    assert buf.dropped == 0
+    buf.close()
+    assert not path.exists()
+
+
+def test_without_spill_keeps_last_capacity():
+    buf = AudioRingBuffer(6)
+    data, blocks = _blocks(10, 4)
+    for block in blocks:
+        buf.write(block)
+    saved = np.concatenate(list(buf.iter_blocks()), axis=0)
+    assert saved.ravel().tolist() == data[-6:].tolist()
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for BatchTranscriptionQueue (fake TranscriptionService, no ASR dependencies).
+"""
+import os
+import threading
+import time
+
+import pytest
+
+import TranscriptionService as ts_module
+from asr_backends.base import ASRBackend
+from BatchTranscriptionService import (
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_PENDING,
+    BatchTranscriptionQueue,
+)
+from CheckpointService import TranscriptionCheckpoint
+
+
+class FakeService:
+    """Records load_model/transcribe calls; transcribe can be blocked to test cancel."""
+
+    def __init__(self, gate=None, fail_on=None, concurrent=True):
+        self.load_calls = []
+        self.concurrent = concurrent
+        self.transcribed = []
+        self.gate = gate
+        self.fail_on = fail_on
+        self.stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def load_model(self, **kwargs):
+        self.load_calls.append(kwargs)
+        return True
+
+    def transcribe(self, path, progress_callback=None, **kwargs):
+        if self.fail_on and path.endswith(self.fail_on):
+            raise RuntimeError("broken file")
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        if progress_callback:
+            progress_callback(5.0, 10.0, "half")
+        with self._lock:
+            self.transcribed.append(path)
+            self.transcribe_kwargs = kwargs
+        return [{"start": 0.0, "end": 1.0, "text": path}], None
+
+    def supports_concurrent_transcribe(self):
+        return self.concurrent
+
+    def stop(self):
+        self.stopped.set()
+
+
+class SharedStateBackend(ASRBackend):
+    """Backend with one shared decoder state, like whisper-streaming: not safe for parallel transcribe()."""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.load_kwargs = None
+
+    def load_model(self, **kwargs):
+        self.load_kwargs = kwargs
+        return True
+
+    def transcribe(self, file_path, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        time.sleep(0.05)
+        self.active -= 1
+        return [{"start": 0.0, "end": 1.0, "text": file_path}], None
+
+
+class ResumableBackend(ASRBackend):
+    """One segment per second of audio (a list of 16 kHz samples); can pause after the first segment until stop()."""
+
+    def __init__(self):
+        self.pause_after_first = threading.Event()
+        self.paused = threading.Event()
+        self.stopped = threading.Event()
+        self.audio_lengths = []
+
+    def load_model(self, **kwargs):
+        return True
+
+    def transcribe(self, file_path, segment_callback=None, **kwargs):
+        self.audio_lengths.append(len(file_path))
+        segments = []
+        for i in range(len(file_path) // 16000):
+            if i == 1 and self.pause_after_first.is_set():
+                self.paused.set()
+                self.stopped.wait(5)
+                break
+            seg = {"start": float(i), "end": float(i + 1), "text": f"s{i}"}
+            segments.append(seg)
+            if segment_callback:
+                segment_callback(seg)
+        return segments, None
+
+    def stop(self):
+        self.stopped.set()
+
+
+@pytest.fixture
+def project_dir(tmp_path):
+    for name in ("b.wav", "a.mp3", "c.mkv", "notes.txt"):
+        (tmp_path / name).write_bytes(b"x")
+    return tmp_path
+
+
+class TestFindUntranscribed:
+    def test_lists_media_without_transcripts(self, project_dir):
+        rels = BatchTranscriptionQueue.find_untranscribed(str(project_dir), {"b.wav": [{"text": "done"}]})
+        assert rels == ["a.mp3", "c.mkv"]
+
+    def test_empty_transcript_counts_as_untranscribed(self, project_dir):
+        rels = BatchTranscriptionQueue.find_untranscribed(str(project_dir), {"b.wav": []})
+        assert "b.wav" in rels
+
+    def test_missing_dir_returns_empty(self, tmp_path):
+        assert BatchTranscriptionQueue.find_untranscribed(str(tmp_path / "missing"), {}) == []
+
+
+class TestBatchTranscriptionQueue:
+    def test_runs_all_jobs_with_single_model_load(self, project_dir):
+        service = FakeService()
+        done = []
+        q = BatchTranscriptionQueue(
+            service, str(project_dir), workers=2,
+            load_kwargs={"model_size": "base"},
+            on_job_done=done.append,
+        )
+        q.add(["a.mp3", "b.wav", "c.mkv"])
+        assert q.start() is True
+        q.wait(timeout=5)
+        assert len(service.load_calls) == 1
+        assert service.load_calls[0]["num_workers"] == 2
+        assert sorted(j.rel_path for j in done) == ["a.mp3", "b.wav", "c.mkv"]
+        assert all(j.status == JOB_DONE and j.progress == 1.0 for j in q.jobs)
+        assert q.jobs[0].segments[0]["text"].endswith("a.mp3")
+
+    def test_add_skips_duplicates(self, project_dir):
+        q = BatchTranscriptionQueue(FakeService(), str(project_dir))
+        q.add(["a.mp3", "a.mp3"])
+        q.add(["a.mp3"])
+        assert len(q.jobs) == 1
+
+    def test_postprocess_and_progress_callbacks(self, project_dir):
+        progress = []
+        q = BatchTranscriptionQueue(
+            FakeService(), str(project_dir),
+            on_job_progress=lambda job: progress.append(job.progress),
+            postprocess=lambda segs: [dict(s, text=s["text"].upper()) for s in segs],
+        )
+        q.add(["a.mp3"])
+        q.start()
+        q.wait(timeout=5)
+        assert 0.5 in progress
+        assert q.jobs[0].segments[0]["text"].endswith("A.MP3")
+
+    def test_audio_loader_result_replaces_path(self, project_dir):
+        service = FakeService()
+        q = BatchTranscriptionQueue(
+            service, str(project_dir),
+            audio_loader=lambda path: "pcm:" + path if path.endswith("a.mp3") else None,
+        )
+        q.add(["a.mp3", "b.wav"])
+        q.start()
+        q.wait(timeout=5)
+        assert sorted(p.split(":")[0] if p.startswith("pcm:") else "path" for p in service.transcribed) == [
+            "path", "pcm",
+        ]
+
+    def test_late_kwargs_are_built_after_model_load(self, project_dir):
+        service = FakeService()
+
+        def late_kwargs():
+            assert service.load_calls, "prompt must be built with the loaded model's tokenizer"
+            return {"initial_prompt": "terms"}
+
+        q = BatchTranscriptionQueue(
+            service, str(project_dir), transcribe_kwargs={"beam_size": 2}, late_transcribe_kwargs=late_kwargs
+        )
+        q.add(["a.mp3"])
+        q.start()
+        q.wait(timeout=5)
+        assert service.transcribe_kwargs == {"beam_size": 2, "initial_prompt": "terms"}
+
+    def test_failed_job_is_reported_and_retried_on_resume(self, project_dir):
+        service = FakeService(fail_on="b.wav")
+        q = BatchTranscriptionQueue(service, str(project_dir))
+        q.add(["a.mp3", "b.wav"])
+        q.start()
+        q.wait(timeout=5)
+        statuses = {j.rel_path: j.status for j in q.jobs}
+        assert statuses == {"a.mp3": JOB_DONE, "b.wav": JOB_FAILED}
+        assert q.jobs[1].error == "broken file"
+        service.fail_on = None
+        assert q.resume() is True
+        q.wait(timeout=5)
+        assert all(j.status == JOB_DONE for j in q.jobs)
+
+    def test_cancel_returns_running_job_to_queue_and_resume_finishes(self, project_dir):
+        gate = threading.Event()
+        service = FakeService(gate=gate)
+        finished = []
+        q = BatchTranscriptionQueue(service, str(project_dir), on_finished=finished.append)
+        q.add(["a.mp3", "b.wav"])
+        q.start()
+        q.cancel()
+        gate.set()
+        q.wait(timeout=5)
+        assert finished == [True]
+        assert service.stopped.is_set()
+        assert all(j.status == JOB_PENDING for j in q.jobs)
+        assert q.has_pending()
+        q.resume()
+        q.wait(timeout=5)
+        assert all(j.status == JOB_DONE for j in q.jobs)
+        assert finished == [True, False]
+
+    def test_workers_forced_to_one_without_concurrent_support(self, project_dir):
+        service = FakeService(concurrent=False)
+        q = BatchTranscriptionQueue(service, str(project_dir), workers=4, load_kwargs={"model_size": "base"})
+        q.add(["a.mp3", "b.wav"])
+        q.start()
+        q.wait(timeout=5)
+        assert "num_workers" not in service.load_calls[0]
+        assert len(service.transcribed) == 2
+
+    def test_shared_state_backend_is_never_called_concurrently(self, project_dir, monkeypatch):
+        from TranscriptionService import TranscriptionService
+
+        monkeypatch.setattr(ts_module, "_load_config", lambda: {"transcription_engine": "whisper-streaming"})
+        monkeypatch.setattr(ts_module, "_get_backend_class", lambda engine: SharedStateBackend)
+        service = TranscriptionService(max_memory_mb=10_000)
+        done = []
+        q = BatchTranscriptionQueue(
+            service, str(project_dir), workers=4,
+            load_kwargs={"model_size": "base", "device": "cpu", "compute_type": "int8"},
+            on_job_done=done.append,
+        )
+        q.add(["a.mp3", "b.wav", "c.mkv"])
+        q.start()
+        q.wait(timeout=5)
+        backend = service._backend
+        assert len(done) == 3
+        assert backend.max_active == 1
+        assert "num_workers" not in backend.load_kwargs
+
+    def test_cancelled_job_resumes_from_checkpoint(self, project_dir, monkeypatch):
+        from TranscriptionService import TranscriptionService
+
+        monkeypatch.setattr(ts_module, "_load_config", lambda: {"transcription_engine": "faster-whisper"})
+        monkeypatch.setattr(ts_module, "_get_backend_class", lambda engine: ResumableBackend)
+        service = TranscriptionService(max_memory_mb=10_000)
+        service.load_model(model_size="base", device="cpu", compute_type="int8")
+        backend = service._backend
+        backend.pause_after_first.set()
+
+        def checkpoint_factory(path):
+            return TranscriptionCheckpoint.for_project(str(project_dir), path, {"model": "base"}, flush_interval_s=0)
+
+        q = BatchTranscriptionQueue(
+            service, str(project_dir),
+            load_kwargs={"model_size": "base", "device": "cpu", "compute_type": "int8"},
+            audio_loader=lambda path: [0.0] * 3 * 16000,
+            checkpoint_factory=checkpoint_factory,
+        )
+        q.add(["a.mp3"])
+        q.start()
+        assert backend.paused.wait(5)
+        q.cancel()
+        q.wait(timeout=5)
+        assert q.jobs[0].status == JOB_PENDING
+
+        backend.pause_after_first.clear()
+        assert q.resume() is True
+        q.wait(timeout=5)
+        job = q.jobs[0]
+        assert job.status == JOB_DONE
+        assert [s["text"] for s in job.segments] == ["s0", "s0", "s1"]
+        assert [s["start"] for s in job.segments] == [0.0, 1.0, 2.0]
+        assert backend.audio_lengths == [3 * 16000, 2 * 16000]
+        assert not os.path.exists(checkpoint_factory(job.abs_path).path)
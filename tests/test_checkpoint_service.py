@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for CheckpointService and TranscriptionService.transcribe_with_checkpoint (fake backend).
+"""
+import pytest
+
+from CheckpointService import TranscriptionCheckpoint
+from TranscriptionService import TranscriptionService
+
+
+@pytest.fixture
+def media(tmp_path):
+    path = tmp_path / "lecture.wav"
+    path.write_bytes(b"fake audio")
+    return path
+
+
+def make_checkpoint(tmp_path, media, **settings):
+    return TranscriptionCheckpoint.for_project(
+        str(tmp_path), str(media), settings or {"model": "base"}, flush_interval_s=0
+    )
+
+
+class TestTranscriptionCheckpoint:
+    def test_roundtrip(self, tmp_path, media):
+        cp = make_checkpoint(tmp_path, media)
+        cp.add({"start": 0.0, "end": 2.5, "text": "one"})
+        cp.add({"start": 2.5, "end": 4.0, "text": "two", "speaker": "A"})
+        segments, last = make_checkpoint(tmp_path, media).load()
+        assert last == 4.0
+        assert [s["text"] for s in segments] == ["one", "two"]
+        assert segments[1]["speaker"] == "A"
+
+    def test_other_settings_or_changed_media_are_ignored(self, tmp_path, media):
+        make_checkpoint(tmp_path, media).add({"start": 0.0, "end": 1.0, "text": "x"})
+        assert make_checkpoint(tmp_path, media, model="large-v3").load() == ([], 0.0)
+        media.write_bytes(b"re-recorded audio")
+        assert make_checkpoint(tmp_path, media).load() == ([], 0.0)
+
+    def test_clear_removes_file(self, tmp_path, media):
+        cp = make_checkpoint(tmp_path, media)
+        cp.add({"start": 0.0, "end": 1.0, "text": "x"})
+        cp.clear()
+        assert make_checkpoint(tmp_path, media).load() == ([], 0.0)
+
+
+class FakeBackend:
+    """Emits one segment per second of the given list-based 'audio' (1 sample = 1/16000 s)."""
+
+    def __init__(self, stop_after=None):
+        self.sources = []
+        self.stop_after = stop_after
+        self.service = None
+
+    def transcribe(self, source, progress_callback=None, segment_callback=None, **kwargs):
+        self.sources.append(source)
+        n_sec = len(source) // 16000
+        out = []
+        for i in range(n_sec):
+            seg = {"start": float(i), "end": float(i + 1), "text": f"s{i}"}
+            out.append(seg)
+            segment_callback(dict(seg))
+            progress_callback(seg["end"], float(n_sec), seg["text"])
+            if self.stop_after is not None and i + 1 == self.stop_after:
+                self.service.stop()
+                break
+
+        class Info:
+            duration = float(n_sec)
+        return out, Info()
+
+    def stop(self):
+        pass
+
+
+def make_service(backend):
+    service = TranscriptionService(max_memory_mb=0)
+    service._backend = backend
+    service._get_backend = lambda: backend
+    backend.service = service
+    return service
+
+
+def test_stopped_run_resumes_from_checkpoint(tmp_path, media):
+    audio = [0.0] * (16000 * 5)
+    first = FakeBackend(stop_after=3)
+    segments, _ = make_service(first).transcribe_with_checkpoint(
+        str(media), make_checkpoint(tmp_path, media), audio=audio
+    )
+    assert [s["end"] for s in segments] == [1.0, 2.0, 3.0]
+
+    second = FakeBackend()
+    progress = []
+    segments, info = make_service(second).transcribe_with_checkpoint(
+        str(media), make_checkpoint(tmp_path, media), audio=audio,
+        progress_callback=lambda cur, total, _t: progress.append((cur, total)),
+    )
+    assert len(second.sources[0]) == 16000 * 2  # only the unfinished tail is decoded
+    assert [s["text"] for s in segments] == ["s0", "s1", "s2", "s0", "s1"]
+    assert [s["start"] for s in segments] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert info.duration == 5.0
+    assert progress[-1] == (5.0, 5.0)
+    # Завершённый проход удаляет контрольную точку
+    assert make_checkpoint(tmp_path, media).load() == ([], 0.0)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for asr_backends.chunking: window planning at VAD silences and seam de-duplication.
+"""
+import pytest
+
+from asr_backends.chunking import overlapping_windows, plan_windows, stitch_segments
+
+SR = 16000
+
+
+def _ts(start_s, end_s):
+    return {"start": int(start_s * SR), "end": int(end_s * SR)}
+
+
+class TestPlanWindows:
+    def test_groups_regions_up_to_max_window(self):
+        speech = [_ts(0, 20), _ts(25, 50), _ts(55, 80), _ts(90, 100)]
+        windows = plan_windows(speech, SR, max_window_s=60)
+        assert windows == [(0, 50 * SR), (55 * SR, 100 * SR)]
+
+    def test_cuts_only_in_silence(self):
+        speech = [_ts(0, 30), _ts(31, 70)]
+        windows = plan_windows(speech, SR, max_window_s=60)
+        assert windows == [(0, 30 * SR), (31 * SR, 70 * SR)]
+
+    def test_long_region_is_split_with_overlap(self):
+        windows = plan_windows([_ts(0, 130)], SR, max_window_s=60, overlap_s=1)
+        assert windows[0] == (0, 60 * SR)
+        assert windows[1][0] == 59 * SR
+        assert windows[-1][1] == 130 * SR
+        assert all(e - s <= 60 * SR for s, e in windows)
+
+    def test_only_hard_split_windows_overlap(self):
+        windows = plan_windows([_ts(0, 20), _ts(30, 130)], SR, max_window_s=60, overlap_s=1)
+        assert windows[0] == (0, 20 * SR)
+        assert overlapping_windows(windows) == set(range(1, len(windows)))
+        assert overlapping_windows(plan_windows([_ts(0, 20), _ts(65, 80)], SR, max_window_s=60)) == set()
+
+    def test_empty_speech_gives_no_windows(self):
+        assert plan_windows([], SR) == []
+
+
+class TestStitchSegments:
+    def test_offsets_are_applied(self):
+        out = stitch_segments([
+            (60.0, [{"start": 1.0, "end": 2.0, "text": " second"}]),
+            (0.0, [{"start": 0.5, "end": 1.5, "text": " first"}]),
+        ])
+        assert [s["text"] for s in out] == [" first", " second"]
+        assert out[1]["start"] == pytest.approx(61.0)
+        assert set(out[0]) == {"start", "end", "text"}
+
+    def test_overlapping_words_are_deduplicated(self):
+        first = [{
+            "start": 57.0, "end": 60.0, "text": " one two three",
+            "words": [
+                {"start": 57.0, "end": 58.0, "word": " one"},
+                {"start": 58.0, "end": 59.0, "word": " two"},
+                {"start": 59.0, "end": 59.9, "word": " three"},
+            ],
+        }]
+        # Second window starts at 59 s and re-decodes "three" before new words
+        second = [{
+            "start": 0.0, "end": 2.5, "text": " three four five",
+            "words": [
+                {"start": 0.0, "end": 0.9, "word": " three"},
+                {"start": 1.0, "end": 1.6, "word": " four"},
+                {"start": 1.7, "end": 2.5, "word": " five"},
+            ],
+        }]
+        out = stitch_segments([(0.0, first), (59.0, second)])
+        assert "".join(s["text"] for s in out) == " one two three four five"
+        assert out[1]["start"] == pytest.approx(60.0)
+        assert "words" not in out[1]
+
+    def test_segments_without_words_dropped_when_already_covered(self):
+        out = stitch_segments([
+            (0.0, [{"start": 0.0, "end": 10.0, "text": "a"}]),
+            (9.0, [{"start": 0.0, "end": 0.8, "text": "dup"}, {"start": 1.5, "end": 3.0, "text": "b"}]),
+        ])
+        assert [s["text"] for s in out] == ["a", "b"]
+
+    def test_speaker_is_kept(self):
+        out = stitch_segments([(0.0, [{"start": 0, "end": 1, "text": "x", "speaker": "S1"}])])
+        assert out[0]["speaker"] == "S1"
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the headless CLI (whispertranscriber.cli) with a fake TranscriptionService.
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from SessionService import SessionService
+from whispertranscriber import cli
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+class FakeService:
+    def __init__(self):
+        self.load_calls = []
+
+    def load_model(self, **kwargs):
+        self.load_calls.append(kwargs)
+        return True
+
+    def transcribe(self, path, progress_callback=None, **kwargs):
+        self.transcribe_kwargs = kwargs
+        return [{"start": 0.0, "end": 1.5, "text": "whisper says hi"}], None
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def media(tmp_path):
+    (tmp_path / "in").mkdir()
+    (tmp_path / "in" / "sub").mkdir()
+    for name in ("in/a.wav", "in/b.mp3", "in/sub/c.wav"):
+        (tmp_path / name).write_bytes(b"x")
+    return tmp_path
+
+
+class TestExpandInputs:
+    def test_glob_and_plain_paths_deduplicated(self, media):
+        files = cli.expand_inputs([str(media / "in" / "*.wav"), str(media / "in" / "a.wav")])
+        assert [f.replace("\\", "/").split("/")[-1] for f in files] == ["a.wav"]
+
+    def test_recursive_glob(self, media):
+        files = cli.expand_inputs([str(media / "in" / "**" / "*.wav")])
+        names = sorted(f.replace("\\", "/").split("/")[-1] for f in files)
+        assert names == ["a.wav", "c.wav"]
+
+    def test_missing_files_are_dropped(self, media):
+        assert cli.expand_inputs([str(media / "nope.wav")]) == []
+
+
+class TestRunTranscribe:
+    def test_writes_txt_and_project(self, media, capsys):
+        out_dir = media / "out"
+        project = media / "in" / "session.wiproject"
+        args = cli.build_parser().parse_args([
+            "transcribe", str(media / "in" / "*.wav"), str(media / "in" / "b.mp3"),
+            "-o", str(out_dir), "--device", "cpu", "--model", "tiny", "--project", str(project),
+        ])
+        service = FakeService()
+        assert cli.run_transcribe(args, service=service) == 0
+        assert service.load_calls == [
+            {"model_size": "tiny", "device": "cpu", "compute_type": "float16", "engine_override": "faster-whisper"}
+        ]
+        assert (out_dir / "a.txt").read_text(encoding="utf-8").startswith("[0.0s - 1.5s]")
+        assert (out_dir / "b.txt").exists()
+        loaded = SessionService.load_session(str(project))
+        assert sorted(loaded.file_transcripts) == ["a.wav", "b.mp3"]
+        assert loaded.model_used == "tiny"
+
+    def test_engine_override_passed_to_load(self, media):
+        args = cli.build_parser().parse_args(["transcribe", str(media / "in" / "a.wav"), "--engine", "whisperx", "-q"])
+        service = FakeService()
+        assert cli.run_transcribe(args, service=service) == 0
+        assert service.load_calls[0]["engine_override"] == "whisperx"
+        assert (media / "in" / "a.txt").exists()
+
+    def test_batch_size_passed_to_transcribe(self, media):
+        args = cli.build_parser().parse_args(["transcribe", str(media / "in" / "a.wav"), "--batch-size", "8", "-q"])
+        service = FakeService()
+        assert cli.run_transcribe(args, service=service) == 0
+        assert service.transcribe_kwargs["batch_size"] == 8
+
+    def test_no_matches_returns_error(self, media):
+        args = cli.build_parser().parse_args(["transcribe", str(media / "*.ogg")])
+        assert cli.run_transcribe(args, service=FakeService()) == 1
+
+
+def test_cli_imports_no_gui_modules():
+    code = (
+        "import sys; import whispertranscriber.cli; "
+        "bad = [m for m in ('customtkinter', 'tkinter', 'pygame') if m in sys.modules]; "
+        "print(','.join(bad))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=str(PROJECT_ROOT), capture_output=True, text=True)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip() == ""
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for CorrectionCacheService (SQLite cache of Ollama corrections).
+"""
+import pytest
+
+from CorrectionCacheService import CorrectionCacheService
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = CorrectionCacheService(str(tmp_path / "cache" / "corrections.sqlite3"))
+    yield c
+    c.close()
+
+
+class TestCorrectionCacheService:
+    """Lookup, persistence, counters and eviction."""
+
+    def test_miss_then_hit(self, cache):
+        assert cache.get("m", "sys", "helo") is None
+        cache.put("m", "sys", "helo", "hello")
+        assert cache.get("m", "sys", " helo ") == "hello"
+        assert cache.stats() == {"hits": 1, "misses": 1}
+        cache.reset_stats()
+        assert cache.stats() == {"hits": 0, "misses": 0}
+
+    def test_key_includes_model_and_system_prompt(self, cache):
+        cache.put("m", "sys", "text", "Text")
+        assert cache.get("other", "sys", "text") is None
+        assert cache.get("m", "sys + glossary", "text") is None
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "c.sqlite3")
+        first = CorrectionCacheService(path)
+        first.put("m", "s", "a", "A")
+        first.close()
+        second = CorrectionCacheService(path)
+        assert second.get("m", "s", "a") == "A"
+        second.close()
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        c = CorrectionCacheService(str(tmp_path / "c.sqlite3"), max_mb=500 / (1024 * 1024))
+        c.put("m", "s", "old", "x" * 100)
+        c.put("m", "s", "used", "y" * 100)
+        c.put("m", "s", "new", "z" * 100)
+        c.get("m", "s", "used")
+        c.put("m", "s", "newest", "w" * 100)
+        assert c.total_bytes() <= 500
+        assert c.get("m", "s", "old") is None
+        assert c.get("m", "s", "used") == "y" * 100
+        assert c.get("m", "s", "newest") == "w" * 100
+        c.close()
+
+    def test_running_total_matches_table(self, tmp_path):
+        path = str(tmp_path / "c.sqlite3")
+        c = CorrectionCacheService(path, max_mb=500 / (1024 * 1024))
+        for i in range(6):
+            c.put("m", "s", f"text {i}", "x" * (40 + i))
+        c.put("m", "s", "text 5", "replaced")  # замена записи не удваивает размер
+        total = c.total_bytes()
+        assert total == CorrectionCacheService._sum_size(c._conn) <= 500
+        c.close()
+        reopened = CorrectionCacheService(path)
+        assert reopened.total_bytes() == total
+        reopened.clear()
+        assert reopened.total_bytes() == 0
+        reopened.close()
@@ -12,6 +12,8 @@ from DictionaryService import (
     DictionaryData,
     DictionaryEntry,
     DictionaryService,
+    TermIndex,
+    estimate_tokens,
 )
 
 
@@ -33,6 +35,12 @@ class TestDictionaryEntry:
         entry = DictionaryEntry.from_dict({"original": "x", "corrected": "x"}, TYPE_TERMS)
         assert entry.term == "x"
 
+    def test_created_at_roundtrip(self):
+        entry = DictionaryEntry.from_dict({"term": "X", "created_at": "2024-05-01T10:00:00"}, TYPE_TERMS)
+        assert entry.created_at == "2024-05-01T10:00:00"
+        assert entry.to_dict(TYPE_TERMS) == {"term": "X", "created_at": "2024-05-01T10:00:00"}
+        assert "created_at" not in DictionaryEntry(term="Y").to_dict(TYPE_TERMS)
+
     def test_to_dict_correction(self):
         entry = DictionaryEntry(original="a", corrected="b")
         d = entry.to_dict(TYPE_CORRECTION)
@@ -120,6 +128,80 @@ class TestDictionaryServiceLoadSave:
         assert loaded.entries[0].original == "a"
 
 
+class TestDictionaryRegistry:
+    """Tests for the parsed-dictionary registry and the folder index."""
+
+    @pytest.fixture
+    def dict_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(DictionaryService, "get_dictionaries_dir", staticmethod(lambda: str(tmp_path)))
+        DictionaryService.invalidate()
+        yield tmp_path
+        DictionaryService.invalidate()
+
+    @pytest.fixture
+    def parse_count(self, monkeypatch):
+        calls = []
+        original = DictionaryData.from_dict
+
+        def counting(data):
+            calls.append(data.get("name"))
+            return original(data)
+
+        monkeypatch.setattr(DictionaryData, "from_dict", staticmethod(counting))
+        return calls
+
+    def _write(self, path, name, entries=()):
+        path.write_text(json.dumps({"type": "correction", "name": name, "entries": list(entries)}), encoding="utf-8")
+
+    def test_load_reuses_parsed_data_until_file_changes(self, dict_dir, parse_count):
+        path = dict_dir / "a.json"
+        self._write(path, "A")
+        first = DictionaryService.load_by_id("a.json")
+        assert DictionaryService.load_by_id("a.json") is first
+        self._write(path, "A changed", [{"original": "x", "corrected": "y"}])
+        assert DictionaryService.load_by_id("a.json").name == "A changed"
+        assert parse_count == ["A", "A changed"]
+
+    def test_list_uses_index_and_parses_only_changed_files(self, dict_dir, parse_count):
+        self._write(dict_dir / "a.json", "A")
+        self._write(dict_dir / "b.widict", "B")
+        assert [d["name"] for d in DictionaryService.list_dictionaries()] == ["A", "B"]
+        assert (dict_dir / ".index.json").exists()
+        DictionaryService.invalidate()  # как новый процесс: только индекс на диске
+        parse_count.clear()
+        self._write(dict_dir / "b.widict", "B2", [{"original": "x", "corrected": "y"}])
+        (dict_dir / "c.json").write_text("broken", encoding="utf-8")
+        listed = DictionaryService.list_dictionaries()
+        assert [d["name"] for d in listed] == ["A", "B2", "c.json"]
+        assert parse_count == ["B2"]
+        (dict_dir / "a.json").unlink()
+        assert [d["id"] for d in DictionaryService.list_dictionaries()] == ["b.widict", "c.json"]
+        assert "a.json" not in json.loads((dict_dir / ".index.json").read_text(encoding="utf-8"))["files"]
+
+    def test_save_refreshes_registry(self, dict_dir, parse_count):
+        path = dict_dir / "a.json"
+        self._write(path, "A")
+        data = DictionaryService.load_by_id("a.json")
+        data.entries.append(DictionaryEntry(original="p", corrected="q"))
+        assert DictionaryService.save(str(path), data) is True
+        assert DictionaryService.load_by_id("a.json").entries == data.entries
+        assert parse_count == ["A"]
+
+    def test_editable_copy_does_not_leak_unsaved_edits(self, dict_dir, parse_count):
+        self._write(dict_dir / "a.json", "A")
+        shared = DictionaryService.load_by_id("a.json")
+        data = DictionaryService.load_by_id("a.json", editable=True)
+        assert data is not shared and data.name == "A"
+        data.name = "renamed, not saved"
+        data.entries.append(DictionaryEntry(original="p", corrected="q"))
+        reloaded = DictionaryService.load_by_id("a.json")
+        assert reloaded.name == "A" and reloaded.entries == []
+        assert DictionaryService.save(str(dict_dir / "a.json"), data) is True
+        data.entries.clear()  # правки после сохранения тоже не попадают в реестр
+        assert len(DictionaryService.load_by_id("a.json").entries) == 1
+        assert parse_count == ["A"]
+
+
 class TestDictionaryServiceBuildInitialPrompt:
     """Tests for build_initial_prompt_text."""
 
@@ -164,6 +246,84 @@ class TestDictionaryServiceBuildInitialPrompt:
         assert "X" in text
         assert "a -> A" in text
 
+    def test_token_budget_is_respected(self):
+        d = DictionaryData(
+            type=TYPE_TERMS, name="T", entries=[DictionaryEntry(term=f"Term{i:03d}") for i in range(200)]
+        )
+        full = DictionaryService.build_initial_prompt_text([d])
+        text = DictionaryService.build_initial_prompt_text([d], token_budget=50)
+        assert estimate_tokens(full) > 50
+        assert 0 < estimate_tokens(text) <= 50
+        assert text.startswith("Use these terms as written: Term")
+
+    def test_budget_ranks_by_frequency_then_recency(self):
+        d = DictionaryData(
+            type=TYPE_TERMS,
+            name="T",
+            entries=[
+                DictionaryEntry(term="Alpha", created_at="2024-01-01"),
+                DictionaryEntry(term="Beta", created_at="2024-06-01"),
+                DictionaryEntry(term="Gamma", created_at="2023-01-01"),
+            ],
+        )
+        count_words = lambda text: len(text.replace(",", " ").split())  # noqa: E731
+        header = count_words("Use these terms as written:")
+        freqs = DictionaryService.count_term_frequencies([d], ["gamma and GAMMA", "alpha"])
+        assert freqs == {"gamma": 2, "alpha": 1}
+        text = DictionaryService.build_initial_prompt_text(
+            [d], token_budget=header + 3, count_tokens=count_words, term_frequencies=freqs
+        )
+        assert text == "Use these terms as written: Gamma, Alpha"
+        text = DictionaryService.build_initial_prompt_text([d], token_budget=header + 2, count_tokens=count_words)
+        assert text == "Use these terms as written: Beta"
+
+    def test_budgeted_prompt_is_cached(self):
+        calls = []
+
+        def counter(text):
+            calls.append(text)
+            return len(text)
+
+        d = DictionaryData(type=TYPE_CORRECTION, name="C", entries=[DictionaryEntry(original="a", corrected="A")])
+        first = DictionaryService.build_initial_prompt_text([d], token_budget=1000, count_tokens=counter)
+        n = len(calls)
+        assert DictionaryService.build_initial_prompt_text([d], token_budget=1000, count_tokens=counter) == first
+        assert len(calls) == n
+
+
+class TestTermIndex:
+    """Tests for TermIndex and the dynamic prompt provider."""
+
+    def test_lookup_finds_exact_and_misrecognized_words(self):
+        index = TermIndex(["Kubernetes", "PostgreSQL", "Grafana Loki", "Terraform"])
+        assert index.lookup("we deployed it on kubernetes") == ["Kubernetes"]
+        assert index.lookup("the postgre sql database and grafana") == ["Grafana Loki", "PostgreSQL"]
+        assert index.lookup("nothing relevant here") == []
+
+    def test_lookup_ranks_by_matched_words_and_limits(self):
+        index = TermIndex(["Grafana", "Grafana Loki", "Loki"])
+        assert index.lookup("grafana loki")[0] == "Grafana Loki"
+        assert len(index.lookup("grafana loki", limit=2)) == 2
+
+    def test_duplicates_and_empty_terms_skipped(self):
+        assert TermIndex(["API", "api", " ", ""]).terms == ["API"]
+
+    def test_dynamic_prompt_provider(self):
+        d = DictionaryData(
+            type=TYPE_TERMS,
+            name="T",
+            entries=[DictionaryEntry(term=f"Service{i:04d}") for i in range(2000)] + [DictionaryEntry(term="Kafka")],
+        )
+        provider = DictionaryService.build_dynamic_prompt_provider([d], token_budget=20)
+        assert provider("") == ""
+        assert provider("messages go through kafka topics") == "Use these terms as written: Kafka"
+        assert estimate_tokens(provider("service0001 service0002 service0003 service0004 service0005")) <= 20
+        assert DictionaryService.get_term_index([d]) is DictionaryService.get_term_index([d])
+
+    def test_dynamic_prompt_provider_none_without_terms(self):
+        d = DictionaryData(type=TYPE_CORRECTION, name="C", entries=[DictionaryEntry(original="a", corrected="A")])
+        assert DictionaryService.build_dynamic_prompt_provider([d]) is None
+
 
 class TestDictionaryServiceApplyCorrections:
     """Tests for apply_corrections_to_segments and get_correction_entries_from_dictionaries."""
@@ -188,6 +348,50 @@ class TestDictionaryServiceApplyCorrections:
         )
         assert segments[0]["text"] == "Hello"
 
+    def test_longest_match_wins_and_no_cascading(self):
+        segments = [{"text": "new york and york"}]
+        DictionaryService.apply_corrections_to_segments(
+            segments,
+            [
+                {"original": "york", "corrected": "York"},
+                {"original": "new york", "corrected": "New York"},
+                {"original": "York", "corrected": "should not cascade"},
+            ],
+        )
+        assert segments[0]["text"] == "New York and York"
+
+    def test_word_boundary_and_ignore_case(self):
+        entries = [{"original": "gpu", "corrected": "GPU"}]
+        segments = [{"text": "Gpu and gpus on the GPU"}]
+        DictionaryService.apply_corrections_to_segments(segments, entries, word_boundary=True, ignore_case=True)
+        assert segments[0]["text"] == "GPU and gpus on the GPU"
+        segments = [{"text": "Gpu and gpus"}]
+        DictionaryService.apply_corrections_to_segments(segments, entries)
+        assert segments[0]["text"] == "Gpu and GPUs"
+
+    def test_word_boundary_falls_back_to_shorter_entry(self):
+        segments = [{"text": "ab abc abcd"}]
+        DictionaryService.apply_corrections_to_segments(
+            segments,
+            [{"original": "ab", "corrected": "X"}, {"original": "abcd", "corrected": "Y"}],
+            word_boundary=True,
+        )
+        assert segments[0]["text"] == "X abc Y"
+
+    def test_corrector_is_cached_per_entry_set(self):
+        entries = [{"original": "a", "corrected": "b"}]
+        first = DictionaryService.get_corrector(entries)
+        assert DictionaryService.get_corrector([dict(e) for e in entries]) is first
+        assert DictionaryService.get_corrector(entries, ignore_case=True) is not first
+        assert DictionaryService.get_corrector([{"original": "a", "corrected": "c"}]) is not first
+
+    def test_many_entries_with_regex_characters(self):
+        entries = [{"original": f"term{i}", "corrected": f"T{i}"} for i in range(3000)]
+        entries.append({"original": "c++ (lang)", "corrected": "C++"})
+        segments = [{"text": "term12 term2999 and c++ (lang)"}]
+        DictionaryService.apply_corrections_to_segments(segments, entries, word_boundary=True)
+        assert segments[0]["text"] == "T12 T2999 and C++"
+
     def test_get_correction_entries_from_dictionaries_ignores_terms(self):
         terms_dict = DictionaryData(
             type=TYPE_TERMS,
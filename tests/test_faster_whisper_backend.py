@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for FasterWhisperBackend decoding paths with a fake WhisperModel
+(faster_whisper itself is replaced by stub modules in sys.modules).
+"""
+import sys
+import threading
+import types
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from asr_backends.faster_whisper_backend import FasterWhisperBackend  # noqa: E402
+from DictionaryService import DictionaryData, DictionaryEntry, DictionaryService, TYPE_TERMS  # noqa: E402
+
+SR = 16000
+
+
+def _audio(seconds):
+    """Every sample holds its own second, so a window's first sample tells where it starts."""
+    return np.repeat(np.arange(seconds, dtype=np.float32), SR)
+
+
+def _ts(start_s, end_s):
+    return {"start": int(start_s * SR), "end": int(end_s * SR)}
+
+
+class FakeWhisperModel:
+    """
+    Records transcribe() calls; each call yields one segment at 0..1 s of the window
+    with text texts[window start second] (default "t<start second>").
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.texts = {}
+        self.hook = None  # hook(window_start_s, opts) runs inside transcribe (sync points for threads)
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio, **opts):
+        first = int(audio[0])
+        with self._lock:
+            self.calls.append((first, len(audio) / SR, dict(opts)))
+        if self.hook is not None:
+            self.hook(first, opts)
+        segments = [SimpleNamespace(start=0.0, end=1.0, text=self.texts.get(first, f"t{first}"), words=None)]
+        return iter(segments), SimpleNamespace(language="en", duration=len(audio) / SR)
+
+    def prompts(self):
+        """initial_prompt of every call by window start second (None — no prompt)."""
+        return {start: opts.get("initial_prompt") for start, _, opts in self.calls}
+
+    def window_starts(self):
+        return sorted(c[0] for c in self.calls)
+
+
+class FakeBatchedPipeline:
+    """Stands in for faster_whisper.BatchedInferencePipeline; records calls and instances."""
+
+    instances = []
+
+    def __init__(self, model):
+        self.model = model
+        self.calls = []
+        FakeBatchedPipeline.instances.append(self)
+
+    def transcribe(self, audio, **opts):
+        self.calls.append(dict(opts))
+        segments = [SimpleNamespace(start=0.0, end=1.0, text="batched", words=None)]
+        return iter(segments), SimpleNamespace(language="en", duration=len(audio) / SR)
+
+
+@pytest.fixture
+def fw(monkeypatch):
+    """Stub faster_whisper package; state.speech is what get_speech_timestamps returns."""
+    state = SimpleNamespace(speech=[], vad_calls=0)
+
+    def get_speech_timestamps(audio, options=None):
+        state.vad_calls += 1
+        return list(state.speech)
+
+    package = types.ModuleType("faster_whisper")
+    audio_mod = types.ModuleType("faster_whisper.audio")
+    audio_mod.decode_audio = lambda path, sampling_rate=SR: _audio(120)
+    vad_mod = types.ModuleType("faster_whisper.vad")
+    vad_mod.VadOptions = lambda **kwargs: kwargs
+    vad_mod.get_speech_timestamps = get_speech_timestamps
+    package.audio = audio_mod
+    package.vad = vad_mod
+    package.BatchedInferencePipeline = FakeBatchedPipeline
+    FakeBatchedPipeline.instances = []
+    monkeypatch.setitem(sys.modules, "faster_whisper", package)
+    monkeypatch.setitem(sys.modules, "faster_whisper.audio", audio_mod)
+    monkeypatch.setitem(sys.modules, "faster_whisper.vad", vad_mod)
+    state.package = package
+    return state
+
+
+@pytest.fixture
+def backend():
+    b = FasterWhisperBackend()
+    b.model = FakeWhisperModel()
+    return b
+
+
+class TestChunkedTranscription:
+    def test_windows_run_in_parallel_and_keep_absolute_offsets(self, fw, backend):
+        fw.speech = [_ts(0, 35), _ts(40, 75), _ts(80, 115)]
+        barrier = threading.Barrier(2, timeout=5)
+
+        def hook(start_s, opts):
+            if start_s > 0:
+                barrier.wait()  # windows 2 and 3 must be decoding at the same time
+
+        backend.model.hook = hook
+        segments, info = backend.transcribe(_audio(120), chunked=True, chunk_workers=2, chunk_length_s=40)
+        assert [s["text"] for s in segments] == ["t0", "t40", "t80"]
+        assert [(s["start"], s["end"]) for s in segments] == [(0.0, 1.0), (40.0, 41.0), (80.0, 81.0)]
+        assert info.duration == 120
+        assert info.language == "en"
+        # Язык первого окна передаётся остальным; VAD внутри окон не повторяется
+        later = [opts for start, _, opts in backend.model.calls if start > 0]
+        assert all(o["language"] == "en" and o["vad_filter"] is False for o in later)
+
+    def test_stop_cancels_pending_windows(self, fw, backend):
+        fw.speech = [_ts(i * 20, i * 20 + 15) for i in range(6)]
+
+        def hook(start_s, opts):
+            if start_s == 20:
+                backend.stop()
+
+        backend.model.hook = hook
+        segments, _ = backend.transcribe(_audio(120), chunked=True, chunk_workers=1, chunk_length_s=15)
+        assert backend.model.window_starts() == [0, 20]
+        assert [s["text"] for s in segments] == ["t0"]
+        assert not backend.is_running
+
+    def test_segment_callback_follows_timeline_when_windows_finish_out_of_order(self, fw, backend):
+        fw.speech = [_ts(0, 35), _ts(40, 75), _ts(80, 115)]
+        third_done = threading.Event()
+
+        def hook(start_s, opts):
+            if start_s == 40:
+                assert third_done.wait(5)
+            elif start_s == 80:
+                third_done.set()
+
+        backend.model.hook = hook
+        emitted = []
+        backend.transcribe(
+            _audio(120), chunked=True, chunk_workers=2, chunk_length_s=40, segment_callback=emitted.append,
+        )
+        assert [s["text"] for s in emitted] == ["t0", "t40", "t80"]
+        assert [s["start"] for s in emitted] == [0.0, 40.0, 80.0]
+
+    def test_short_audio_falls_back_to_single_pass(self, fw, backend):
+        emitted = []
+        segments, _ = backend.transcribe(
+            _audio(30), chunked=True, chunk_workers=4, segment_callback=emitted.append,
+        )
+        assert fw.vad_calls == 0
+        assert len(backend.model.calls) == 1
+        _, seconds, opts = backend.model.calls[0]
+        assert seconds == 30
+        assert opts["vad_filter"] is True
+        assert [s["text"] for s in segments] == ["t0"]
+        assert emitted == segments
+
+
+class TestBatchedTranscription:
+    def test_batch_size_uses_batched_pipeline(self, fw, backend):
+        segments, _ = backend.transcribe(_audio(120), batch_size=8, vad_filter=False, chunked=True)
+        assert backend.model.calls == []
+        assert len(FakeBatchedPipeline.instances) == 1
+        assert FakeBatchedPipeline.instances[0].model is backend.model
+        opts = FakeBatchedPipeline.instances[0].calls[0]
+        assert opts["batch_size"] == 8
+        assert opts["vad_filter"] is True
+        assert [s["text"] for s in segments] == ["batched"]
+
+    def test_pipeline_is_created_once_per_model(self, fw, backend):
+        backend.transcribe(_audio(10), batch_size=8)
+        backend.transcribe(_audio(10), batch_size=4)
+        assert len(FakeBatchedPipeline.instances) == 1
+        assert [c["batch_size"] for c in FakeBatchedPipeline.instances[0].calls] == [8, 4]
+
+    @pytest.mark.parametrize("kwargs", [{}, {"batch_size": 0}, {"batch_size": 1}])
+    def test_without_batch_size_uses_model_transcribe(self, fw, backend, kwargs):
+        segments, _ = backend.transcribe(_audio(10), **kwargs)
+        assert FakeBatchedPipeline.instances == []
+        assert len(backend.model.calls) == 1
+        assert "batch_size" not in backend.model.calls[0][2]
+        assert [s["text"] for s in segments] == ["t0"]
+
+    def test_missing_pipeline_falls_back_to_model(self, fw, backend, monkeypatch):
+        monkeypatch.delattr(fw.package, "BatchedInferencePipeline")
+        segments, _ = backend.transcribe(_audio(10), batch_size=8)
+        assert len(backend.model.calls) == 1
+        assert [s["text"] for s in segments] == ["t0"]
+
+
+class TestDynamicPrompt:
+    SPEECH = [_ts(0, 25), _ts(30, 55), _ts(60, 85), _ts(90, 115)]
+
+    def test_each_window_gets_prompt_from_text_so_far(self, fw, backend):
+        fw.speech = self.SPEECH
+        seen = []
+
+        def provider(previous_text):
+            seen.append(previous_text)
+            return "P:" + previous_text
+
+        segments, _ = backend.transcribe(_audio(120), initial_prompt="init", dynamic_prompt=provider)
+        assert backend.model.prompts() == {0: "init", 30: "P:t0", 60: "P:t0 t30", 90: "P:t0 t30 t60"}
+        assert seen == ["t0", "t0 t30", "t0 t30 t60"]
+        assert [s["start"] for s in segments] == [0.0, 30.0, 60.0, 90.0]
+
+    def test_chunked_windows_stay_parallel_and_share_wave_prompt(self, fw, backend):
+        fw.speech = self.SPEECH
+        barrier = threading.Barrier(3, timeout=5)
+
+        def hook(start_s, opts):
+            if start_s > 0:
+                barrier.wait()  # the three later windows form one wave and decode together
+
+        backend.model.hook = hook
+        backend.transcribe(
+            _audio(120), chunked=True, chunk_workers=3, chunk_length_s=60,
+            dynamic_prompt=lambda previous_text: "P:" + previous_text,
+        )
+        assert backend.model.prompts() == {0: None, 30: "P:t0", 60: "P:t0", 90: "P:t0"}
+        assert all(seconds <= 30 for _, seconds, _ in backend.model.calls)
+
+    def test_empty_prompt_drops_initial_prompt(self, fw, backend):
+        fw.speech = self.SPEECH[:2]
+        backend.transcribe(_audio(120), initial_prompt="init", dynamic_prompt=lambda previous_text: "")
+        assert backend.model.prompts() == {0: "init", 30: None}
+
+    def test_dictionary_provider_prompts_terms_heard_earlier(self, fw, backend):
+        fw.speech = self.SPEECH[:3]
+        terms = DictionaryData(
+            type=TYPE_TERMS, name="T", entries=[DictionaryEntry(term="Kafka"), DictionaryEntry(term="Grafana")],
+        )
+        provider = DictionaryService.build_dynamic_prompt_provider([terms], token_budget=50)
+        backend.model.texts = {0: "messages go through kafka topics", 30: "and nothing else"}
+        backend.transcribe(_audio(120), dynamic_prompt=provider)
+        prompts = backend.model.prompts()
+        assert prompts[0] is None
+        assert prompts[30] == "Use these terms as written: Kafka"
+        assert "Grafana" not in (prompts[60] or "")
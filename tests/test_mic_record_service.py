@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for MicRecordService disk recording and crash recovery (no audio device needed).
+"""
+import json
+import os
+import struct
+import wave
+
+import pytest
+
+import MicRecordService as mic_module
+from MicRecordService import MicRecordService, repair_wav_header
+
+
+def _write_wav(path, frames):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(struct.pack("<%dh" % len(frames), *frames))
+
+
+def _break_header(path):
+    """Как после сбоя: размеры RIFF и data не записаны, последний кадр оборван."""
+    with open(path, "r+b") as f:
+        f.seek(4)
+        f.write(struct.pack("<I", 0))
+        f.seek(40)
+        f.write(struct.pack("<I", 0))
+        f.seek(0, os.SEEK_END)
+        f.write(b"\x01")
+
+
+def test_repair_wav_header(tmp_path):
+    path = tmp_path / "a.wav"
+    _write_wav(path, list(range(100)))
+    _break_header(path)
+    assert repair_wav_header(str(path))
+    with wave.open(str(path), "rb") as w:
+        assert w.getnframes() == 100
+        assert struct.unpack("<100h", w.readframes(100)) == tuple(range(100))
+
+
+def test_repair_rejects_non_wav(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(b"not a wav file")
+    assert not repair_wav_header(str(path))
+
+
+def test_recover_interrupted_uses_markers(tmp_path):
+    recovery = tmp_path / "recordings"
+    recovery.mkdir()
+    path = tmp_path / "rec.wav"
+    _write_wav(path, [1, 2, 3])
+    _break_header(path)
+    (recovery / "x.json").write_text(json.dumps({"path": str(path), "format": "wav"}), encoding="utf-8")
+    (recovery / "gone.json").write_text(json.dumps({"path": str(tmp_path / "missing.wav"), "format": "wav"}))
+    assert MicRecordService.recover_interrupted(str(recovery)) == [str(path)]
+    assert os.listdir(recovery) == []
+    with wave.open(str(path), "rb") as w:
+        assert w.getnframes() == 3
+    assert MicRecordService.recover_interrupted(str(tmp_path / "none")) == []
+
+
+@pytest.mark.parametrize("file_format", ["wav", "flac"])
+def test_disk_writer_streams_blocks(tmp_path, monkeypatch, file_format):
+    np = pytest.importorskip("numpy")
+    sf = pytest.importorskip("soundfile")
+    monkeypatch.setattr(mic_module, "np", np, raising=False)
+    monkeypatch.setattr(mic_module, "sf", sf, raising=False)
+    path = str(tmp_path / f"rec.{file_format}")
+    marker = str(tmp_path / "recordings" / "m.json")
+    writer = mic_module._DiskWriter(path, 16000, 1, file_format, marker_path=marker)
+    assert os.path.exists(marker)
+    block = np.full((1600, 1), 0.25, dtype=np.float32)
+    for _ in range(10):
+        writer.put(block, gain=2.0)
+    assert writer.close() is None
+    assert not os.path.exists(marker)
+    data, sr = sf.read(path, dtype="float32")
+    assert sr == 16000 and len(data) == 16000 - writer.dropped
+    assert np.allclose(data, 0.5, atol=1e-3)
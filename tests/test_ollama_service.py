@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for OllamaService against a local fake Ollama HTTP server (no real Ollama needed).
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from CorrectionCacheService import CorrectionCacheService
+from OllamaService import CANCELLED_ERROR, OllamaService
+
+MARKER = "Text to correct:\n"
+BATCH_MARKER = "Segments:\n"
+
+
+class _FakeOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["prompt"]
+        batch = BATCH_MARKER in prompt
+        text = prompt.split(BATCH_MARKER if batch else MARKER, 1)[1]
+        if batch and server.garble_batches:
+            text = text.rsplit("\n", 1)[0]  # модель «потеряла» последний сегмент
+        with server.lock:
+            server.requests.append("batch" if batch else "single")
+            server.client_ports.add(self.client_address[1])
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        time.sleep(server.delay)
+        with server.lock:
+            server.active -= 1
+        if body["model"] == "missing":
+            status, out = 404, {"error": "model 'missing' not found"}
+        elif body.get("stream"):
+            return self._stream(text.upper())
+        else:
+            status, out = 200, {"response": text.upper(), "done": True}
+        data = json.dumps(out).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+    def _stream(self, text):
+        """NDJSON по словам (chunked), как /api/generate со stream: true."""
+        server = self.server
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        tokens = [w + " " for w in text.split(" ")] * server.stream_repeat
+        lines = [{"response": tok, "done": False} for tok in tokens] + [{"response": "", "done": True}]
+        try:
+            for line in lines:
+                data = (json.dumps(line) + "\n").encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+                time.sleep(server.token_delay)
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            server.aborted.set()  # клиент закрыл соединение
+
+
+@pytest.fixture
+def fake_ollama():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOllama)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.client_ports = set()
+    server.active = 0
+    server.max_active = 0
+    server.delay = 0.05
+    server.requests = []
+    server.garble_batches = False
+    server.stream_repeat = 1
+    server.token_delay = 0.0
+    server.aborted = threading.Event()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class TestOllamaCorrectSegments:
+    """Concurrent correction over pooled keep-alive connections."""
+
+    def test_parallel_requests_and_connection_reuse(self, fake_ollama):
+        service = OllamaService(_url(fake_ollama), workers=3)
+        segments = [{"start": i, "end": i + 1, "text": f"seg {i}"} for i in range(12)]
+        streamed = []
+        result = service.correct_segments(segments, model="m", on_segment=lambda i, seg: streamed.append(i))
+        assert [s["text"] for s in result] == [f"SEG {i}" for i in range(12)]
+        assert segments[0]["text"] == "seg 0"  # исходный список не меняется
+        assert sorted(streamed) == list(range(12))
+        assert fake_ollama.max_active == 3
+        assert len(fake_ollama.client_ports) <= 3  # соединения переиспользуются
+
+    def test_empty_segments_skip_network(self, fake_ollama):
+        service = OllamaService(_url(fake_ollama), workers=2)
+        progress = []
+        result = service.correct_segments(
+            [{"text": "  "}, {"text": "a"}], model="m", progress_callback=lambda done, total, _t: progress.append(done)
+        )
+        assert [s["text"] for s in result] == ["  ", "A"]
+        assert sorted(progress) == [1, 2]
+        assert len(fake_ollama.client_ports) == 1
+
+    def test_api_error_aborts(self, fake_ollama):
+        service = OllamaService(_url(fake_ollama), workers=2)
+        result = service.correct_segments([{"text": f"t{i}"} for i in range(6)], model="missing")
+        assert result is None
+        assert "not found" in service.get_last_error()
+
+    def test_unreachable_server(self):
+        service = OllamaService("http://127.0.0.1:9", workers=1)
+        assert service.correct_text("hello", model="m") is None
+        assert service.get_last_error()
+
+
+    def test_cache_skips_network_for_known_segments(self, fake_ollama, tmp_path):
+        cache = CorrectionCacheService(str(tmp_path / "c.sqlite3"))
+        service = OllamaService(_url(fake_ollama), workers=2)
+        segments = [{"text": "a"}, {"text": "b"}]
+        service.correct_segments(segments, model="m", cache=cache)
+        assert len(fake_ollama.requests) == 2
+        segments[1]["text"] = "b2"
+        result = service.correct_segments(segments, model="m", cache=cache, batch_tokens=1000)
+        assert [s["text"] for s in result] == ["A", "B2"]
+        assert fake_ollama.requests == ["single", "single", "single"]  # только изменившийся сегмент
+        assert cache.hits == 1
+        cache.close()
+
+
+class TestOllamaBatching:
+    """Numbered-marker batches with per-segment fallback."""
+
+    def test_plan_batches_respects_budget_and_skips_empty(self):
+        segments = [{"text": "word " * 20}, {"text": ""}, {"text": "word " * 20}, {"text": "word " * 20}]
+        assert OllamaService.plan_batches(segments, batch_tokens=60) == [[0, 2], [3]]
+        assert OllamaService.plan_batches(segments, batch_tokens=1000, max_segments=2) == [[0, 2], [3]]
+        assert OllamaService.plan_batches(segments, batch_tokens=10) == [[0], [2], [3]]
+
+    def test_parse_batch_response(self):
+        assert OllamaService.parse_batch_response("Sure:\n[[1]] A.\n[[2]] B\nC", 2) == ["A.", "B C"]
+        assert OllamaService.parse_batch_response("[[1]] A [[1]] B", 2) is None
+        assert OllamaService.parse_batch_response("[[1]] A", 2) is None
+        assert OllamaService.parse_batch_response("[[1]] A\n[[2]]", 2) is None
+
+    def test_batches_use_one_request_each(self, fake_ollama):
+        service = OllamaService(_url(fake_ollama), workers=2)
+        segments = [{"text": f"seg {i}\nline"} for i in range(10)]
+        result = service.correct_segments(segments, model="m", batch_tokens=1000)
+        assert [s["text"] for s in result] == [f"SEG {i} LINE" for i in range(10)]
+        assert fake_ollama.requests == ["batch"]
+
+    def test_unparsable_batch_falls_back_to_single(self, fake_ollama):
+        fake_ollama.garble_batches = True
+        service = OllamaService(_url(fake_ollama), workers=1)
+        streamed = []
+        result = service.correct_segments(
+            [{"text": f"s{i}"} for i in range(3)], model="m", batch_tokens=1000,
+            on_segment=lambda i, seg: streamed.append(i),
+        )
+        assert [s["text"] for s in result] == ["S0", "S1", "S2"]
+        assert fake_ollama.requests == ["batch", "single", "single", "single"]
+        assert streamed == [0, 1, 2]
+
+
+class TestOllamaStreaming:
+    """NDJSON streaming with partial results and cancellation."""
+
+    def test_partial_text_then_final(self, fake_ollama):
+        service = OllamaService(_url(fake_ollama), workers=1)
+        partials = []
+        result = service.correct_segments(
+            [{"text": "one two three"}, {"text": "four"}], model="m",
+            on_partial=lambda i, text: partials.append((i, text)),
+        )
+        assert [s["text"] for s in result] == ["ONE TWO THREE", "FOUR"]
+        assert partials[:3] == [(0, "ONE"), (0, "ONE TWO"), (0, "ONE TWO THREE")]
+        assert partials[-1] == (1, "FOUR")
+        assert len(fake_ollama.client_ports) == 1  # потоковый ответ дочитан, соединение переиспользовано
+
+    def test_partial_text_in_batches(self, fake_ollama):
+        service = OllamaService(_url(fake_ollama), workers=1)
+        partials = []
+        result = service.correct_segments(
+            [{"text": "a b"}, {"text": "c"}], model="m", batch_tokens=1000,
+            on_partial=lambda i, text: partials.append((i, text)),
+        )
+        assert [s["text"] for s in result] == ["A B", "C"]
+        assert (0, "A") in partials and (1, "C") in partials
+
+    def test_cancel_closes_stream(self, fake_ollama):
+        fake_ollama.stream_repeat = 200
+        fake_ollama.token_delay = 0.01
+        service = OllamaService(_url(fake_ollama), workers=1)
+        first = threading.Event()
+        out = {}
+
+        def run():
+            out["result"] = service.correct_segments(
+                [{"text": "x"}, {"text": "y"}], model="m", on_partial=lambda i, text: first.set()
+            )
+
+        th = threading.Thread(target=run)
+        started = time.monotonic()
+        th.start()
+        assert first.wait(5)
+        service.cancel()
+        th.join(5)
+        assert not th.is_alive()
+        assert time.monotonic() - started < 1.5  # полный ответ шёл бы ~2 с на сегмент
+        assert out["result"] is None
+        assert service.is_cancelled()
+        assert service.get_last_error() == CANCELLED_ERROR
+        assert fake_ollama.aborted.wait(2)
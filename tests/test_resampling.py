@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the streaming resampler used by the microphone path.
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from asr_backends.resampling import StreamingResampler  # noqa: E402
+
+
+def _run(resampler, audio, sizes):
+    out, i = [], 0
+    for n in sizes:
+        out.append(resampler.process(audio[i:i + n]))
+        i += n
+    out.append(resampler.process(audio[i:]))
+    out.append(resampler.flush())
+    return np.concatenate(out)
+
+
+@pytest.mark.parametrize("in_rate", [44100, 48000, 8000])
+def test_chunking_does_not_change_output(in_rate):
+    audio = np.random.RandomState(0).randn(in_rate).astype(np.float32)
+    whole = _run(StreamingResampler(in_rate, use_soxr=False), audio, [])
+    chunked = _run(StreamingResampler(in_rate, use_soxr=False), audio, [1, 7, 880, 4410, 3, 9000])
+    assert len(whole) == len(chunked) == 16000
+    assert np.allclose(whole, chunked, atol=1e-5)
+
+
+def test_matches_resample_poly():
+    signal = pytest.importorskip("scipy.signal")
+    audio = np.random.RandomState(1).randn(22050).astype(np.float32)
+    out = _run(StreamingResampler(44100, use_soxr=False), audio, [2205] * 9)
+    assert np.allclose(out, signal.resample_poly(audio, 160, 441), atol=1e-5)
+
+
+def test_sine_keeps_frequency_and_level():
+    t = np.arange(44100) / 44100.0
+    out = _run(StreamingResampler(44100, use_soxr=False), np.sin(2 * np.pi * 440 * t).astype(np.float32), [4410] * 9)
+    expected = np.sin(2 * np.pi * 440 * np.arange(16000) / 16000.0)
+    assert np.abs(out[200:-200] - expected[200:-200]).max() < 1e-2
+
+
+def test_passthrough_downmixes_stereo():
+    resampler = StreamingResampler(16000)
+    assert resampler.engine == "passthrough"
+    out = resampler.process(np.array([[1.0, 0.0], [0.5, 0.5]], dtype=np.float32))
+    assert out.tolist() == [0.5, 0.5]
+    assert len(resampler.flush()) == 0
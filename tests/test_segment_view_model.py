@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for SegmentViewModel (segment editor model without UI).
+"""
+import pytest
+
+from segment_view_model import ROWS_CHANGED, ROWS_RESET, RowChange, SegmentViewModel
+
+
+@pytest.fixture
+def segments():
+    return [
+        {"start": 0.0, "end": 1.0, "text": "one"},
+        {"start": 1.0, "end": 2.0, "text": "two"},
+        {"start": 2.0, "end": 3.0, "text": "three", "speaker": "A"},
+    ]
+
+
+@pytest.fixture
+def vm_events(segments):
+    vm = SegmentViewModel(segments)
+    events = []
+    vm.subscribe(events.append)
+    return vm, events
+
+
+class TestSegmentViewModel:
+    """Row-level change events and bulk operations."""
+
+    def test_set_suggestions_emits_only_changed_rows(self, vm_events, segments):
+        vm, events = vm_events
+        assert vm.set_suggestions(["One", "two", "Three"]) == (0, 2)
+        assert events == [RowChange(ROWS_CHANGED, (0, 2))]
+        assert segments[0]["text"] == "one"  # text не меняется до accept
+        assert vm.pending_suggestions() == [0, 2]
+
+    def test_accept_and_reject_single_row(self, vm_events, segments):
+        vm, events = vm_events
+        vm.set_suggestions(["One", "Two"])
+        events.clear()
+        assert vm.accept(0)
+        assert vm.reject(1)
+        assert events == [RowChange(ROWS_CHANGED, (0,)), RowChange(ROWS_CHANGED, (1,))]
+        assert segments[0] == {"start": 0.0, "end": 1.0, "text": "One"}
+        assert segments[1] == {"start": 1.0, "end": 2.0, "text": "two"}
+        assert not vm.accept(0)  # нечего принимать — нет события
+        assert len(events) == 2
+
+    def test_accept_all_in_one_event(self, vm_events, segments):
+        vm, events = vm_events
+        vm.set_suggestions(["One", "", "Three"])
+        events.clear()
+        assert vm.accept_all() == 2
+        assert events == [RowChange(ROWS_CHANGED, (0, 2))]
+        assert [s["text"] for s in segments] == ["One", "two", "Three"]  # пустое предложение не стирает текст
+        assert all("suggested_text" not in s for s in segments)
+        assert not vm.has_pending_suggestions()
+
+    def test_reject_all(self, vm_events, segments):
+        vm, events = vm_events
+        vm.set_suggestions(["One", "Two", "Three"])
+        events.clear()
+        assert vm.reject_all() == 3
+        assert events == [RowChange(ROWS_CHANGED, (0, 1, 2))]
+        assert [s["text"] for s in segments] == ["one", "two", "three"]
+
+    def test_text_and_speaker_edits(self, vm_events, segments):
+        vm, events = vm_events
+        vm.set_suggestions(["", "Two"])
+        events.clear()
+        assert vm.set_text(1, "edited")
+        assert segments[1] == {"start": 1.0, "end": 2.0, "text": "edited"}
+        assert vm.set_speaker(0, "B")
+        assert vm.set_speaker(2, None)
+        assert "speaker" not in segments[2]
+        assert not vm.set_speaker(0, "B")
+        assert events == [RowChange(ROWS_CHANGED, (1,)), RowChange(ROWS_CHANGED, (0,)), RowChange(ROWS_CHANGED, (2,))]
+
+    def test_reset_and_unsubscribe(self, vm_events):
+        vm, events = vm_events
+        vm.reset([{"start": 0, "end": 1, "text": "x"}])
+        assert events == [RowChange(ROWS_RESET)]
+        assert len(vm) == 1
+        other = []
+        unsubscribe = vm.subscribe(other.append)
+        unsubscribe()
+        vm.set_text(0, "y")
+        assert other == []
@@ -9,11 +9,14 @@ from pathlib import Path
 import pytest
 
 from SessionService import (
+    LazyFileTranscripts,
     SCHEMA_VERSION,
     SCHEMA_VERSION_MULTI_FILE,
+    SCHEMA_VERSION_SPLIT,
     SessionData,
     SessionService,
 )
+from segment_view_model import SegmentViewModel
 
 
 class TestSessionData:
@@ -152,6 +155,145 @@ class TestSessionServiceSaveLoad:
         assert SessionService.load_session(str(path)) is None
 
 
+class TestSessionServiceSplitFormat:
+    """Tests for the v3 layout: manifest + one transcript file per media file."""
+
+    def _session(self, tmp_path, file_transcripts, current="a.wav"):
+        return SessionData(
+            audio_path=str(tmp_path / current),
+            transcript=list(file_transcripts[current]),
+            model_used="base",
+            file_transcripts=file_transcripts,
+            current_file_rel=current,
+        )
+
+    def test_manifest_does_not_duplicate_transcripts(self, tmp_path, sample_transcript):
+        project_path = tmp_path / "p.wiproject"
+        session = self._session(tmp_path, {"a.wav": sample_transcript, "sub/b.wav": []})
+        assert SessionService.save_session(str(project_path), session) is True
+        manifest = json.loads(project_path.read_text(encoding="utf-8"))
+        assert manifest["version"] == SCHEMA_VERSION_SPLIT
+        assert "transcript" not in manifest and "file_transcripts" not in manifest
+        assert sorted(manifest["files"]) == ["a.wav", "sub/b.wav"]
+        assert len(os.listdir(SessionService.transcripts_dir(str(project_path)))) == 2
+        loaded = SessionService.load_session(str(project_path))
+        assert loaded.file_transcripts == {"a.wav": sample_transcript, "sub/b.wav": []}
+        assert loaded.transcript == sample_transcript
+
+    def test_only_dirty_transcripts_are_rewritten(self, tmp_path, sample_transcript):
+        project_path = str(tmp_path / "p.wiproject")
+        transcripts = {"a.wav": sample_transcript, "b.wav": sample_transcript}
+        SessionService.save_session(project_path, self._session(tmp_path, transcripts))
+        tdir = Path(SessionService.transcripts_dir(project_path))
+        b_file = tdir / SessionService._transcript_file_name("b.wav")
+        os.utime(b_file, (0, 0))
+        transcripts["a.wav"] = [{"start": 0.0, "end": 1.0, "text": "edited"}]
+        transcripts["b.wav"] = [{"start": 0.0, "end": 1.0, "text": "not saved"}]
+        SessionService.save_session(project_path, self._session(tmp_path, transcripts), dirty={"a.wav"})
+        assert b_file.stat().st_mtime == 0
+        loaded = SessionService.load_session(project_path)
+        assert loaded.file_transcripts["a.wav"][0]["text"] == "edited"
+        assert loaded.file_transcripts["b.wav"] == sample_transcript
+
+    def test_removed_files_are_cleaned_up(self, tmp_path, sample_transcript):
+        project_path = str(tmp_path / "p.wiproject")
+        SessionService.save_session(
+            project_path, self._session(tmp_path, {"a.wav": sample_transcript, "b.wav": sample_transcript})
+        )
+        SessionService.save_session(project_path, self._session(tmp_path, {"a.wav": sample_transcript}), dirty=[])
+        assert os.listdir(SessionService.transcripts_dir(project_path)) == [
+            SessionService._transcript_file_name("a.wav")
+        ]
+
+    def test_v2_project_is_upgraded_on_save(self, sample_session_json_v2):
+        session = SessionService.load_session(sample_session_json_v2)
+        assert SessionService.save_session(sample_session_json_v2, session, dirty=[]) is True
+        reloaded = SessionService.load_session(sample_session_json_v2)
+        assert reloaded.current_file_rel == "audio/two.wav"
+        assert reloaded.file_transcripts["audio/one.wav"][0]["text"] == "From one"
+
+
+class TestLazyLoading:
+    """Tests for load_session(lazy=True) and LazyFileTranscripts."""
+
+    @pytest.fixture
+    def project(self, tmp_path):
+        project_path = str(tmp_path / "p.wiproject")
+        transcripts = {
+            f"f{i}.wav": [{"start": 0.0, "end": 1.0, "text": f"file {i}"}] for i in range(5)
+        }
+        transcripts["empty.wav"] = []
+        session = SessionData(
+            audio_path=str(tmp_path / "f0.wav"),
+            transcript=transcripts["f0.wav"],
+            file_transcripts=transcripts,
+            current_file_rel="f0.wav",
+        )
+        assert SessionService.save_session(project_path, session)
+        return project_path
+
+    def test_only_current_file_is_read(self, project):
+        session = SessionService.load_session(project, lazy=True)
+        ft = session.file_transcripts
+        assert isinstance(ft, LazyFileTranscripts)
+        assert session.transcript[0]["text"] == "file 0"
+        assert len(ft) == 6 and "f3.wav" in ft
+        assert ft.is_loaded("f0.wav") and not ft.is_loaded("f3.wav")
+        assert SessionService.has_transcript(ft, "f3.wav") and not SessionService.has_transcript(ft, "empty.wav")
+        assert not ft.is_loaded("f3.wav")
+        assert ft["f3.wav"][0]["text"] == "file 3"
+        assert ft.is_loaded("f3.wav")
+
+    def test_lru_keeps_recent_transcripts(self, project):
+        session = SessionService.load_session(project, lazy=True)
+        ft = session.file_transcripts
+        ft._cache_size = 2
+        for rel in ("f1.wav", "f2.wav", "f3.wav"):
+            ft[rel]
+        assert not ft.is_loaded("f0.wav") and not ft.is_loaded("f1.wav")
+        assert ft.is_loaded("f2.wav") and ft.is_loaded("f3.wav")
+
+    def test_modified_transcripts_survive_eviction_and_save(self, project):
+        session = SessionService.load_session(project, lazy=True)
+        ft = session.file_transcripts
+        ft["f4.wav"] = [{"start": 0.0, "end": 2.0, "text": "edited"}]
+        del ft["f1.wav"]
+        session.current_file_rel = "f4.wav"
+        assert SessionService.save_session(project, session, dirty=[]) is True
+        assert not ft.is_modified("f4.wav")
+        reloaded = SessionService.load_session(project)
+        assert reloaded.file_transcripts["f4.wav"][0]["text"] == "edited"
+        assert "f1.wav" not in reloaded.file_transcripts
+        assert reloaded.file_transcripts["f2.wav"][0]["text"] == "file 2"
+
+    def test_in_place_edits_are_detected_and_survive_eviction(self, project):
+        session = SessionService.load_session(project, lazy=True)
+        ft = session.file_transcripts
+        ft._cache_size = 1
+        ft["f2.wav"][0]["text"] = "edited in place"
+        assert ft.is_modified("f2.wav") and not ft.is_modified("f3.wav")
+        ft["f3.wav"]  # f2.wav вытеснен из LRU
+        assert ft.is_modified("f2.wav")
+        assert SessionService.save_session(project, session, dirty=[]) is True
+        assert not ft.is_modified("f2.wav")
+        reloaded = SessionService.load_session(project)
+        assert reloaded.file_transcripts["f2.wav"][0]["text"] == "edited in place"
+
+    def test_edit_switch_save_writes_edited_file(self, project):
+        """Как в редакторе: правка f0.wav, переключение на f1.wav, сохранение только изменённых."""
+        session = SessionService.load_session(project, lazy=True)
+        ft, dirty = session.file_transcripts, set()
+        current = SessionService.editable_transcript(ft, "f0.wav")
+        SegmentViewModel(current).set_text(0, "edited A")
+        assert ft["f0.wav"][0]["text"] == "file 0"  # редактор работает с копией
+        SessionService.store_transcript(ft, dirty, "f0.wav", current)
+        current = SessionService.editable_transcript(ft, "f1.wav")
+        session.transcript, session.current_file_rel = current, "f1.wav"
+        assert SessionService.save_session(project, session, dirty=dirty | {"f1.wav"}) is True
+        reloaded = SessionService.load_session(project)
+        assert reloaded.file_transcripts["f0.wav"][0]["text"] == "edited A"
+
+
 class TestSessionServiceBuildSession:
     """Tests for build_session factory."""
 
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for StreamingPipeline with a synthetic audio source (no microphone or ASR model needed).
+"""
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from asr_backends.base import STREAM_FLUSH  # noqa: E402
+from streaming_pipeline import (  # noqa: E402
+    OVERFLOW_DROP,
+    OVERFLOW_MERGE,
+    SAMPLE_RATE,
+    AudioChunk,
+    StreamingPipeline,
+    _ChunkQueue,
+    chunk_asr,
+    streaming_asr,
+)
+from vad_gate import VadGate  # noqa: E402
+
+BLOCK = SAMPLE_RATE // 50  # 20 мс
+
+
+class SyntheticSource:
+    """Блоки по 20 мс (значение — номер сэмпла) с тем же интерфейсом, что у MicRecordService."""
+
+    def __init__(self, blocks, interval=0.002):
+        self.total = blocks * BLOCK
+        self._ready = []
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self.done = threading.Event()
+        self._thread = threading.Thread(target=self._produce, args=(blocks, interval), daemon=True)
+        self._thread.start()
+
+    def _produce(self, blocks, interval):
+        for i in range(blocks):
+            with self._lock:
+                self._ready.append(np.arange(i * BLOCK, (i + 1) * BLOCK, dtype=np.float32))
+            self._event.set()
+            time.sleep(interval)
+        self.done.set()
+
+    def read(self, final=False):
+        with self._lock:
+            ready, self._ready = self._ready, []
+        return np.concatenate(ready) if ready else None
+
+    def wait(self, timeout):
+        got = self._event.wait(timeout)
+        self._event.clear()
+        return got
+
+
+def _run(source, asr, **kwargs):
+    results = []
+    pipeline = StreamingPipeline(source.read, source.wait, asr, results.append, **kwargs)
+    pipeline.start()
+    assert source.done.wait(10)
+    assert pipeline.stop(timeout=10)
+    return pipeline, results
+
+
+def _recording_asr(seen, delay=0.0):
+    def asr(chunks):
+        for chunk in chunks:
+            seen.append(chunk)
+            time.sleep(delay)
+            yield {"start": chunk.start, "end": chunk.start + chunk.duration, "text": str(len(chunk.audio))}
+    return asr
+
+
+def test_all_audio_reaches_asr_in_order():
+    seen = []
+    source = SyntheticSource(100)
+    pipeline, results = _run(source, _recording_asr(seen), target_latency_s=0.25)
+    audio = np.concatenate([c.audio for c in seen])
+    assert np.array_equal(audio, np.arange(source.total, dtype=np.float32))
+    assert all(len(c.audio) >= 0.25 * SAMPLE_RATE for c in seen[:-1])
+    assert [c.start for c in seen] == [sum(len(x.audio) for x in seen[:i]) / SAMPLE_RATE for i in range(len(seen))]
+    assert len(results) == len(seen) == pipeline.stats()["chunks"]
+    assert pipeline.stats()["dropped_s"] == 0
+
+
+def test_slow_asr_merges_without_losing_audio():
+    seen = []
+    source = SyntheticSource(150)
+    pipeline, _ = _run(source, _recording_asr(seen, delay=0.1), target_latency_s=0.04, max_chunks=2)
+    stats = pipeline.stats()
+    assert stats["merged"] > 0 and stats["dropped_s"] == 0
+    assert sum(len(c.audio) for c in seen) == source.total
+    assert len(seen) < stats["chunks"]
+
+
+def test_slow_asr_drop_policy_keeps_newest():
+    seen = []
+    source = SyntheticSource(150)
+    pipeline, _ = _run(
+        source, _recording_asr(seen, delay=0.1), target_latency_s=0.04, max_chunks=2, overflow=OVERFLOW_DROP
+    )
+    stats = pipeline.stats()
+    assert stats["dropped_s"] > 0
+    assert sum(len(c.audio) for c in seen) < source.total
+    assert seen[-1].audio[-1] == source.total - 1
+
+
+def test_backlog_limit_trims_oldest_audio():
+    seen = []
+    source = SyntheticSource(150)
+    pipeline, _ = _run(
+        source, _recording_asr(seen, delay=0.2), target_latency_s=0.04, max_chunks=1,
+        overflow=OVERFLOW_MERGE, max_backlog_s=0.5,
+    )
+    assert pipeline.stats()["dropped_s"] > 0
+    for chunk in seen:
+        assert chunk.audio[0] == pytest.approx(chunk.start * SAMPLE_RATE)
+
+
+def test_chunk_asr_offsets_segments():
+    source = SyntheticSource(50)
+    asr = chunk_asr(lambda audio: [{"start": 0.0, "end": len(audio) / SAMPLE_RATE, "text": "x"}])
+    _, results = _run(source, asr, target_latency_s=0.5)
+    assert results[0]["start"] == 0.0
+    assert results[-1]["end"] == pytest.approx(source.total / SAMPLE_RATE)
+
+
+def test_asr_error_stops_pipeline():
+    errors = []
+
+    def failing(chunks):
+        for _chunk in chunks:
+            raise RuntimeError("boom")
+        yield  # pragma: no cover
+
+    source = SyntheticSource(30)
+    pipeline = StreamingPipeline(source.read, source.wait, failing, lambda r: None,
+                                 target_latency_s=0.05, on_error=errors.append)
+    pipeline.start()
+    assert pipeline.stop(timeout=5)
+    assert [str(e) for e in errors] == ["boom"]
+
+
+class ToneSource(SyntheticSource):
+    """Речь (громкий тон) в блоках из speech_blocks, остальное — тишина."""
+
+    def __init__(self, blocks, speech_blocks):
+        self.speech_blocks = set(speech_blocks)
+        super().__init__(blocks)
+
+    def _produce(self, blocks, interval):
+        t = np.arange(BLOCK) / SAMPLE_RATE
+        for i in range(blocks):
+            tone = 0.3 * np.sin(2 * np.pi * 440 * t) if i in self.speech_blocks else np.zeros(BLOCK)
+            block = tone.astype(np.float32)
+            with self._lock:
+                self._ready.append(block)
+            self._event.set()
+            time.sleep(interval)
+        self.done.set()
+
+
+def test_vad_gate_skips_silence_and_flushes_online_asr():
+    fed = []
+
+    def fake_streaming_transcribe(items):
+        """Как онлайн-ASR: время от начала фразы, текст фразы подтверждается на STREAM_FLUSH."""
+        utterance = 0
+        for item in items:
+            if isinstance(item, str) and item == STREAM_FLUSH:
+                yield 0.0, utterance / SAMPLE_RATE, "phrase"
+                utterance = 0
+                continue
+            fed.append(len(item[0]))
+            utterance += len(item[0])
+
+    # 2 с тишины, 1 с речи, 2 с тишины, 0.5 с речи, 1 с тишины (блоки по 20 мс)
+    speech = list(range(100, 150)) + list(range(250, 275))
+    source = ToneSource(325, speech)
+    gate = VadGate(use_silero=False, pause_s=0.5, preroll_s=0.0)
+    pipeline, phrases = _run(source, streaming_asr(fake_streaming_transcribe), target_latency_s=0.2, gate=gate)
+    assert len(phrases) == 2
+    assert phrases[0]["start"] == pytest.approx(2.0, abs=0.05)
+    assert phrases[0]["end"] == pytest.approx(3.5, abs=0.05)  # речь + pause_s тишины до закрытия фразы
+    assert phrases[1]["start"] == pytest.approx(5.0, abs=0.05)
+    assert sum(fed) / SAMPLE_RATE < 3.5  # 6.5 с записи, в ASR — только фразы
+    stats = pipeline.stats()
+    assert stats["utterances"] == 2
+    assert stats["speech_ratio"] == pytest.approx(1.5 / 6.5, abs=0.02)
+
+
+
+def test_drop_policy_keeps_utterance_boundaries():
+    """Медленный ASR + drop: выброшенные фрагменты не должны уносить конец фразы (STREAM_FLUSH)."""
+    mixed = []
+
+    def slow_streaming_transcribe(items):
+        levels = set()
+        for item in items:
+            if isinstance(item, str) and item == STREAM_FLUSH:
+                if len(levels) > 1:
+                    mixed.append(sorted(levels))
+                levels = set()
+                yield 0.0, 0.0, "phrase"
+                continue
+            level = round(float(np.abs(item[0]).max()), 1)  # громкость = номер фразы (0 — пауза)
+            if level:
+                levels.add(level)
+            time.sleep(0.1)
+
+    # 6 фраз по 0.5 с речи через 0.4 с тишины, у каждой своя громкость
+    class LevelSource(ToneSource):
+        def _produce(self, blocks, interval):
+            t = np.arange(BLOCK) / SAMPLE_RATE
+            for i in range(blocks):
+                level = 0.1 * (i // 45 + 1) if i in self.speech_blocks else 0.0
+                with self._lock:
+                    self._ready.append((level * np.sin(2 * np.pi * 440 * t + 0.1)).astype(np.float32))
+                self._event.set()
+                time.sleep(interval)
+            self.done.set()
+
+    speech = [b for i in range(6) for b in range(i * 45 + 20, i * 45 + 45)]
+    source = LevelSource(6 * 45 + 20, speech)
+    gate = VadGate(use_silero=False, pause_s=0.3, preroll_s=0.0)
+    pipeline, phrases = _run(
+        source, streaming_asr(slow_streaming_transcribe), target_latency_s=0.1,
+        max_chunks=1, overflow=OVERFLOW_DROP, gate=gate,
+    )
+    assert pipeline.stats()["dropped_s"] > 0
+    assert phrases and mixed == []
+
+
+def test_merge_policy_with_gate_keeps_all_speech():
+    """Фразы не склеиваются, но при "merge" и медленном ASR их аудио не выбрасывается."""
+    fed = []
+
+    def slow_streaming_transcribe(items):
+        for item in items:
+            if isinstance(item, str) and item == STREAM_FLUSH:
+                yield 0.0, 0.0, "phrase"
+                continue
+            fed.append(len(item[0]))
+            time.sleep(0.05)
+
+    speech = [b for i in range(6) for b in range(i * 45 + 20, i * 45 + 45)]
+    source = ToneSource(6 * 45 + 20, speech)
+    gate = VadGate(use_silero=False, pause_s=0.3, preroll_s=0.0)
+    pipeline, phrases = _run(
+        source, streaming_asr(slow_streaming_transcribe), target_latency_s=0.1, max_chunks=1, gate=gate,
+    )
+    assert pipeline.stats()["dropped_s"] == 0 and pipeline.stats()["merged"] > 0
+    assert sum(fed) == gate.forwarded_samples
+    assert len(phrases) == gate.utterances == 6
+
+
+def test_queue_keeps_end_of_utterance_when_trimming():
+    queue = _ChunkQueue(max_chunks=8, max_backlog_s=0.5, overflow=OVERFLOW_MERGE)
+    second = np.ones(SAMPLE_RATE // 2, dtype=np.float32)
+    queue.put(AudioChunk(0.0, np.ones(SAMPLE_RATE // 2, dtype=np.float32), 0.0, ends_utterance=True))
+    queue.put(AudioChunk(2.0, second, 0.0))
+    queue.close()
+    first = queue.get()
+    assert first.ends_utterance and len(first.audio) == 0  # аудио выброшено, метка конца фразы осталась
+    assert queue.get().audio is second
+    assert queue.dropped_s == 0.5
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for TranscriptionService model cache (fake backends, no ASR dependencies).
+"""
+import threading
+
+import pytest
+
+import TranscriptionService as ts_module
+from TranscriptionService import TranscriptionService
+
+
+class FakeBackend:
+    """Minimal ASR backend: counts load_model calls, records unload."""
+
+    instances = []
+
+    def __init__(self):
+        self.model = None
+        self.is_running = False
+        self.load_calls = 0
+        self.unloaded = False
+        FakeBackend.instances.append(self)
+
+    def load_model(self, model_size="base", device="cpu", compute_type="int8", **kwargs):
+        self.load_calls += 1
+        self.model = (model_size, device, compute_type)
+        return True
+
+    def transcribe(self, file_path, **kwargs):
+        return [{"start": 0.0, "end": 1.0, "text": str(self.model)}], None
+
+    def stop(self):
+        self.is_running = False
+
+    def unload(self):
+        self.unloaded = True
+        self.model = None
+
+
+@pytest.fixture
+def service(monkeypatch):
+    FakeBackend.instances = []
+    config = {"transcription_engine": "faster-whisper"}
+    monkeypatch.setattr(ts_module, "_load_config", lambda: config)
+    monkeypatch.setattr(ts_module, "_get_backend_class", lambda engine: FakeBackend)
+    svc = TranscriptionService(max_memory_mb=10_000)
+    return svc
+
+
+class TestTranscriptionServiceModelCache:
+    """Tests for the LRU model cache."""
+
+    def test_same_key_reuses_loaded_model(self, service):
+        assert service.load_model(model_size="base", device="cpu", compute_type="int8")
+        assert service.load_model(model_size="base", device="cpu", compute_type="int8")
+        assert len(FakeBackend.instances) == 1
+        assert FakeBackend.instances[0].load_calls == 1
+
+    def test_num_workers_does_not_duplicate_model(self, service):
+        service.load_model(model_size="base", device="cpu", compute_type="int8", num_workers=4)
+        service.load_model(model_size="base", device="cpu", compute_type="int8")
+        assert len(service.loaded_models()) == 1 and len(FakeBackend.instances) == 1
+        # Больше потоков, чем у загруженной модели, — перезагрузка вместо второй копии
+        service.load_model(model_size="base", device="cpu", compute_type="int8", num_workers=8)
+        assert len(service.loaded_models()) == 1
+        assert FakeBackend.instances[0].unloaded and len(FakeBackend.instances) == 2
+
+    def test_different_key_loads_new_model(self, service):
+        service.load_model(model_size="base", device="cpu", compute_type="int8")
+        service.load_model(model_size="small", device="cpu", compute_type="int8")
+        assert len(service.loaded_models()) == 2
+        segs, _ = service.transcribe("x.wav")
+        assert "small" in segs[0]["text"]
+
+    def test_engine_override_returns_to_warm_model(self, service):
+        service.load_model(model_size="base", device="cpu", compute_type="int8")
+        file_backend = FakeBackend.instances[0]
+        service.load_model(model_size="base", device="cpu", compute_type="int8", engine_override="whisper-streaming")
+        assert service._backend is not file_backend
+        service.clear_engine_override()
+        assert service._get_backend() is file_backend
+        service.load_model(model_size="base", device="cpu", compute_type="int8")
+        assert file_backend.load_calls == 1
+
+    def test_lru_eviction_respects_memory_budget(self, service):
+        service._max_memory_mb = 1000  # fits "small" (240 MB int8) + "base", but not "medium" on top
+        service.load_model(model_size="base", device="cpu", compute_type="int8")
+        service.load_model(model_size="small", device="cpu", compute_type="int8")
+        service.load_model(model_size="base", device="cpu", compute_type="int8")  # base becomes most recent
+        service.load_model(model_size="medium", device="cpu", compute_type="int8")
+        sizes = [k[1] for k in service.loaded_models()]
+        assert sizes == ["base", "medium"]
+        assert FakeBackend.instances[1].unloaded is True
+
+    def test_unload_single_and_all(self, service):
+        service.load_model(model_size="base", device="cpu", compute_type="int8")
+        service.load_model(model_size="small", device="cpu", compute_type="int8")
+        first_key = service.loaded_models()[0]
+        service.unload(first_key)
+        assert first_key not in service.loaded_models()
+        service.unload()
+        assert service.loaded_models() == []
+        assert all(b.unloaded for b in FakeBackend.instances)
+        assert service.model is None
+
+    def test_failed_load_is_not_cached(self, service, monkeypatch):
+        monkeypatch.setattr(FakeBackend, "load_model", lambda self, **kw: False)
+        assert service.load_model(model_size="base", device="cpu", compute_type="int8") is False
+        assert service.loaded_models() == []
+
+    def test_slow_load_does_not_block_cache_queries(self, service, monkeypatch):
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow_load(self, **kw):
+            started.set()
+            release.wait(5)
+            self.model = kw.get("model_size")
+            return True
+
+        monkeypatch.setattr(FakeBackend, "load_model", slow_load)
+        loader = threading.Thread(
+            target=service.load_model,
+            kwargs={"model_size": "base", "device": "cpu", "compute_type": "int8"},
+        )
+        loader.start()
+        assert started.wait(5)
+        answers = []
+        query = threading.Thread(target=lambda: answers.append((service.loaded_models(), service.get_token_counter())))
+        query.start()
+        query.join(2)
+        finished = not query.is_alive()
+        release.set()
+        loader.join(5)
+        assert finished
+        assert answers[0][0] == []
+        assert len(service.loaded_models()) == 1
+
+    def test_concurrent_loads_of_same_key_load_once(self, service):
+        threads = [
+            threading.Thread(
+                target=service.load_model,
+                kwargs={"model_size": "base", "device": "cpu", "compute_type": "int8"},
+            )
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        assert sum(b.load_calls for b in FakeBackend.instances) == 1
+        assert len(service.loaded_models()) == 1
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for VadGate (energy detector only; Silero is not needed).
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from vad_gate import FRAME, SAMPLE_RATE, VadGate  # noqa: E402
+
+
+def _signal(*parts):
+    """parts: (seconds, is_speech) — тон 440 Гц или тишина."""
+    out = []
+    for seconds, speech in parts:
+        n = int(seconds * SAMPLE_RATE)
+        t = np.arange(n) / SAMPLE_RATE
+        out.append((0.3 * np.sin(2 * np.pi * 440 * t) if speech else np.zeros(n)).astype(np.float32))
+    return np.concatenate(out)
+
+
+def _feed(gate, audio, block=3200):
+    out = []
+    for i in range(0, len(audio), block):
+        out += gate.process(audio[i:i + block])
+    return out + gate.finish()
+
+
+def test_silence_is_not_forwarded():
+    gate = VadGate(use_silero=False)
+    assert _feed(gate, _signal((2.0, False))) == []
+    assert gate.stats()["speech_ratio"] == 0.0
+    assert gate.stats()["silence_s"] == pytest.approx(2.0, abs=FRAME / SAMPLE_RATE)
+
+
+def test_utterances_with_preroll_and_flush():
+    gate = VadGate(use_silero=False, pause_s=0.5, preroll_s=0.2)
+    audio = _signal((1.0, False), (1.0, True), (0.2, False), (0.5, True), (2.0, False), (0.6, True))
+    out = _feed(gate, audio)
+    flushes = [pos for pos, part in out if part is None]
+    chunks = [(pos, part) for pos, part in out if part is not None]
+    assert len(flushes) == 2 and gate.utterances == 2  # короткая пауза 0.2 с не закрывает фразу
+    first_pos = chunks[0][0]
+    assert first_pos == pytest.approx(0.8 * SAMPLE_RATE, abs=FRAME)  # 0.2 с тишины перед речью
+    for pos, part in chunks:
+        assert np.array_equal(part, audio[pos:pos + len(part)])  # позиции — от начала записи
+    assert chunks[-1][0] + len(chunks[-1][1]) == len(audio)  # хвост неполного кадра отдан в finish()
+    stats = gate.stats()
+    assert stats["forwarded_s"] < len(audio) / SAMPLE_RATE - 2.0
+    assert 0.4 < stats["speech_ratio"] < 0.6
+
+
+def test_finish_closes_open_utterance():
+    gate = VadGate(use_silero=False)
+    out = _feed(gate, _signal((0.5, True)))
+    assert out[-1][1] is None
+    assert sum(len(part) for _pos, part in out if part is not None) == int(0.5 * SAMPLE_RATE)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+VAD перед ASR в потоковом режиме микрофона: тишина не отправляется в модель.
+Кадры по 512 сэмплов (32 мс при 16 kHz): сначала дешёвая проверка энергии, и только кадры громче
+порога проверяет Silero VAD из faster-whisper (без faster-whisper — только энергия).
+Речь отдаётся вместе с preroll_s тишины перед ней; после pause_s тишины фраза закрывается —
+конвейер сбрасывает онлайн-ASR (текст фразы подтверждается сразу, а не с началом следующей).
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+SAMPLE_RATE = 16000
+FRAME = 512
+DEFAULT_ENERGY_DB = -50.0
+DEFAULT_SPEECH_THRESHOLD = 0.5
+DEFAULT_PAUSE_S = 0.8
+DEFAULT_PREROLL_S = 0.3
+# Сколько предыдущего звука подаётся Silero вместе с новым блоком (состояние модели между вызовами не хранится)
+_SILERO_CONTEXT_S = 0.5
+
+# (позиция первого сэмпла от начала записи, аудио) или (позиция, None) — конец фразы
+GateOutput = Tuple[int, Optional[Any]]
+
+
+def _load_silero():
+    """get_speech_timestamps и VadOptions из faster-whisper или None."""
+    try:
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+    except ImportError:
+        return None
+    return get_speech_timestamps, VadOptions
+
+
+class VadGate:
+    """
+    process(audio) -> список GateOutput (только речь с паузами внутри фраз); finish() — закрыть последнюю фразу.
+    stats() — speech_s / silence_s / speech_ratio, forwarded_s (ушло в ASR) и utterances.
+    """
+
+    def __init__(
+        self,
+        energy_db: float = DEFAULT_ENERGY_DB,
+        speech_threshold: float = DEFAULT_SPEECH_THRESHOLD,
+        pause_s: float = DEFAULT_PAUSE_S,
+        preroll_s: float = DEFAULT_PREROLL_S,
+        use_silero: bool = True,
+    ):
+        self.energy_db = float(energy_db)
+        self.speech_threshold = float(speech_threshold)
+        self.pause_frames = max(1, int(round(float(pause_s) * SAMPLE_RATE / FRAME)))
+        self._silero = _load_silero() if use_silero else None
+        self._preroll: Deque[Tuple[int, Any]] = deque(maxlen=max(0, int(round(float(preroll_s) * SAMPLE_RATE / FRAME))))
+        self._context = None  # хвост предыдущего звука для Silero
+        self._carry = None  # неполный кадр до следующего вызова
+        self._pos = 0  # позиция начала следующего кадра
+        self._active = False
+        self._silence_run = 0
+        self.speech_frames = 0
+        self.silence_frames = 0
+        self.forwarded_samples = 0
+        self.utterances = 0
+
+    @property
+    def engine(self) -> str:
+        return "silero" if self._silero is not None else "energy"
+
+    # --- классификация ---
+
+    def _speech_mask(self, frames):
+        import numpy as np
+
+        energy = np.mean(frames.astype(np.float64) ** 2, axis=1)
+        mask = 10.0 * np.log10(energy + 1e-12) > self.energy_db
+        if self._silero is not None and mask.any():
+            mask &= self._silero_mask(frames.reshape(-1))
+        return mask
+
+    def _silero_mask(self, audio):
+        import numpy as np
+
+        get_speech_timestamps, VadOptions = self._silero
+        context = self._context if self._context is not None else np.zeros(0, dtype=np.float32)
+        joined = np.concatenate([context, audio])
+        options = VadOptions(
+            threshold=self.speech_threshold,
+            min_speech_duration_ms=0,
+            min_silence_duration_ms=0,
+            speech_pad_ms=0,
+        )
+        mask = np.zeros(len(audio) // FRAME, dtype=bool)
+        for ts in get_speech_timestamps(joined, options):
+            start = max(0, ts["start"] - len(context))
+            end = ts["end"] - len(context)
+            if end > start:
+                mask[start // FRAME:-(-end // FRAME)] = True
+        return mask
+
+    # --- фразы ---
+
+    def process(self, audio) -> List[GateOutput]:
+        import numpy as np
+
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        if self._carry is not None:
+            audio = np.concatenate([self._carry, audio])
+            self._carry = None
+        n = len(audio) // FRAME * FRAME
+        if n < len(audio):
+            self._carry = audio[n:]
+        if not n:
+            return []
+        frames = audio[:n].reshape(-1, FRAME)
+        mask = self._speech_mask(frames)
+        if self._silero is not None:
+            keep = int(_SILERO_CONTEXT_S * SAMPLE_RATE)
+            joined = audio[:n] if self._context is None else np.concatenate([self._context, audio[:n]])
+            self._context = joined[-keep:]
+        out: list = []
+        for frame, is_speech in zip(frames, mask):
+            pos = self._pos
+            self._pos += FRAME
+            if is_speech:
+                self.speech_frames += 1
+            else:
+                self.silence_frames += 1
+            if not self._active:
+                if not is_speech:
+                    self._preroll.append((pos, frame))
+                    continue
+                self._active = True
+                self.utterances += 1
+                for p, f in self._preroll:
+                    self._forward(out, p, f)
+                self._preroll.clear()
+            self._forward(out, pos, frame)
+            self._silence_run = 0 if is_speech else self._silence_run + 1
+            if self._silence_run >= self.pause_frames:
+                self._close(out)
+        return self._pack(out)
+
+    def _forward(self, out: list, pos: int, frame) -> None:
+        """Подряд идущие кадры копятся в одном фрагменте (склеиваются в _pack)."""
+        self.forwarded_samples += len(frame)
+        last = out[-1] if out else None
+        if last is not None and last[1] is not None and last[2] == pos:
+            last[1].append(frame)
+            last[2] += len(frame)
+        else:
+            out.append([pos, [frame], pos + len(frame)])
+
+    @staticmethod
+    def _pack(out: list) -> List[GateOutput]:
+        import numpy as np
+
+        return [(pos, None if frames is None else np.concatenate(frames)) for pos, frames, _end in out]
+
+    def _close(self, out: list) -> None:
+        self._active = False
+        self._silence_run = 0
+        out.append([self._pos, None, self._pos])
+
+    def finish(self) -> List[GateOutput]:
+        """Конец записи: хвост неполного кадра и закрытие открытой фразы."""
+        out: list = []
+        if self._active:
+            if self._carry is not None and len(self._carry):
+                self._forward(out, self._pos, self._carry)
+                self._pos += len(self._carry)
+            self._close(out)
+        self._carry = None
+        return self._pack(out)
+
+    def stats(self) -> Dict[str, float]:
+        frame_s = FRAME / SAMPLE_RATE
+        total = self.speech_frames + self.silence_frames
+        return {
+            "speech_s": round(self.speech_frames * frame_s, 2),
+            "silence_s": round(self.silence_frames * frame_s, 2),
+            "speech_ratio": round(self.speech_frames / total, 3) if total else 0.0,
+            "forwarded_s": round(self.forwarded_samples / SAMPLE_RATE, 2),
+            "utterances": self.utterances,
+        }
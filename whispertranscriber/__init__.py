@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+Headless entry point for Whisper Transcriber: python -m whispertranscriber transcribe <files...>.
+Uses the same services as the desktop app but imports no GUI modules.
+"""
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Command-line transcription without the Tk UI.
+
+    python -m whispertranscriber transcribe "recordings/*.mp3" -o out --model small --device cpu
+    python -m whispertranscriber transcribe a.wav b.wav --project session.wiproject
+
+Writes one TXT per input file (ExportService) and, optionally, a .wiproject (SessionService).
+"""
+import argparse
+import glob
+import os
+import sys
+from typing import List, Optional
+
+# Сервисы лежат в корне репозитория (рядом с main.py)
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from BatchTranscriptionService import JOB_DONE, BatchTranscriptionQueue  # noqa: E402
+from DictionaryService import DEFAULT_PROMPT_TOKEN_BUDGET, DictionaryService  # noqa: E402
+from ExportService import ExportService  # noqa: E402
+from SessionService import SessionService  # noqa: E402
+from TranscriptionService import TranscriptionService  # noqa: E402
+
+ENGINES = ("faster-whisper", "whisperx")
+
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """Раскрыть glob-шаблоны (включая **) в список существующих файлов без повторов, в порядке аргументов."""
+    out = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if not os.path.isfile(path):
+                continue
+            abs_path = os.path.abspath(path)
+            if abs_path not in seen:
+                seen.add(abs_path)
+                out.append(abs_path)
+    return out
+
+
+def _output_txt_path(media_path: str, output_dir: Optional[str]) -> str:
+    base = os.path.splitext(os.path.basename(media_path))[0] + ".txt"
+    return os.path.join(output_dir or os.path.dirname(media_path), base)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="whispertranscriber", description="Whisper Transcriber (headless)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    tr = sub.add_parser("transcribe", help="Transcribe audio/video files")
+    tr.add_argument("files", nargs="+", help="Files or glob patterns (quote patterns to use ** recursion)")
+    tr.add_argument("-o", "--output-dir", default=None, help="Directory for TXT files (default: next to each input)")
+    tr.add_argument("--model", default="base", help="Model size, e.g. tiny, base, small, medium, large-v3")
+    tr.add_argument("--device", default="auto", choices=("auto", "cuda", "cpu"))
+    tr.add_argument("--compute-type", default="float16", help="float16, int8, ... (float16 becomes int8 on CPU)")
+    tr.add_argument("--beam-size", type=int, default=5)
+    tr.add_argument("--language", default=None, help="Language code; omit for auto-detection")
+    tr.add_argument("--task", default="transcribe", choices=("transcribe", "translate"))
+    tr.add_argument("--no-vad", action="store_true", help="Disable VAD filter")
+    tr.add_argument("--word-timestamps", action="store_true")
+    tr.add_argument("--engine", default="faster-whisper", choices=ENGINES)
+    tr.add_argument("--workers", type=int, default=1, help="Files transcribed in parallel (one shared model)")
+    tr.add_argument(
+        "--batch-size", type=int, default=0,
+        help="Batched inference over VAD segments (faster-whisper); 0 or 1 = off",
+    )
+    tr.add_argument(
+        "--dictionary", action="append", default=[], metavar="ID",
+        help="Enable a global dictionary by ID (file name); repeatable",
+    )
+    tr.add_argument(
+        "--prompt-tokens", type=int, default=DEFAULT_PROMPT_TOKEN_BUDGET,
+        help="Token budget for the dictionary initial prompt; 0 = unlimited",
+    )
+    tr.add_argument(
+        "--dynamic-prompt", action="store_true",
+        help="Per-window prompt with dictionary terms matching the text decoded so far (faster-whisper)",
+    )
+    tr.add_argument("--apply-corrections", action="store_true", help="Apply correction dictionaries to the text")
+    tr.add_argument("--whole-words", action="store_true", help="Corrections match whole words only")
+    tr.add_argument("--ignore-case", action="store_true", help="Corrections ignore letter case")
+    tr.add_argument("--project", default=None, metavar="PATH", help="Also write all transcripts to a .wiproject")
+    tr.add_argument("-q", "--quiet", action="store_true", help="Only print errors")
+    return parser
+
+
+def run_transcribe(args, service: Optional[TranscriptionService] = None) -> int:
+    files = expand_inputs(args.files)
+    if not files:
+        print("No input files matched.", file=sys.stderr)
+        return 1
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    dictionaries = [d for d in (DictionaryService.load_by_id(did) for did in args.dictionary) if d]
+    missing = len(args.dictionary) - len(dictionaries)
+    if missing:
+        print(f"Warning: {missing} dictionary ID(s) not found.", file=sys.stderr)
+    initial_prompt = DictionaryService.build_initial_prompt_text(dictionaries, token_budget=args.prompt_tokens) or None
+    correction_entries = (
+        DictionaryService.get_correction_entries_from_dictionaries(dictionaries) if args.apply_corrections else []
+    )
+
+    def postprocess(segments):
+        if correction_entries:
+            DictionaryService.apply_corrections_to_segments(
+                segments, correction_entries, word_boundary=args.whole_words, ignore_case=args.ignore_case
+            )
+        return segments
+
+    def on_job_done(job):
+        if job.status != JOB_DONE:
+            print(f"FAILED {job.abs_path}: {job.error}", file=sys.stderr)
+            return
+        out_path = _output_txt_path(job.abs_path, args.output_dir)
+        if not ExportService.export_to_txt(job.segments, out_path):
+            job.error = f"cannot write {out_path}"
+            print(f"FAILED {job.abs_path}: {job.error}", file=sys.stderr)
+        elif not args.quiet:
+            print(f"{job.abs_path} -> {out_path} ({len(job.segments)} segments)")
+
+    device = "cuda" if args.device == "auto" else args.device
+    # Движок задаётся явно: иначе transcription_engine из wi_config.json (настройка GUI) перекрыл бы --engine
+    load_kwargs = dict(
+        model_size=args.model, device=device, compute_type=args.compute_type, engine_override=args.engine
+    )
+    transcribe_kwargs = dict(
+        language=args.language,
+        initial_prompt=initial_prompt,
+        beam_size=args.beam_size,
+        vad_filter=not args.no_vad,
+        task=args.task,
+        word_timestamps=args.word_timestamps,
+    )
+    if args.batch_size > 1 and args.engine == "faster-whisper":
+        transcribe_kwargs["batch_size"] = args.batch_size
+    if args.dynamic_prompt and args.engine == "faster-whisper":
+        provider = DictionaryService.build_dynamic_prompt_provider(dictionaries, token_budget=args.prompt_tokens)
+        if provider is not None:
+            transcribe_kwargs["dynamic_prompt"] = provider
+    queue = BatchTranscriptionQueue(
+        service or TranscriptionService(),
+        os.getcwd(),
+        workers=args.workers,
+        load_kwargs=load_kwargs,
+        transcribe_kwargs=transcribe_kwargs,
+        on_job_done=on_job_done,
+        postprocess=postprocess,
+    )
+    queue.add(files)
+    queue.start()
+    try:
+        queue.wait()
+    except KeyboardInterrupt:
+        queue.cancel()
+        queue.wait()
+        print("Interrupted.", file=sys.stderr)
+        return 130
+    if queue.get_last_error():
+        print(f"Model load failed: {queue.get_last_error()}", file=sys.stderr)
+        return 1
+
+    done = [j for j in queue.jobs if j.status == JOB_DONE and not j.error]
+    if args.project and done:
+        project_path = os.path.abspath(args.project)
+        file_transcripts = {
+            SessionService._make_path_relative_to_project(j.abs_path, project_path): list(j.segments)
+            for j in done
+        }
+        session = SessionService.build_session(
+            audio_path=done[0].abs_path,
+            transcript=done[0].segments,
+            model_used=args.model,
+            enabled_dictionary_ids=list(args.dictionary) or None,
+            apply_corrections_post=bool(args.apply_corrections),
+            project_path=project_path,
+            file_transcripts=file_transcripts,
+        )
+        if not SessionService.save_session(project_path, session):
+            print(f"Failed to write project {project_path}", file=sys.stderr)
+            return 1
+        if not args.quiet:
+            print(f"Project saved: {project_path}")
+    return 0 if len(done) == len(queue.jobs) else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "transcribe":
+        return run_transcribe(args)
+    return 2